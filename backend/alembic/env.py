@@ -5,6 +5,7 @@ from urllib.parse import quote_plus
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 from alembic import context
 
 from dotenv import load_dotenv
@@ -76,6 +77,8 @@ def run_migrations_online() -> None:
         )
         with context.begin_transaction():
             context.run_migrations()
+            # Avisa os processos da API para recarregar o schema cache (entregue no commit)
+            connection.execute(text("NOTIFY schema_changed"))
 
 
 if context.is_offline_mode():
@@ -0,0 +1,48 @@
+"""add keyset and trigram indexes to properties
+
+Revision ID: 3b7e1c9a2d41
+Revises: e901aa881482, 7777049d7dd2
+Create Date: 2026-10-18 09:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c9a2d41'
+down_revision: Union[str, None] = ('e901aa881482', '7777049d7dd2')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Índices compostos para paginação por cursor (created_at, id)
+    op.create_index(
+        'ix_properties_created_at_id',
+        'properties',
+        [sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_properties_status_created_at_id',
+        'properties',
+        ['status', sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+
+    # Índice trigram para ILIKE '%cidade%'
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_properties_city_trgm',
+        'properties',
+        ['city'],
+        postgresql_using='gin',
+        postgresql_ops={'city': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_properties_city_trgm', table_name='properties')
+    op.drop_index('ix_properties_status_created_at_id', table_name='properties')
+    op.drop_index('ix_properties_created_at_id', table_name='properties')
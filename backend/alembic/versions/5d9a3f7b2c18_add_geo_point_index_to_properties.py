@@ -0,0 +1,35 @@
+"""add geo point index to properties
+
+Revision ID: 5d9a3f7b2c18
+Revises: 8c2f4d6e1a57
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9a3f7b2c18'
+down_revision: Union[str, None] = '8c2f4d6e1a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Índice GiST em point(lng, lat) para consultas "point <@ box" do mapa
+    op.execute(
+        'CREATE INDEX ix_properties_geo_point ON properties '
+        'USING gist (point(CAST(longitude AS FLOAT), CAST(latitude AS FLOAT)))'
+    )
+
+    # Os índices B-tree separados não servem para bbox; o GiST substitui
+    op.drop_index('ix_properties_longitude', table_name='properties')
+    op.drop_index('ix_properties_latitude', table_name='properties')
+
+
+def downgrade() -> None:
+    op.create_index('ix_properties_latitude', 'properties', ['latitude'])
+    op.create_index('ix_properties_longitude', 'properties', ['longitude'])
+    op.drop_index('ix_properties_geo_point', table_name='properties')
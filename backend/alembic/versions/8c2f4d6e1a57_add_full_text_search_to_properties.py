@@ -0,0 +1,67 @@
+"""add full text search to properties
+
+Revision ID: 8c2f4d6e1a57
+Revises: 3b7e1c9a2d41
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4d6e1a57'
+down_revision: Union[str, None] = '3b7e1c9a2d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+
+    # Configuração portuguesa que também remove acentos ("São Paulo" == "sao paulo")
+    op.execute('CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese)')
+    op.execute(
+        'ALTER TEXT SEARCH CONFIGURATION pt_unaccent '
+        'ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem'
+    )
+
+    # unaccent() não é IMMUTABLE, então não pode ir direto num índice
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+        """
+    )
+
+    op.execute(
+        """
+        ALTER TABLE properties ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('pt_unaccent', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('pt_unaccent', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    op.create_index(
+        'ix_properties_search_vector',
+        'properties',
+        ['search_vector'],
+        postgresql_using='gin',
+    )
+
+    # Filtro de cidade sem acento na busca (f_unaccent(city) ILIKE f_unaccent('%...%'))
+    op.execute(
+        'CREATE INDEX ix_properties_city_unaccent_trgm '
+        'ON properties USING gin (f_unaccent(city) gin_trgm_ops)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_properties_city_unaccent_trgm', table_name='properties')
+    op.drop_index('ix_properties_search_vector', table_name='properties')
+    op.drop_column('properties', 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
+    op.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS pt_unaccent')
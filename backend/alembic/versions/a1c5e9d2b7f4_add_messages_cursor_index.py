@@ -0,0 +1,31 @@
+"""add messages cursor index
+
+Revision ID: a1c5e9d2b7f4
+Revises: f6b1d3e8a2c7
+Create Date: 2026-10-18 17:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c5e9d2b7f4'
+down_revision: Union[str, None] = 'f6b1d3e8a2c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Cursores after/before de GET .../messages (widget e inbox)
+    op.create_index(
+        'ix_messages_conversation_created_at_id',
+        'messages',
+        ['conversation_id', 'created_at', 'id'],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_created_at_id', table_name='messages', if_exists=True)
@@ -0,0 +1,37 @@
+"""add pagination indexes to favorites
+
+Revision ID: a4e8b2c6d913
+Revises: 5d9a3f7b2c18
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e8b2c6d913'
+down_revision: Union[str, None] = '5d9a3f7b2c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Listagem paginada de favoritos (mais recentes primeiro)
+    op.create_index(
+        'ix_favorites_user_created_at',
+        'favorites',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_favorites_lead_user_created_at',
+        'favorites',
+        ['lead_id', 'user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_favorites_lead_user_created_at', table_name='favorites')
+    op.drop_index('ix_favorites_user_created_at', table_name='favorites')
@@ -0,0 +1,36 @@
+"""create ws_broadcast_spill
+
+Revision ID: a7c3e9f5b1d4
+Revises: d5f9b3c7e1a6
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f5b1d4'
+down_revision: Union[str, None] = 'd5f9b3c7e1a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # UNLOGGED: envelopes duram segundos, não precisam de WAL nem de réplica
+    op.create_table(
+        'ws_broadcast_spill',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        prefixes=['UNLOGGED'],
+    )
+    op.create_index('ix_ws_broadcast_spill_created_at', 'ws_broadcast_spill', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ws_broadcast_spill_created_at', table_name='ws_broadcast_spill')
+    op.drop_table('ws_broadcast_spill')
@@ -0,0 +1,87 @@
+"""add last message to conversations
+
+Revision ID: b2d6f0a4c8e3
+Revises: a1c5e9d2b7f4
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d6f0a4c8e3'
+down_revision: Union[str, None] = 'a1c5e9d2b7f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('last_message_id', sa.UUID(as_uuid=True), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    # Cada INSERT em messages atualiza a conversa (só se for mais recente)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION messages_last_message_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE conversations
+               SET last_message_id = NEW.id,
+                   last_message_preview = left(NEW.content, 200),
+                   last_message_at = NEW.created_at
+             WHERE id = NEW.conversation_id
+               AND (last_message_at IS NULL
+                    OR (NEW.created_at, NEW.id) > (last_message_at, last_message_id));
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER messages_last_message
+        AFTER INSERT ON messages
+        FOR EACH ROW EXECUTE FUNCTION messages_last_message_trigger()
+        """
+    )
+
+    # Backfill com a última mensagem de cada conversa
+    op.execute(
+        """
+        UPDATE conversations c
+           SET last_message_id = m.id,
+               last_message_preview = left(m.content, 200),
+               last_message_at = m.created_at
+          FROM (
+                SELECT DISTINCT ON (conversation_id) conversation_id, id, content, created_at
+                  FROM messages
+                 ORDER BY conversation_id, created_at DESC, id DESC
+               ) m
+         WHERE m.conversation_id = c.id
+        """
+    )
+
+    op.create_index(
+        'ix_conversations_updated_at_id',
+        'conversations',
+        [sa.text('updated_at DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_conversations_assigned_updated_at_id',
+        'conversations',
+        ['assigned_to', sa.text('updated_at DESC'), sa.text('id DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_assigned_updated_at_id', table_name='conversations')
+    op.drop_index('ix_conversations_updated_at_id', table_name='conversations')
+    op.execute('DROP TRIGGER IF EXISTS messages_last_message ON messages')
+    op.execute('DROP FUNCTION IF EXISTS messages_last_message_trigger()')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'last_message_preview')
+    op.drop_column('conversations', 'last_message_id')
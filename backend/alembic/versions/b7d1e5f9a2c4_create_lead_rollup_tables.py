@@ -0,0 +1,127 @@
+"""create lead rollup tables
+
+Revision ID: b7d1e5f9a2c4
+Revises: a4e8b2c6d913
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1e5f9a2c4'
+down_revision: Union[str, None] = 'a4e8b2c6d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'lead_daily_status_counts',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'status'),
+    )
+    op.create_table(
+        'lead_daily_closed_deals',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('assigned_to', sa.UUID(as_uuid=True), nullable=False),
+        sa.Column('closed_deals', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_value', sa.Numeric(precision=15, scale=2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'assigned_to'),
+    )
+
+    # Trigger: remove a contribuição antiga (OLD) e soma a nova (NEW)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION leads_rollup_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE lead_daily_status_counts
+                   SET total = total - 1
+                 WHERE day = OLD.created_at::date AND status = OLD.status::text;
+
+                IF OLD.status::text = 'fechado' AND OLD.converted_at IS NOT NULL THEN
+                    UPDATE lead_daily_closed_deals
+                       SET closed_deals = closed_deals - 1,
+                           total_value = total_value - COALESCE(OLD.value, 0)
+                     WHERE day = OLD.converted_at::date
+                       AND assigned_to = COALESCE(OLD.assigned_to, '00000000-0000-0000-0000-000000000000'::uuid);
+                END IF;
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO lead_daily_status_counts (day, status, total)
+                VALUES (NEW.created_at::date, NEW.status::text, 1)
+                ON CONFLICT (day, status) DO UPDATE
+                    SET total = lead_daily_status_counts.total + 1;
+
+                IF NEW.status::text = 'fechado' AND NEW.converted_at IS NOT NULL THEN
+                    INSERT INTO lead_daily_closed_deals (day, assigned_to, closed_deals, total_value)
+                    VALUES (
+                        NEW.converted_at::date,
+                        COALESCE(NEW.assigned_to, '00000000-0000-0000-0000-000000000000'::uuid),
+                        1,
+                        COALESCE(NEW.value, 0)
+                    )
+                    ON CONFLICT (day, assigned_to) DO UPDATE
+                        SET closed_deals = lead_daily_closed_deals.closed_deals + 1,
+                            total_value = lead_daily_closed_deals.total_value + EXCLUDED.total_value;
+                END IF;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER leads_rollup
+        AFTER INSERT OR DELETE OR UPDATE OF status, created_at, converted_at, assigned_to, value
+        ON leads
+        FOR EACH ROW EXECUTE FUNCTION leads_rollup_trigger()
+        """
+    )
+
+    # Reconstrução completa (backfill agora; pode ser agendada para corrigir desvios)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION rebuild_lead_rollups() RETURNS void
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            LOCK TABLE lead_daily_status_counts, lead_daily_closed_deals IN EXCLUSIVE MODE;
+            DELETE FROM lead_daily_status_counts;
+            DELETE FROM lead_daily_closed_deals;
+
+            INSERT INTO lead_daily_status_counts (day, status, total)
+            SELECT created_at::date, status::text, COUNT(*)
+              FROM leads
+             GROUP BY 1, 2;
+
+            INSERT INTO lead_daily_closed_deals (day, assigned_to, closed_deals, total_value)
+            SELECT converted_at::date,
+                   COALESCE(assigned_to, '00000000-0000-0000-0000-000000000000'::uuid),
+                   COUNT(*),
+                   COALESCE(SUM(value), 0)
+              FROM leads
+             WHERE status::text = 'fechado' AND converted_at IS NOT NULL
+             GROUP BY 1, 2;
+        END;
+        $$
+        """
+    )
+    op.execute('SELECT rebuild_lead_rollups()')
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS leads_rollup ON leads')
+    op.execute('DROP FUNCTION IF EXISTS rebuild_lead_rollups()')
+    op.execute('DROP FUNCTION IF EXISTS leads_rollup_trigger()')
+    op.drop_table('lead_daily_closed_deals')
+    op.drop_table('lead_daily_status_counts')
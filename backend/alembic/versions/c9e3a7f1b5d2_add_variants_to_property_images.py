@@ -0,0 +1,31 @@
+"""add variants to property images
+
+Revision ID: c9e3a7f1b5d2
+Revises: b2d6f0a4c8e3
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e3a7f1b5d2'
+down_revision: Union[str, None] = 'b2d6f0a4c8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('property_images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('property_images', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('property_images', sa.Column('variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('property_images', 'variants')
+    op.drop_column('property_images', 'height')
+    op.drop_column('property_images', 'width')
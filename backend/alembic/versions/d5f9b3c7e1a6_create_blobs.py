@@ -0,0 +1,105 @@
+"""create blobs
+
+Revision ID: d5f9b3c7e1a6
+Revises: c9e3a7f1b5d2
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f9b3c7e1a6'
+down_revision: Union[str, None] = 'c9e3a7f1b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('ext', sa.String(length=16), server_default='', nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('refcount', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('touched_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    op.create_index(
+        'ix_blobs_unreferenced',
+        'blobs',
+        ['touched_at'],
+        postgresql_where=sa.text('refcount <= 0'),
+    )
+
+    # URL de blob -> sha256 (NULL para URLs fora do blob store)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION blob_sha256_from_url(url text) RETURNS text
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT substring(url from '/uploads/blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})')
+        $$
+        """
+    )
+
+    # Conta referências pela coluna de URL passada em TG_ARGV[0]; cobre
+    # INSERT, troca de URL e DELETE (inclusive em cascata)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION blob_refcount_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            old_key text;
+            new_key text;
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                old_key := blob_sha256_from_url(to_jsonb(OLD) ->> TG_ARGV[0]);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                new_key := blob_sha256_from_url(to_jsonb(NEW) ->> TG_ARGV[0]);
+            END IF;
+            IF old_key IS NOT DISTINCT FROM new_key THEN
+                RETURN NULL;
+            END IF;
+
+            IF old_key IS NOT NULL THEN
+                UPDATE blobs
+                   SET refcount = refcount - 1,
+                       touched_at = timezone('utc', now())
+                 WHERE sha256 = old_key;
+            END IF;
+            IF new_key IS NOT NULL THEN
+                UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = new_key;
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER property_images_blob_refcount
+        AFTER INSERT OR UPDATE OF image_url OR DELETE ON property_images
+        FOR EACH ROW EXECUTE FUNCTION blob_refcount_trigger('image_url')
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER messages_blob_refcount
+        AFTER INSERT OR UPDATE OF file_url OR DELETE ON messages
+        FOR EACH ROW EXECUTE FUNCTION blob_refcount_trigger('file_url')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS messages_blob_refcount ON messages')
+    op.execute('DROP TRIGGER IF EXISTS property_images_blob_refcount ON property_images')
+    op.execute('DROP FUNCTION IF EXISTS blob_refcount_trigger()')
+    op.execute('DROP FUNCTION IF EXISTS blob_sha256_from_url(text)')
+    op.drop_index('ix_blobs_unreferenced', table_name='blobs')
+    op.drop_table('blobs')
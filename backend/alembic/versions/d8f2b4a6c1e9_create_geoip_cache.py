@@ -0,0 +1,33 @@
+"""create geoip cache
+
+Revision ID: d8f2b4a6c1e9
+Revises: c3e7a1d5f8b2
+Create Date: 2026-10-18 16:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2b4a6c1e9'
+down_revision: Union[str, None] = 'c3e7a1d5f8b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'geoip_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('city', sa.String(length=100), nullable=True),
+        sa.Column('state', sa.String(length=100), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('geoip_cache')
@@ -0,0 +1,37 @@
+"""relative property image urls
+
+Revision ID: e2b8d4f6a9c1
+Revises: a7c3e9f5b1d4
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4f6a9c1'
+down_revision: Union[str, None] = 'a7c3e9f5b1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Prefixo que a troca de fotos gravava; o resto da API já usa /uploads/...
+LEGACY_PREFIX = 'http://127.0.0.1:8000/uploads/'
+
+
+def upgrade() -> None:
+    # A chave do blob não muda, então o trigger de refcount não altera nada
+    op.execute(
+        f"""
+        UPDATE property_images
+           SET image_url = substr(image_url, {len(LEGACY_PREFIX) - len('/uploads/') + 1}),
+               variants = replace(variants::text, '"{LEGACY_PREFIX}', '"/uploads/')::jsonb
+         WHERE image_url LIKE '{LEGACY_PREFIX}%'
+        """
+    )
+
+
+def downgrade() -> None:
+    # URLs relativas são válidas nas duas versões
+    pass
@@ -0,0 +1,57 @@
+"""add api keys invalidation trigger
+
+Revision ID: e4a9c7b3d5f1
+Revises: d8f2b4a6c1e9
+Create Date: 2026-10-18 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c7b3d5f1'
+down_revision: Union[str, None] = 'd8f2b4a6c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Mesma definição do migrate_widget.py (a tabela pode ainda não existir)
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS api_keys (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100),
+            key VARCHAR(255) UNIQUE,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """
+    )
+
+    # Revogação/alteração de chave invalida o cache de todos os workers
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION api_keys_notify_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('api_keys_changed', OLD.key);
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER api_keys_notify
+        AFTER UPDATE OR DELETE ON api_keys
+        FOR EACH ROW EXECUTE FUNCTION api_keys_notify_trigger()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS api_keys_notify ON api_keys')
+    op.execute('DROP FUNCTION IF EXISTS api_keys_notify_trigger()')
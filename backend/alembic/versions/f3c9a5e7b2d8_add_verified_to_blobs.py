@@ -0,0 +1,31 @@
+"""add verified to blobs
+
+Revision ID: f3c9a5e7b2d8
+Revises: e2b8d4f6a9c1
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c9a5e7b2d8'
+down_revision: Union[str, None] = 'e2b8d4f6a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'blobs',
+        sa.Column('verified', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+    )
+    # Blobs já referenciados passaram por store_blob ou pela confirmação do upload direto
+    op.execute('UPDATE blobs SET verified = true WHERE refcount > 0')
+
+
+def downgrade() -> None:
+    op.drop_column('blobs', 'verified')
@@ -0,0 +1,59 @@
+"""add bot settings notify trigger
+
+Revision ID: f6b1d3e8a2c7
+Revises: e4a9c7b3d5f1
+Create Date: 2026-10-18 17:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b1d3e8a2c7'
+down_revision: Union[str, None] = 'e4a9c7b3d5f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Mesma definição do migrate_widget_v2.py (a tabela pode ainda não existir)
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot_settings (
+            id SERIAL PRIMARY KEY,
+            welcome_message TEXT NOT NULL DEFAULT 'Olá! Como posso te ajudar com esse imóvel?',
+            away_message TEXT NOT NULL DEFAULT 'No momento estamos fora do horário. Responderei em breve!',
+            enabled BOOLEAN DEFAULT TRUE,
+            away_enabled BOOLEAN DEFAULT TRUE,
+            business_start INTEGER DEFAULT 8,
+            business_end INTEGER DEFAULT 18
+        )
+        """
+    )
+
+    # Qualquer edição invalida o cache de configurações do bot nos workers
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bot_settings_notify_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('bot_settings_changed', '');
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER bot_settings_notify
+        AFTER INSERT OR UPDATE OR DELETE ON bot_settings
+        FOR EACH STATEMENT EXECUTE FUNCTION bot_settings_notify_trigger()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS bot_settings_notify ON bot_settings')
+    op.execute('DROP FUNCTION IF EXISTS bot_settings_notify_trigger()')
@@ -1,26 +1,70 @@
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 import bcrypt
 from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
-from src.auth import create_access_token, get_current_user, get_db
+from src.auth import create_access_token, get_current_user, get_db, require_admin
+from src.database.db import pool_status
+from src.database.instrumentation import DBMetricsMiddleware, get_route_metrics
 from src.database.models import Users
+from src.database.notify import start_notify_listener, stop_notify_listener
+from src.database.schema_cache import start_schema_listener
+from src.services.api_keys import get_usage as get_api_key_usage
+from src.services.blobs import schedule_blob_gc
+from src.services.http_clients import http_clients
+from src.services.images import shutdown_image_pool
+from src.services.outbox import get_outbox_metrics, outbox_backlog, outbox_workers
+from src.services.read_receipts import read_receipts
+from src.services.static_assets import CachedStaticFiles, asset_url, precompress_assets
 from src.routes.conversations import router as conversations_router
 from src.routes.favoritos import router as favorites_router
 from src.routes.leads.leads import router as leads_router
 from src.routes.properties import router as properties_router
 from src.routes.properties_crud import router as properties_crud_router
 from src.routes.settings import router as settings_router
+from src.routes.storage import router as storage_router
 from src.routes.dashboard import router as dashboard_router
 from src.routes.widget import router as widget_router
+from src.websocket.manager import manager as ws_manager
+from src.websocket.presence import presence
 from src.websocket.routes import router as websocket_router
 
-app = FastAPI(title="API Imobiliária", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Metadados do schema carregados uma vez (recarregados via NOTIFY após migrations)
+    start_schema_listener()
+    # Uma thread de LISTEN para as invalidações (schema, API keys, ...)
+    start_notify_listener()
+    # Clientes HTTP compartilhados (keep-alive) das integrações externas
+    http_clients.start()
+    # Broadcast dos WebSockets entre workers (memory / postgres / redis)
+    await ws_manager.start()
+    await presence.start()
+    # Workers do outbox (geo, WhatsApp e bot do widget fora do caminho da requisição)
+    await outbox_workers.start()
+    # GC periódico dos blobs sem referência (inclui uploads diretos abandonados)
+    await schedule_blob_gc()
+    # widget.js.gz/.br servidos direto pelo /widget (regerados quando o .js muda)
+    if WIDGET_DIR.exists():
+        precompress_assets(WIDGET_DIR)
+    yield
+    await outbox_workers.stop()
+    shutdown_image_pool()
+    # Grava o último lote de recibos de leitura pendente
+    await read_receipts.stop()
+    await presence.stop()
+    await ws_manager.stop()
+    await http_clients.aclose()
+    stop_notify_listener()
+
+
+app = FastAPI(title="API Imobiliária", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,8 +72,12 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Has-More", "X-Next-Cursor", "X-DB-Query-Count", "X-DB-Time-Ms", "Server-Timing"],
 )
 
+# ✅ Queries e tempo de banco por requisição (headers + agregado em /health/db)
+app.add_middleware(DBMetricsMiddleware)
+
 # ✅ Servir arquivos estáticos de uploads (pasta backend/uploads)
 BASE_DIR = Path(__file__).resolve().parent  # backend/
 UPLOADS_DIR = BASE_DIR / "uploads"
@@ -37,9 +85,22 @@ UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
 WIDGET_DIR = BASE_DIR.parent / "widget"
 
-app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
+# Antes do mount: com storage S3, /uploads/blobs/... redireciona para o bucket
+app.include_router(storage_router)
+
+# blobs/ é endereçado por conteúdo (cache imutável); o resto revalida por ETag
+app.mount(
+    "/uploads",
+    CachedStaticFiles(directory=str(UPLOADS_DIR), immutable_prefixes=("blobs/",)),
+    name="uploads",
+)
 if WIDGET_DIR.exists():
-    app.mount("/widget", StaticFiles(directory=str(WIDGET_DIR)), name="widget")
+    # widget.<hash>.js imutável; widget.js estável com cache curto; .br/.gz pré-gerados
+    app.mount(
+        "/widget",
+        CachedStaticFiles(directory=str(WIDGET_DIR), fingerprint=True, precompressed=True),
+        name="widget",
+    )
 
 # Incluir rotas
 app.include_router(properties_router)
@@ -120,4 +181,34 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+# Métricas internas (tempos por rota, pools, hosts externos, outbox): só administradores
+@app.get("/health/db")
+def health_db(_: Users = Depends(require_admin)):
+    return {"pools": pool_status(), "routes": get_route_metrics()}
+
+
+@app.get("/health/http")
+def health_http(_: Users = Depends(require_admin)):
+    return http_clients.status()
+
+
+@app.get("/health/outbox")
+async def health_outbox(_: Users = Depends(require_admin)):
+    return {"backlog": await outbox_backlog(), "tasks": get_outbox_metrics()}
+
+
+@app.get("/health/api-keys")
+def health_api_keys(_: Users = Depends(require_admin)):
+    """Uso e token bucket por chave: só para administradores"""
+    return get_api_key_usage()
+
+
+@app.get("/assets/manifest")
+def assets_manifest():
+    """URLs com fingerprint (cache imutável) para embutir o widget nos sites"""
+    if not WIDGET_DIR.exists():
+        return {}
+    return {"widget.js": asset_url("/widget", WIDGET_DIR, "widget.js")}
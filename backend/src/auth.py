@@ -9,7 +9,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
-from src.database.db import SessionLocal
+from src.database.db import get_db
 from src.database.models import Users
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "CHANGE_ME")
@@ -19,15 +19,6 @@ JWT_EXPIRES_MINUTES = int(os.getenv("JWT_EXPIRES_MINUTES", "60"))
 security = HTTPBearer()
 
 
-def get_db():
-    """Dependency para obter sessão do banco de dados"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def create_access_token(user: Users) -> str:
     """Criar token JWT para usuário"""
     expire = datetime.utcnow() + timedelta(minutes=JWT_EXPIRES_MINUTES)
@@ -68,3 +59,13 @@ def get_current_user(
             detail="Usuário inválido.",
         )
     return user
+
+
+def require_admin(current_user: Users = Depends(get_current_user)):
+    """Usuário autenticado com role admin (rotas operacionais)"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores.",
+        )
+    return current_user
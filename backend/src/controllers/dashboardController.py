@@ -1,20 +1,18 @@
+import os
+
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import date, datetime, timedelta
+
+from src.database.schema_cache import column_exists
+from src.services.cache import TTLCache
 
+# Overview por período; os agregados vêm das tabelas de rollup (lead_daily_*)
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+_overview_cache = TTLCache(maxsize=16, ttl=DASHBOARD_CACHE_TTL)
 
-def _column_exists(db: Session, table_name: str, column_name: str) -> bool:
-    q = text(
-        """
-        SELECT 1
-        FROM information_schema.columns
-        WHERE table_name = :table_name
-          AND column_name = :column_name
-        LIMIT 1
-        """
-    )
-    return db.execute(q, {"table_name": table_name, "column_name": column_name}).first() is not None
+# Corretor "vazio" nas linhas de lead_daily_closed_deals sem assigned_to
+NO_BROKER_ID = "00000000-0000-0000-0000-000000000000"
 
 
 def _get_start_date(period: str) -> datetime:
@@ -32,21 +30,22 @@ def _get_start_date(period: str) -> datetime:
         return now - timedelta(days=30)
 
 
-def _get_leads_by_month(db: Session, start_date: datetime) -> list:
+def _get_leads_by_month(db: Session, start_day: date) -> list:
     """Busca leads agrupados por mês para o gráfico"""
     rows = db.execute(
         text(
             """
             SELECT
-                DATE_TRUNC('month', created_at) AS month,
-                COUNT(*) AS total
-            FROM leads
-            WHERE created_at >= :start_date
+                DATE_TRUNC('month', day) AS month,
+                SUM(total) AS total
+            FROM lead_daily_status_counts
+            WHERE day >= :start_day
             GROUP BY month
+            HAVING SUM(total) > 0
             ORDER BY month
             """
         ),
-        {"start_date": start_date}
+        {"start_day": start_day}
     ).all()
     
     return [
@@ -55,54 +54,52 @@ def _get_leads_by_month(db: Session, start_date: datetime) -> list:
     ]
 
 
-def _get_estimated_revenue(db: Session, start_date: datetime) -> Optional[float]:
-    """Calcula receita estimada somando valor dos leads fechados"""
-    result = db.execute(
+def _get_leads_by_status(db: Session, start_day: date) -> dict:
+    """Leads criados no período, pelo status atual"""
+    rows = db.execute(
         text(
             """
-            SELECT SUM(value)
-            FROM leads
-            WHERE status = 'fechado'
-              AND converted_at IS NOT NULL
-              AND converted_at >= :start_date
-              AND value IS NOT NULL
+            SELECT status, SUM(total)
+            FROM lead_daily_status_counts
+            WHERE day >= :start_day
+            GROUP BY status
             """
         ),
-        {"start_date": start_date}
-    ).scalar()
-    
-    return float(result) if result else 0
+        {"start_day": start_day}
+    ).all()
 
+    leads_by_status = {
+        "novo": 0,
+        "em_atendimento": 0,
+        "proposta_enviada": 0,
+        "fechado": 0,
+        "perdido": 0,
+    }
 
-def _get_conversion_rate(db: Session, start_date: datetime) -> Optional[float]:
-    """Calcula taxa de conversão (leads fechados / total leads) * 100"""
-    # Total leads no período
-    total_leads = db.execute(
-        text("SELECT COUNT(*) FROM leads WHERE created_at >= :start_date"),
-        {"start_date": start_date}
-    ).scalar() or 0
-    
-    if total_leads == 0:
-        return 0
-    
-    # Leads fechados no período
-    closed_leads = db.execute(
+    for status, count in rows:
+        if status:
+            leads_by_status[str(status)] = int(count or 0)
+
+    return leads_by_status
+
+
+def _get_closed_totals(db: Session, start_day: date) -> tuple:
+    """(negócios fechados, receita estimada) convertidos no período"""
+    row = db.execute(
         text(
             """
-            SELECT COUNT(*)
-            FROM leads
-            WHERE status = 'fechado'
-              AND converted_at IS NOT NULL
-              AND converted_at >= :start_date
+            SELECT COALESCE(SUM(closed_deals), 0), COALESCE(SUM(total_value), 0)
+            FROM lead_daily_closed_deals
+            WHERE day >= :start_day
             """
         ),
-        {"start_date": start_date}
-    ).scalar() or 0
-    
-    return round((closed_leads / total_leads) * 100, 2)
+        {"start_day": start_day}
+    ).one()
+
+    return int(row[0]), float(row[1])
 
 
-def _get_corretores_ranking(db: Session, start_date: datetime) -> list:
+def _get_corretores_ranking(db: Session, start_day: date) -> list:
     """Busca ranking de corretores por valor de negócios fechados"""
     rows = db.execute(
         text(
@@ -110,19 +107,18 @@ def _get_corretores_ranking(db: Session, start_date: datetime) -> list:
             SELECT
                 "Users".id,
                 "Users".full_name,
-                COUNT(leads.id) AS closed_deals,
-                COALESCE(SUM(leads.value), 0) AS total_value
-            FROM leads
-            JOIN "Users" ON "Users".id = leads.assigned_to
-            WHERE leads.status = 'fechado'
-              AND leads.converted_at IS NOT NULL
-              AND leads.converted_at >= :start_date
-              AND leads.assigned_to IS NOT NULL
+                SUM(r.closed_deals) AS closed_deals,
+                COALESCE(SUM(r.total_value), 0) AS total_value
+            FROM lead_daily_closed_deals r
+            JOIN "Users" ON "Users".id = r.assigned_to
+            WHERE r.day >= :start_day
+              AND r.assigned_to <> CAST(:no_broker AS uuid)
             GROUP BY "Users".id, "Users".full_name
+            HAVING SUM(r.closed_deals) > 0
             ORDER BY total_value DESC
             """
         ),
-        {"start_date": start_date}
+        {"start_day": start_day, "no_broker": NO_BROKER_ID}
     ).all()
     
     return [
@@ -136,74 +132,61 @@ def _get_corretores_ranking(db: Session, start_date: datetime) -> list:
     ]
 
 
+def invalidate_dashboard_cache() -> None:
+    """Descarta o overview em cache (ex.: após alterar um lead)"""
+    _overview_cache.clear()
+
+
 def get_dashboard_overview(db: Session, period: str = "30d"):
-    # Calcular data de início baseada no período
-    start_date = _get_start_date(period)
+    if period not in ("7d", "30d", "12m"):
+        period = "30d"
+    return _overview_cache.get_or_set(period, lambda: _build_dashboard_overview(db, period))
+
+
+def _build_dashboard_overview(db: Session, period: str) -> dict:
+    # Calcular data de início baseada no período (rollups são diários)
+    start_day = _get_start_date(period).date()
     
     # Leads por mês (para gráfico)
-    leads_by_month = _get_leads_by_month(db, start_date)
+    leads_by_month = _get_leads_by_month(db, start_day)
     
-    # Receita estimada
-    estimated_revenue = _get_estimated_revenue(db, start_date)
+    # Leads por status (o total do período é a soma)
+    leads_by_status = _get_leads_by_status(db, start_day)
+    total_leads = sum(leads_by_status.values())
     
-    # Taxa de conversão
-    conversion_rate = _get_conversion_rate(db, start_date)
+    # Convertidos e receita estimada no período
+    converted_this_period, estimated_revenue = _get_closed_totals(db, start_day)
     
-    # Ranking de corretores
-    ranking = _get_corretores_ranking(db, start_date)
+    # Taxa de conversão (leads fechados / total leads) * 100
+    conversion_rate = round((converted_this_period / total_leads) * 100, 2) if total_leads else 0
     
-    # Totais existentes (mantidos para compatibilidade)
-    total_leads = db.execute(text("SELECT COUNT(*) FROM leads WHERE created_at >= :start_date"), {"start_date": start_date}).scalar() or 0
-
-    # Leads por status
-    rows = db.execute(
-        text(
-            """
-            SELECT status, COUNT(*)
-            FROM leads
-            WHERE created_at >= :start_date
-            GROUP BY status
-            """
-        ),
-        {"start_date": start_date}
-    ).all()
-
-    leads_by_status = {
-        "novo": 0,
-        "em_atendimento": 0,
-        "proposta_enviada": 0,
-        "fechado": 0,
-        "perdido": 0,
-    }
-
-    for status, count in rows:
-        if status:
-            leads_by_status[str(status)] = int(count or 0)
+    # Ranking de corretores
+    ranking = _get_corretores_ranking(db, start_day)
 
     # Total de Imóveis
     total_properties = db.execute(text("SELECT COUNT(*) FROM properties")).scalar() or 0
 
-    # Imóveis ativos (auto-detect)
+    # Imóveis ativos (auto-detect pelas colunas do schema cache)
     active_properties = 0
 
     # Caso 1: booleanos comuns
-    if _column_exists(db, "properties", "is_active"):
+    if column_exists("properties", "is_active"):
         active_properties = db.execute(
             text("SELECT COUNT(*) FROM properties WHERE is_active = true")
         ).scalar() or 0
 
-    elif _column_exists(db, "properties", "active"):
+    elif column_exists("properties", "active"):
         active_properties = db.execute(
             text("SELECT COUNT(*) FROM properties WHERE active = true")
         ).scalar() or 0
 
-    elif _column_exists(db, "properties", "is_available"):
+    elif column_exists("properties", "is_available"):
         active_properties = db.execute(
             text("SELECT COUNT(*) FROM properties WHERE is_available = true")
         ).scalar() or 0
 
     # Caso 2: status (ENUM ou TEXT) -> comparar como texto para não explodir enum
-    elif _column_exists(db, "properties", "status"):
+    elif column_exists("properties", "status"):
         active_properties = db.execute(
             text(
                 """
@@ -221,20 +204,6 @@ def get_dashboard_overview(db: Session, period: str = "30d"):
     # Conversas não lidas (temporariamente desativado - colunas não existem)
     unread_conversations = 0
 
-    # Convertidos no período
-    converted_this_period = db.execute(
-        text(
-            """
-            SELECT COUNT(*)
-            FROM leads
-            WHERE status = 'fechado'
-              AND converted_at IS NOT NULL
-              AND converted_at >= :start_date
-            """
-        ),
-        {"start_date": start_date}
-    ).scalar() or 0
-
     return {
         "totals": {
             "totalLeads": int(total_leads),
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from src.database.models import Messages
+
+MESSAGES_DEFAULT_LIMIT = 100
+MESSAGES_MAX_LIMIT = 500
+
+
+def _resolve_position(db: Session, conversation_id: UUID, value: str) -> Tuple[datetime, Optional[UUID]]:
+    """Cursor after/before: id de mensagem da conversa ou timestamp ISO"""
+    try:
+        message_id = UUID(value)
+    except ValueError:
+        message_id = None
+
+    if message_id is not None:
+        created_at = (
+            db.query(Messages.created_at)
+            .filter(Messages.id == message_id, Messages.conversation_id == conversation_id)
+            .scalar()
+        )
+        if created_at is None:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        return created_at, message_id
+
+    try:
+        timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # Colunas são naive em UTC
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp, None
+
+
+def _after(position: Tuple[datetime, Optional[UUID]]):
+    created_at, message_id = position
+    if message_id is None:
+        return Messages.created_at > created_at
+    return or_(
+        Messages.created_at > created_at,
+        and_(Messages.created_at == created_at, Messages.id > message_id),
+    )
+
+
+def _before(position: Tuple[datetime, Optional[UUID]]):
+    created_at, message_id = position
+    if message_id is None:
+        return Messages.created_at < created_at
+    return or_(
+        Messages.created_at < created_at,
+        and_(Messages.created_at == created_at, Messages.id < message_id),
+    )
+
+
+def get_message_page(
+    db: Session,
+    conversation_id: UUID,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = MESSAGES_DEFAULT_LIMIT,
+) -> Tuple[List[Messages], bool]:
+    """
+    Página de mensagens em ordem cronológica + se há mais na direção pedida
+
+    - after: mensagens posteriores ao cursor (sincronização incremental)
+    - before: as `limit` mensagens imediatamente anteriores (carregar histórico)
+    - sem cursor: as `limit` mensagens mais recentes
+    Usa o índice (conversation_id, created_at, id).
+    """
+    q = db.query(Messages).filter(Messages.conversation_id == conversation_id)
+
+    if after:
+        q = q.filter(_after(_resolve_position(db, conversation_id, after)))
+    if before:
+        q = q.filter(_before(_resolve_position(db, conversation_id, before)))
+
+    if after:
+        rows = q.order_by(Messages.created_at.asc(), Messages.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        return rows[:limit], has_more
+
+    rows = q.order_by(Messages.created_at.desc(), Messages.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    return list(reversed(rows[:limit])), has_more
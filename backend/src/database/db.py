@@ -3,8 +3,11 @@ from urllib.parse import quote_plus
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from .instrumentation import instrument_engine
+
 # Carrega .env (rodando a partir de backend/)
 load_dotenv(encoding="utf-8")
 
@@ -22,25 +25,83 @@ if not all([DB_NAME, DB_USER, DB_PASSWORD]):
 DB_USER_ENC = quote_plus(DB_USER)
 DB_PASSWORD_ENC = quote_plus(DB_PASSWORD)
 
+# Pool de conexões e timeout de statement (ajustáveis por ambiente)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
 # ✅ Força encoding no client do Postgres
 os.environ["PGCLIENTENCODING"] = DB_CLIENT_ENCODING
-options = quote_plus(f"-c client_encoding={DB_CLIENT_ENCODING}")
+options = quote_plus(
+    f"-c client_encoding={DB_CLIENT_ENCODING} -c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+)
 
 DATABASE_URL = (
     f"postgresql+psycopg2://{DB_USER_ENC}:{DB_PASSWORD_ENC}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     f"?options={options}"
 )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# asyncpg sempre conversa em UTF8, não precisa do options=client_encoding
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER_ENC}:{DB_PASSWORD_ENC}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+POOL_OPTIONS = {
+    "pool_pre_ping": True,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Engine assíncrono para endpoints async (não bloqueia o event loop / WebSockets)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Contagem de queries / tempo de banco por requisição (ver DBMetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 Base = declarative_base()
 
 
 def get_db():
-    """Dependency para obter sessão do banco de dados"""
+    """Dependency (única) para obter sessão do banco de dados"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """Dependency para obter sessão assíncrona do banco de dados"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_status() -> dict:
+    """Ocupação atual dos pools síncrono e assíncrono"""
+    return {
+        name: {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checked_in": pool.checkedin(),
+        }
+        for name, pool in (("sync", engine.pool), ("async", async_engine.pool))
+    }
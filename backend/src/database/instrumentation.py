@@ -0,0 +1,110 @@
+"""
+Instrumentação de banco por requisição: quantidade de queries e tempo gasto
+
+Cada requisição HTTP recebe um DBStats (via contextvar). Os eventos do
+SQLAlchemy somam nele, e o middleware devolve os números nos headers
+X-DB-Query-Count / X-DB-Time-Ms / Server-Timing e agrega por rota.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class DBStats:
+    queries: int = 0
+    db_time: float = 0.0
+
+
+@dataclass
+class RouteDBMetrics:
+    requests: int = 0
+    queries: int = 0
+    db_time: float = 0.0
+    max_db_time: float = 0.0
+
+
+_current_stats: ContextVar[Optional[DBStats]] = ContextVar("db_stats", default=None)
+
+_route_metrics: Dict[str, RouteDBMetrics] = {}
+_route_metrics_lock = threading.Lock()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registra os listeners que contam queries e tempo no DBStats corrente"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+def get_route_metrics() -> Dict[str, dict]:
+    """Agregado por rota (ordem: maior tempo de banco primeiro)"""
+    with _route_metrics_lock:
+        items = sorted(_route_metrics.items(), key=lambda kv: kv[1].db_time, reverse=True)
+        return {
+            route: {
+                "requests": m.requests,
+                "queries": m.queries,
+                "avg_queries": round(m.queries / m.requests, 2) if m.requests else 0,
+                "db_time_ms": round(m.db_time * 1000, 2),
+                "avg_db_time_ms": round(m.db_time * 1000 / m.requests, 2) if m.requests else 0,
+                "max_db_time_ms": round(m.max_db_time * 1000, 2),
+            }
+            for route, m in items
+        }
+
+
+def _record(route: str, stats: DBStats) -> None:
+    with _route_metrics_lock:
+        metrics = _route_metrics.setdefault(route, RouteDBMetrics())
+        metrics.requests += 1
+        metrics.queries += stats.queries
+        metrics.db_time += stats.db_time
+        metrics.max_db_time = max(metrics.max_db_time, stats.db_time)
+
+
+class DBMetricsMiddleware:
+    """Middleware ASGI que abre um DBStats por requisição e publica os números"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = DBStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                db_ms = stats.db_time * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.queries).encode()))
+                headers.append((b"x-db-time-ms", f"{db_ms:.2f}".encode()))
+                headers.append((b"server-timing", f"db;dur={db_ms:.2f}".encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                _record(f"{scope['method']} {route.path}", stats)
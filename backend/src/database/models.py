@@ -3,19 +3,27 @@ from datetime import datetime
 from enum import Enum
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Computed,
+    Date,
     DateTime,
+    Float,
     String,
     Integer,
     Numeric,
     Enum as SQLEnum,
     Text,
     ForeignKey,
+    Index,
     UniqueConstraint,
+    cast,
+    func,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 
 from .db import Base
 
@@ -60,6 +68,9 @@ class Properties(Base):
     has_garden = Column(Boolean, nullable=False, default=False)
     furnished = Column(Boolean, nullable=False, default=False)
 
+    latitude = Column(Numeric(10, 8), nullable=True)
+    longitude = Column(Numeric(11, 8), nullable=True)
+
     status = Column(
         SQLEnum(PropertyStatus, name="property_status"),
         nullable=False,
@@ -69,12 +80,42 @@ class Properties(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Busca textual (config pt_unaccent = portuguese + unaccent), gerada pelo banco
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('pt_unaccent', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('pt_unaccent', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
     images = relationship(
         "PropertyImages",
         back_populates="property",
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # Paginação por cursor (created_at, id) na listagem de imóveis
+        Index("ix_properties_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_properties_status_created_at_id", "status", created_at.desc(), id.desc()),
+        # Busca por cidade com ILIKE '%...%' (requer extensão pg_trgm)
+        Index(
+            "ix_properties_city_trgm",
+            "city",
+            postgresql_using="gin",
+            postgresql_ops={"city": "gin_trgm_ops"},
+        ),
+        Index("ix_properties_search_vector", "search_vector", postgresql_using="gin"),
+        # Busca por área do mapa (point <@ box)
+        Index(
+            "ix_properties_geo_point",
+            func.point(cast(longitude, Float), cast(latitude, Float)),
+            postgresql_using="gist",
+        ),
+    )
+
 
 class PropertyImages(Base):
     __tablename__ = "property_images"
@@ -87,8 +128,15 @@ class PropertyImages(Base):
         index=True
     )
     image_url = Column(Text, nullable=False)
+    is_primary = Column(Boolean, nullable=False, default=False, server_default="false")
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # Preenchidos em background (src/services/images.py)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    # [{"name": "thumb|card|full", "format": "webp|avif", "width", "height", "url"}]
+    variants = Column(JSONB, nullable=True)
+
     property = relationship("Properties", back_populates="images")
 
 
@@ -130,6 +178,26 @@ class Leads(Base):
     lost_at = Column(DateTime, nullable=True)
 
 
+class LeadDailyStatusCounts(Base):
+    """Rollup diário de leads por status (mantido por trigger em leads)"""
+    __tablename__ = "lead_daily_status_counts"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String(50), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+
+class LeadDailyClosedDeals(Base):
+    """Rollup diário de negócios fechados por corretor (mantido por trigger em leads)"""
+    __tablename__ = "lead_daily_closed_deals"
+
+    day = Column(Date, primary_key=True)
+    # UUID nulo (000...0) = lead fechado sem corretor atribuído
+    assigned_to = Column(UUID(as_uuid=True), primary_key=True)
+    closed_deals = Column(Integer, nullable=False, default=0)
+    total_value = Column(Numeric(15, 2), nullable=False, default=0)
+
+
 class LeadMessages(Base):
     __tablename__ = "lead_messages"
 
@@ -177,12 +245,23 @@ class Conversations(Base):
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Última mensagem desnormalizada (mantida por trigger em messages)
+    last_message_id = Column(UUID(as_uuid=True), nullable=True)
+    last_message_preview = Column(String(200), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+
     messages = relationship(
         "Messages",
         back_populates="conversation",
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        # Inbox paginado por cursor (updated_at, id), com e sem filtro de corretor
+        Index('ix_conversations_updated_at_id', updated_at.desc(), id.desc()),
+        Index('ix_conversations_assigned_updated_at_id', 'assigned_to', updated_at.desc(), id.desc()),
+    )
+
 
 class Messages(Base):
     __tablename__ = "messages"
@@ -208,6 +287,11 @@ class Messages(Base):
 
     conversation = relationship("Conversations", back_populates="messages")
 
+    __table_args__ = (
+        # Sincronização incremental por cursor (after/before) dentro da conversa
+        Index('ix_messages_conversation_created_at_id', 'conversation_id', 'created_at', 'id'),
+    )
+
 
 class Favorites(Base):
     """Modelo para favoritos do usuário"""
@@ -224,6 +308,9 @@ class Favorites(Base):
     __table_args__ = (
         # Constraint única: um usuário não pode favoritar o mesmo imóvel duas vezes para o mesmo lead
         UniqueConstraint('user_id', 'property_id', 'lead_id', name='uq_user_property_lead_favorite'),
+        # Listagem paginada dos favoritos do usuário / do lead
+        Index('ix_favorites_user_created_at', 'user_id', created_at.desc(), id.desc()),
+        Index('ix_favorites_lead_user_created_at', 'lead_id', 'user_id', created_at.desc(), id.desc()),
     )
 
 
@@ -258,3 +345,77 @@ class UserSettings(Base):
         # Constraint única: um usuário só pode ter um registro de configurações
         UniqueConstraint('user_id', name='uq_user_settings'),
     )
+
+
+class OutboxEvents(Base):
+    """Outbox transacional: efeitos colaterais gravados junto com a transação de negócio"""
+    __tablename__ = "outbox_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    task = Column(String(50), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    # pending -> processing -> (apagado ao concluir) | failed
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Busca dos próximos eventos prontos (FOR UPDATE SKIP LOCKED)
+        Index('ix_outbox_events_status_available_at', 'status', 'available_at'),
+    )
+
+
+class GeoIPCache(Base):
+    """Cache persistente de GeoIP, por IP exato ou por prefixo (/24 no IPv4, /48 no IPv6)"""
+    __tablename__ = "geoip_cache"
+
+    key = Column(String(64), primary_key=True)
+    city = Column(String(100), nullable=True)
+    state = Column(String(100), nullable=True)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Blobs(Base):
+    """
+    Arquivo enviado, endereçado pelo SHA-256 do conteúdo (uploads/blobs/)
+
+    refcount é mantido por triggers em property_images.image_url e
+    messages.file_url; blobs sem referência são removidos pelo GC
+    (src/services/blobs.py) depois de BLOB_GC_GRACE.
+    """
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    ext = Column(String(16), nullable=False, default="", server_default="")
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    # Conteúdo conferido (hash calculado pela API ou objeto verificado no storage);
+    # antes disso size/ext são só o que o cliente declarou
+    verified = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Último upload do conteúdo ou última vez que ficou sem referências
+    touched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_blobs_unreferenced", "touched_at", postgresql_where=text("refcount <= 0")),
+    )
+
+
+class WsBroadcastSpill(Base):
+    """
+    Envelopes de broadcast grandes demais para o NOTIFY (src/websocket/broadcast.py)
+
+    O NOTIFY leva só o id; cada worker lê o envelope daqui. Tabela UNLOGGED
+    na migração (conteúdo efêmero), limpa após WS_BROADCAST_SPILL_TTL.
+    """
+    __tablename__ = "ws_broadcast_spill"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ws_broadcast_spill_created_at", "created_at"),
+    )
@@ -0,0 +1,91 @@
+"""
+Listener de NOTIFY do PostgreSQL para invalidar caches do processo
+
+Uma única thread com conexão dedicada (fora do pool) faz LISTEN em todos
+os canais registrados com listen(canal, callback). O callback recebe o
+payload do NOTIFY, ou None logo após (re)conectar: nesse caso avisos podem
+ter sido perdidos e o cache deve ser descartado/recarregado por inteiro.
+"""
+import logging
+import select
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from .db import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 5.0
+
+Callback = Callable[[Optional[str]], None]
+
+_callbacks: Dict[str, List[Callback]] = {}
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def listen(channel: str, callback: Callback) -> None:
+    """Registra um callback para o canal (antes de start_notify_listener)"""
+    _callbacks.setdefault(channel, []).append(callback)
+
+
+def _dispatch(channel: str, payload: Optional[str]) -> None:
+    for callback in _callbacks.get(channel, []):
+        try:
+            callback(payload)
+        except Exception:
+            logger.exception("NOTIFY %s: falha no callback", channel)
+
+
+def _listen_once(listen_engine) -> None:
+    conn = listen_engine.raw_connection()
+    try:
+        raw = conn.driver_connection
+        raw.set_session(autocommit=True)
+        with raw.cursor() as cursor:
+            for channel in _callbacks:
+                cursor.execute(f"LISTEN {channel}")
+
+        # Resincroniza após o LISTEN para não perder avisos do intervalo
+        for channel in _callbacks:
+            _dispatch(channel, None)
+
+        while not _stop.is_set():
+            if select.select([raw], [], [], 5.0) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                _dispatch(notify.channel, notify.payload or None)
+    finally:
+        conn.close()
+
+
+def _run() -> None:
+    listen_engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    try:
+        while not _stop.is_set():
+            try:
+                _listen_once(listen_engine)
+            except Exception:
+                logger.exception("NOTIFY: conexão de LISTEN caiu, reconectando")
+                _stop.wait(RECONNECT_DELAY)
+    finally:
+        listen_engine.dispose()
+
+
+def start_notify_listener() -> None:
+    global _thread
+
+    if not _callbacks or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="pg-notify-listener", daemon=True)
+    _thread.start()
+
+
+def stop_notify_listener() -> None:
+    _stop.set()
@@ -0,0 +1,69 @@
+"""
+Cache de metadados do schema (tabelas -> colunas) compartilhado pelo processo
+
+Carregado uma vez no startup e recarregado quando uma migration roda: o
+alembic/env.py emite NOTIFY schema_changed ao final do upgrade/downgrade e
+o listener de notify.py recarrega o cache. Assim nenhuma requisição precisa
+consultar o information_schema.
+"""
+import logging
+import threading
+from typing import Dict, FrozenSet
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .db import engine
+from .notify import listen
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CHANGED_CHANNEL = "schema_changed"
+
+_columns: Dict[str, FrozenSet[str]] = {}
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_schema(bind: Engine = engine) -> None:
+    """(Re)carrega todas as colunas do schema public numa única consulta"""
+    global _columns, _loaded
+
+    with bind.connect() as conn:
+        rows = conn.execute(
+            text(
+                """
+                SELECT table_name, column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                """
+            )
+        ).all()
+
+    columns: Dict[str, set] = {}
+    for table_name, column_name in rows:
+        columns.setdefault(table_name, set()).add(column_name)
+
+    with _lock:
+        _columns = {table: frozenset(cols) for table, cols in columns.items()}
+        _loaded = True
+
+    logger.info("Schema cache carregado: %d tabelas", len(_columns))
+
+
+def get_columns(table_name: str) -> FrozenSet[str]:
+    """Colunas conhecidas de uma tabela (vazio se a tabela não existe)"""
+    if not _loaded:
+        # Fallback para uso fora do app (scripts); no servidor o startup já carregou
+        load_schema()
+    return _columns.get(table_name, frozenset())
+
+
+def column_exists(table_name: str, column_name: str) -> bool:
+    return column_name in get_columns(table_name)
+
+
+def start_schema_listener() -> None:
+    """Carrega o cache e assina NOTIFY schema_changed (ver notify.py)"""
+    load_schema()
+    listen(SCHEMA_CHANGED_CHANNEL, lambda _payload: load_schema())
@@ -1,13 +1,17 @@
 from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlalchemy import desc, func
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database.db import SessionLocal
+from src.controllers.messagesController import MESSAGES_DEFAULT_LIMIT, MESSAGES_MAX_LIMIT, get_message_page
+from src.database.db import get_async_db, get_db
+from src.database.pagination import decode_cursor, encode_cursor
 from src.database.models import Conversations, Messages, Leads
+from src.services.read_receipts import read_receipts
 from src.websocket.manager import manager
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
@@ -15,14 +19,6 @@ router = APIRouter(prefix="/conversations", tags=["Conversations"])
 ALLOWED_SENDER_TYPES = {"corretor", "cliente", "sistema"}
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # ---------- Schemas ----------
 
 class ConversationOut(BaseModel):
@@ -62,64 +58,75 @@ class AssignPayload(BaseModel):
 # ---------- Endpoints ----------
 
 @router.get("", response_model=list[ConversationOut])
-def list_conversations(assigned_to: str | None = None, db: Session = Depends(get_db)):
-    sub = (
-        db.query(
-            Messages.conversation_id.label("conversation_id"),
-            func.max(Messages.created_at).label("last_message_at"),
-        )
-        .group_by(Messages.conversation_id)
-        .subquery()
-    )
-
+def list_conversations(
+    response: Response,
+    assigned_to: str | None = None,
+    cursor: str | None = Query(None, description="Valor de X-Next-Cursor da página anterior"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """Inbox ordenado por updated_at (cursor em X-Next-Cursor)"""
     q = (
-        db.query(Conversations, Messages.content, Messages.created_at, Leads.name)
-        .outerjoin(sub, sub.c.conversation_id == Conversations.id)
-        .outerjoin(
-            Messages,
-            (Messages.conversation_id == Conversations.id)
-            & (Messages.created_at == sub.c.last_message_at),
-        )
+        db.query(Conversations, Leads.name)
         .outerjoin(Leads, Leads.id == Conversations.lead_id)
-        .order_by(desc(Conversations.updated_at))
     )
 
     if assigned_to:
         q = q.filter(Conversations.assigned_to == assigned_to)
 
+    if cursor:
+        cursor_updated_at, cursor_id = decode_cursor(cursor)
+        q = q.filter(
+            tuple_(Conversations.updated_at, Conversations.id) < tuple_(cursor_updated_at, cursor_id)
+        )
+
+    rows = (
+        q.order_by(Conversations.updated_at.desc(), Conversations.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.updated_at, last.id)
+
     return [
         ConversationOut(
             id=conv.id,
             lead_name=lead_name,
-            last_message=last_content,
-            last_message_at=last_at,
+            last_message=conv.last_message_preview,
+            last_message_at=conv.last_message_at,
             is_archived=conv.is_archived,
             is_read=conv.is_read,
             unread_count=conv.unread_count,
             assigned_to=conv.assigned_to,
         )
-        for conv, last_content, last_at, lead_name in q.all()
+        for conv, lead_name in rows
     ]
 
 
 @router.get("/{conversation_id}/messages", response_model=list[MessageOut])
-def list_messages(conversation_id: UUID, db: Session = Depends(get_db)):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
+def list_messages(
+    conversation_id: UUID,
+    response: Response,
+    after: str | None = Query(None, description="id de mensagem ou timestamp ISO"),
+    before: str | None = Query(None, description="id de mensagem ou timestamp ISO"),
+    limit: int = Query(MESSAGES_DEFAULT_LIMIT, ge=1, le=MESSAGES_MAX_LIMIT),
+    db: Session = Depends(get_db),
+):
+    conv = db.query(Conversations.id).filter(Conversations.id == conversation_id).first()
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    msgs = (
-        db.query(Messages)
-        .filter(Messages.conversation_id == conversation_id)
-        .order_by(Messages.created_at.asc())
-        .all()
-    )
+    msgs, has_more = get_message_page(db, conversation_id, after, before, limit)
+    response.headers["X-Has-More"] = "true" if has_more else "false"
     return msgs
 
 
 @router.post("/{conversation_id}/messages", response_model=MessageOut)
-async def send_message(conversation_id: UUID, payload: MessageCreate, db: Session = Depends(get_db)):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
+async def send_message(conversation_id: UUID, payload: MessageCreate, db: AsyncSession = Depends(get_async_db)):
+    conv = await db.get(Conversations, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -139,8 +146,8 @@ async def send_message(conversation_id: UUID, payload: MessageCreate, db: Sessio
         conv.is_read = False
 
     conv.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(msg)
+    await db.commit()
+    await db.refresh(msg)
 
     await manager.send_conversation_message(
         {
@@ -161,38 +168,23 @@ async def send_message(conversation_id: UUID, payload: MessageCreate, db: Sessio
 
 
 @router.patch("/{conversation_id}/read")
-def mark_as_read(conversation_id: UUID, db: Session = Depends(get_db)):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
-    if not conv:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-
-    conv.is_read = True
-    conv.unread_count = 0
-    db.commit()
-    return {"ok": True}
-
-
 @router.patch("/{conversation_id}/read-messages")
-async def mark_messages_read(conversation_id: UUID, db: Session = Depends(get_db)):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
+async def mark_messages_read(
+    conversation_id: UUID,
+    up_to: UUID | None = Query(None, description="Confirma a leitura até esta mensagem (inclusive)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    /read é mantido por compatibilidade e usa a mesma regra: unread_count e
+    is_read vêm das mensagens que continuam não lidas após o recibo
+    """
+    conv = await db.get(Conversations, conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    await db.close()
 
-    now = datetime.utcnow()
-    db.query(Messages).filter(
-        Messages.conversation_id == conversation_id,
-        Messages.sender_type == "cliente",
-        Messages.status != "read",
-    ).update({"status": "read", "read_at": now})
-
-    conv.is_read = True
-    conv.unread_count = 0
-    db.commit()
-
-    await manager.send_conversation_message(
-        {"type": "messages_read", "conversation_id": str(conversation_id)},
-        str(conversation_id),
-    )
+    # Entra no lote de recibos; o evento messages_read sai uma vez por lote
+    await read_receipts.ack(conversation_id, up_to)
 
     return {"ok": True}
 
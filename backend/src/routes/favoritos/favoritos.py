@@ -2,17 +2,18 @@
 Rotas para favoritos do usuário
 """
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer, selectinload
 from sqlalchemy.exc import IntegrityError
 
 from src.database.db import SessionLocal
-from src.database.models import Favorites, Properties, Users
+from src.database.models import Favorites, Properties, PropertyImages, Users
 from src.auth import get_current_user, get_db
+from src.services.images import build_srcset, variant_url
 
 # Router para endpoints de favoritos
 router = APIRouter(prefix="/favorites", tags=["Favorites"])
@@ -29,6 +30,8 @@ class PropertyImageResponse(BaseModel):
     """Schema para imagem do imóvel"""
     id: str
     image_url: str
+    thumbnail_url: Optional[str] = None
+    srcset: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -38,7 +41,7 @@ class FavoritePropertyResponse(BaseModel):
     """Schema para dados do imóvel no favorito"""
     id: str
     title: str
-    description: str
+    description: Optional[str] = None
     price: float
     city: str
     bedrooms: int
@@ -66,52 +69,120 @@ class FavoriteResponse(BaseModel):
         from_attributes = True
 
 
+def _primary_images(db: Session, property_ids: List[UUID]) -> Dict[UUID, PropertyImages]:
+    """Uma imagem por imóvel (a principal, senão a mais antiga) em uma única query"""
+    if not property_ids:
+        return {}
+    images = (
+        db.query(PropertyImages)
+        .filter(PropertyImages.property_id.in_(property_ids))
+        .distinct(PropertyImages.property_id)
+        .order_by(
+            PropertyImages.property_id,
+            PropertyImages.is_primary.desc(),
+            PropertyImages.created_at.asc(),
+        )
+        .all()
+    )
+    return {img.property_id: img for img in images}
+
+
+def _property_response(property_obj: Properties, images: List[PropertyImages], slim: bool = False) -> FavoritePropertyResponse:
+    return FavoritePropertyResponse(
+        id=str(property_obj.id),
+        title=property_obj.title,
+        description=None if slim else property_obj.description,
+        price=float(property_obj.price),
+        city=property_obj.city,
+        bedrooms=property_obj.bedrooms,
+        bathrooms=property_obj.bathrooms,
+        area=float(property_obj.area),
+        parking_spaces=property_obj.parking_spaces,
+        has_pool=property_obj.has_pool,
+        has_garden=property_obj.has_garden,
+        furnished=property_obj.furnished,
+        status=property_obj.status.value,
+        images=[
+            PropertyImageResponse(
+                id=str(img.id),
+                image_url=img.image_url,
+                thumbnail_url=variant_url(img.variants, "thumb"),
+                srcset=build_srcset(img.variants),
+            ) for img in images
+        ]
+    )
+
+
+def _list_favorites(
+    db: Session,
+    response: Response,
+    filters: list,
+    page: int,
+    limit: int,
+    slim: bool,
+) -> List[FavoriteResponse]:
+    """
+    Favoritos + imóveis em uma query (JOIN) e imagens em mais uma
+    (selectinload ou só a principal quando slim), independente da quantidade.
+    O total vai no header X-Total-Count.
+    """
+    total = db.query(Favorites).filter(*filters).count()
+    response.headers["X-Total-Count"] = str(total)
+
+    query = (
+        db.query(Favorites, Properties)
+        .join(Properties, Properties.id == Favorites.property_id)
+        .filter(*filters)
+        .order_by(Favorites.created_at.desc(), Favorites.id.desc())
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+    if slim:
+        query = query.options(defer(Properties.description))
+    else:
+        query = query.options(selectinload(Properties.images))
+
+    rows = query.all()
+
+    if slim:
+        primary = _primary_images(db, [property_obj.id for _, property_obj in rows])
+        images_by_property = {
+            property_obj.id: [primary[property_obj.id]] if property_obj.id in primary else []
+            for _, property_obj in rows
+        }
+    else:
+        images_by_property = {property_obj.id: property_obj.images for _, property_obj in rows}
+
+    return [
+        FavoriteResponse(
+            id=str(fav.id),
+            property_id=str(fav.property_id),
+            created_at=fav.created_at,
+            property=_property_response(property_obj, images_by_property[property_obj.id], slim),
+        )
+        for fav, property_obj in rows
+    ]
+
+
 @router.get("/", response_model=List[FavoriteResponse])
 def list_favorites(
+    response: Response,
+    page: int = Query(1, ge=1, description="Página atual (mínimo 1)"),
+    limit: int = Query(50, ge=1, le=200, description="Itens por página (1-200)"),
+    slim: bool = Query(False, description="Sem descrição e só com a imagem principal"),
     current_user: Users = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Listar favoritos do usuário autenticado com dados dos imóveis"""
-    favorites = (
-        db.query(Favorites)
-        .filter(Favorites.user_id == current_user.id)
-        .all()
+    return _list_favorites(
+        db,
+        response,
+        [Favorites.user_id == current_user.id],
+        page,
+        limit,
+        slim,
     )
 
-    result = []
-    for fav in favorites:
-        # Buscar dados do imóvel
-        property_obj = db.query(Properties).filter(Properties.id == fav.property_id).first()
-        if property_obj:
-            result.append(FavoriteResponse(
-                id=str(fav.id),
-                property_id=str(fav.property_id),
-                created_at=fav.created_at,
-                property=FavoritePropertyResponse(
-                    id=str(property_obj.id),
-                    title=property_obj.title,
-                    description=property_obj.description,
-                    price=float(property_obj.price),
-                    city=property_obj.city,
-                    bedrooms=property_obj.bedrooms,
-                    bathrooms=property_obj.bathrooms,
-                    area=float(property_obj.area),
-                    parking_spaces=property_obj.parking_spaces,
-                    has_pool=property_obj.has_pool,
-                    has_garden=property_obj.has_garden,
-                    furnished=property_obj.furnished,
-                    status=property_obj.status.value,
-                    images=[
-                        PropertyImageResponse(
-                            id=str(img.id),
-                            image_url=img.image_url
-                        ) for img in property_obj.images
-                    ]
-                )
-            ))
-
-    return result
-
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 def add_favorite(
@@ -228,6 +299,10 @@ def check_favorite(
 @router.get("/leads/{lead_id}", response_model=List[FavoriteResponse])
 def list_lead_favorites(
     lead_id: str,
+    response: Response,
+    page: int = Query(1, ge=1, description="Página atual (mínimo 1)"),
+    limit: int = Query(50, ge=1, le=200, description="Itens por página (1-200)"),
+    slim: bool = Query(False, description="Sem descrição e só com a imagem principal"),
     current_user: Users = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -245,49 +320,15 @@ def list_lead_favorites(
         raise HTTPException(status_code=404, detail="Lead não encontrado")
 
     # Buscar favoritos do lead
-    favorites = (
-        db.query(Favorites)
-        .filter(
-            Favorites.user_id == current_user.id,
-            Favorites.lead_id == lead_uuid
-        )
-        .all()
+    return _list_favorites(
+        db,
+        response,
+        [Favorites.user_id == current_user.id, Favorites.lead_id == lead_uuid],
+        page,
+        limit,
+        slim,
     )
 
-    result = []
-    for fav in favorites:
-        # Buscar dados do imóvel
-        property_obj = db.query(Properties).filter(Properties.id == fav.property_id).first()
-        if property_obj:
-            result.append(FavoriteResponse(
-                id=str(fav.id),
-                property_id=str(fav.property_id),
-                created_at=fav.created_at,
-                property=FavoritePropertyResponse(
-                    id=str(property_obj.id),
-                    title=property_obj.title,
-                    description=property_obj.description,
-                    price=float(property_obj.price),
-                    city=property_obj.city,
-                    bedrooms=property_obj.bedrooms,
-                    bathrooms=property_obj.bathrooms,
-                    area=float(property_obj.area),
-                    parking_spaces=property_obj.parking_spaces,
-                    has_pool=property_obj.has_pool,
-                    has_garden=property_obj.has_garden,
-                    furnished=property_obj.furnished,
-                    status=property_obj.status.value,
-                    images=[
-                        PropertyImageResponse(
-                            id=str(img.id),
-                            image_url=img.image_url
-                        ) for img in property_obj.images
-                    ]
-                )
-            ))
-
-    return result
-
 
 @router.post("/{favorite_id}/generate-link", response_model=dict)
 def generate_public_link(
@@ -362,24 +403,4 @@ def get_public_favorites(
     if not property_obj:
         raise HTTPException(status_code=404, detail="Imóvel não encontrado")
 
-    return [FavoritePropertyResponse(
-        id=str(property_obj.id),
-        title=property_obj.title,
-        description=property_obj.description,
-        price=float(property_obj.price),
-        city=property_obj.city,
-        bedrooms=property_obj.bedrooms,
-        bathrooms=property_obj.bathrooms,
-        area=float(property_obj.area),
-        parking_spaces=property_obj.parking_spaces,
-        has_pool=property_obj.has_pool,
-        has_garden=property_obj.has_garden,
-        furnished=property_obj.furnished,
-        status=property_obj.status.value,
-        images=[
-            PropertyImageResponse(
-                id=str(img.id),
-                image_url=img.image_url
-            ) for img in property_obj.images
-        ]
-    )]
+    return [_property_response(property_obj, property_obj.images)]
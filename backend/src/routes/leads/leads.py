@@ -10,7 +10,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from src.database.db import SessionLocal
+from src.database.db import get_db
+from src.controllers.dashboardController import invalidate_dashboard_cache
 from src.database.models import Leads, LeadMessages, Properties, LeadStatus
 
 # Router para endpoints de leads
@@ -82,15 +83,6 @@ class UpdateLeadRequest(BaseModel):
     convert: Optional[bool] = None
 
 
-def get_db():
-    """Dependency para obter sessão do banco de dados"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/", response_model=LeadListPaginatedResponse)
 def list_leads(
     status: Optional[str] = Query(None, description="Filtrar por status do lead"),
@@ -239,6 +231,9 @@ def update_lead(lead_id: str, request: UpdateLeadRequest, db: Session = Depends(
     db.commit()
     db.refresh(lead)
 
+    # Os rollups já foram atualizados pelo trigger; o overview em cache não
+    invalidate_dashboard_cache()
+
     # Buscar dados relacionados para resposta
     property_data = None
     if lead.property_id:
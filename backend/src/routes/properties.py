@@ -1,20 +1,51 @@
 """
 Rotas para listagem de imóveis (público)
 """
+import math
 import uuid
 from decimal import Decimal
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
+from sqlalchemy import Float, String, and_, case, cast, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from sqlalchemy.orm import Session, joinedload
 
-from src.database.db import SessionLocal
+from src.database.db import get_db
 from src.database.models import Properties, PropertyStatus
+from src.database.pagination import decode_cursor, encode_cursor
+from src.services.cache import TTLCache
+from src.services.images import build_srcset, variant_url
 
 # Router para endpoints públicos de imóveis
 router = APIRouter(prefix="/properties", tags=["Imóveis"])
 
+# Acima disso, o total sem filtros vem da estimativa do planner (pg_class.reltuples)
+TOTAL_ESTIMATE_THRESHOLD = 10000
+
+# Totais por combinação de filtros, para não contar a tabela a cada página
+_total_cache = TTLCache(maxsize=512, ttl=60)
+
+# Configuração de full-text criada na migração (portuguese + unaccent)
+SEARCH_CONFIG = "pt_unaccent"
+
+# Faixas de preço da faceta "price" (limite superior exclusivo, None = sem teto)
+PRICE_BUCKETS = [
+    (0, 200000),
+    (200000, 500000),
+    (500000, 1000000),
+    (1000000, 2000000),
+    (2000000, None),
+]
+
+# Mapa: abaixo deste zoom os pontos são agrupados em clusters
+CLUSTER_MAX_ZOOM = 15
+# Células de cluster por tile de 256px (~64px por cluster)
+CLUSTER_CELLS_PER_TILE = 4
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
 
 # Schemas para resposta
 class PropertyResponse(BaseModel):
@@ -34,9 +65,65 @@ class PropertyResponse(BaseModel):
 
 
 class PropertiesListResponse(BaseModel):
-    """Schema para resposta da lista de imóveis"""
+    """Schema para resposta da lista de imóveis (paginada por cursor)"""
+    data: List[PropertyResponse]
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+    # Por status (AVAILABLE, SOLD, RESERVED); None quando o total é estimado
+    status_counts: Optional[Dict[str, int]] = None
+    next_cursor: Optional[str] = None
+
+
+class FacetCount(BaseModel):
+    """Valor de faceta e quantidade de imóveis"""
+    value: str
+    count: int
+
+
+class SearchFacets(BaseModel):
+    """Contagens de facetas sobre o resultado filtrado da busca"""
+    city: List[FacetCount]
+    bedrooms: List[FacetCount]
+    price: List[FacetCount]
+    status: List[FacetCount]
+    has_pool: int
+    has_garden: int
+    furnished: int
+
+
+class PropertySearchResponse(BaseModel):
+    """Schema para resposta da busca textual com facetas"""
     data: List[PropertyResponse]
     total: int
+    page: int
+    limit: int
+    facets: SearchFacets
+
+
+class GeoPoint(BaseModel):
+    """Imóvel individual no mapa (projeção enxuta)"""
+    id: str
+    title: str
+    price: float
+    city: str
+    status: str
+    latitude: float
+    longitude: float
+
+
+class GeoCluster(BaseModel):
+    """Agrupamento de imóveis próximos para zooms afastados"""
+    latitude: float
+    longitude: float
+    count: int
+    property_id: Optional[str] = None
+
+
+class PropertyGeoResponse(BaseModel):
+    """Schema para resposta da busca geográfica (pontos ou clusters)"""
+    points: List[GeoPoint] = []
+    clusters: List[GeoCluster] = []
+    truncated: bool = False
 
 
 class PropertyImageResponse(BaseModel):
@@ -44,6 +131,13 @@ class PropertyImageResponse(BaseModel):
     id: str
     image_url: str
 
+    # derivados (vazios até o processamento em background terminar)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    srcset: Optional[str] = None
+    srcset_avif: Optional[str] = None
+
     class Config:
         from_attributes = True
 
@@ -77,13 +171,37 @@ class PropertyDetailResponse(BaseModel):
         from_attributes = True
 
 
-def get_db():
-    """Dependency para obter sessão do banco de dados"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def invalidate_property_totals() -> None:
+    """Chamado pelas rotas que criam/alteram/removem imóveis"""
+    _total_cache.clear()
+
+
+def _count_total(
+    db: Session, query, cache_key: tuple, has_filters: bool
+) -> Tuple[int, bool, Optional[Dict[str, int]]]:
+    """
+    Total de imóveis para a listagem: estimativa do planner quando não há
+    filtros e a tabela é grande, senão COUNT exato por status guardado em
+    cache. Retorna (total, is_estimate, status_counts).
+    """
+    if not has_filters:
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'properties'::regclass")
+        ).scalar() or 0
+        if estimate >= TOTAL_ESTIMATE_THRESHOLD:
+            return int(estimate), True, None
+
+    def count_by_status() -> Dict[str, int]:
+        rows = (
+            query.order_by(None)
+            .with_entities(Properties.status, func.count())
+            .group_by(Properties.status)
+            .all()
+        )
+        return {status_value.value: count for status_value, count in rows}
+
+    status_counts = _total_cache.get_or_set(cache_key, count_by_status)
+    return sum(status_counts.values()), False, status_counts
 
 
 @router.get("/", response_model=PropertiesListResponse)
@@ -92,17 +210,23 @@ def get_properties(
     min_price: Optional[float] = Query(None, alias="minPrice", description="Preço mínimo"),
     max_price: Optional[float] = Query(None, alias="maxPrice", description="Preço máximo"),
     bedrooms: Optional[int] = Query(None, description="Número de quartos"),
-    status: Optional[str] = Query(None, description="Status do imóvel (AVAILABLE, SOLD, RESERVED)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Status do imóvel (AVAILABLE, SOLD, RESERVED)"),
+    cursor: Optional[str] = Query(None, description="Cursor retornado em next_cursor da página anterior"),
+    limit: int = Query(20, ge=1, le=100, description="Itens por página (1-100)"),
+    include_total: bool = Query(True, alias="includeTotal", description="Calcular o total (estimado/cacheado)"),
     db: Session = Depends(get_db)
 ):
     """
-    Lista imóveis com filtros opcionais
+    Lista imóveis com filtros opcionais e paginação por cursor
 
     - **city**: Filtra por cidade (ex: São Paulo)
     - **minPrice**: Preço mínimo
     - **maxPrice**: Preço máximo
     - **bedrooms**: Número exato de quartos
     - **status**: Status do imóvel
+    - **cursor**: Cursor da próxima página (`next_cursor` da resposta anterior)
+    - **limit**: Itens por página
+    - **includeTotal**: Se falso, não calcula `total`
     """
 
     # Construir query base
@@ -121,10 +245,10 @@ def get_properties(
     if bedrooms is not None:
         query = query.filter(Properties.bedrooms == bedrooms)
 
-    if status:
+    if status_filter:
         # Validar se o status é válido
         try:
-            status_enum = PropertyStatus(status.upper())
+            status_enum = PropertyStatus(status_filter.upper())
             query = query.filter(Properties.status == status_enum)
         except ValueError:
             raise HTTPException(
@@ -132,12 +256,34 @@ def get_properties(
                 detail=f"Status inválido. Valores aceitos: {[s.value for s in PropertyStatus]}"
             )
 
-    # Ordenar por data de criação (mais recentes primeiro)
-    query = query.order_by(Properties.created_at.desc())
+    # Total calculado antes do cursor (vale para todas as páginas)
+    total = None
+    total_is_estimate = False
+    status_counts = None
+    if include_total:
+        cache_key = (city, min_price, max_price, bedrooms, status_filter and status_filter.upper())
+        has_filters = any(value is not None and value != "" for value in cache_key)
+        total, total_is_estimate, status_counts = _count_total(db, query, cache_key, has_filters)
+
+    # Keyset: continuar a partir do último (created_at, id) visto
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Properties.created_at, Properties.id) < tuple_(cursor_created_at, cursor_id)
+        )
 
-    # Executar query
-    properties = query.all()
-    total = len(properties)
+    # Ordenar por data de criação (mais recentes primeiro), id como desempate
+    query = query.order_by(Properties.created_at.desc(), Properties.id.desc())
+
+    # Buscar uma linha a mais para saber se existe próxima página
+    properties = query.limit(limit + 1).all()
+    has_more = len(properties) > limit
+    properties = properties[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = properties[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
 
     # Converter para response models
     properties_data = [
@@ -155,7 +301,301 @@ def get_properties(
         for property in properties
     ]
 
-    return PropertiesListResponse(data=properties_data, total=total)
+    return PropertiesListResponse(
+        data=properties_data,
+        total=total,
+        total_is_estimate=total_is_estimate,
+        status_counts=status_counts,
+        next_cursor=next_cursor,
+    )
+
+
+def _price_bucket_expr():
+    """CASE que classifica o preço nas faixas de PRICE_BUCKETS"""
+    whens = []
+    for low, high in PRICE_BUCKETS:
+        label = f"{int(low)}-{int(high)}" if high is not None else f"{int(low)}+"
+        cond = Properties.price >= low
+        if high is not None:
+            cond = and_(cond, Properties.price < high)
+        whens.append((cond, label))
+    return case(*whens, else_=None)
+
+
+@router.get("/search", response_model=PropertySearchResponse)
+def search_properties(
+    q: Optional[str] = Query(None, description="Texto livre (título e descrição)"),
+    city: Optional[str] = Query(None, description="Filtrar por cidade (sem acento)"),
+    min_price: Optional[float] = Query(None, alias="minPrice", description="Preço mínimo"),
+    max_price: Optional[float] = Query(None, alias="maxPrice", description="Preço máximo"),
+    bedrooms: Optional[int] = Query(None, description="Número de quartos"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Status do imóvel (AVAILABLE, SOLD, RESERVED)"),
+    has_pool: Optional[bool] = Query(None, alias="hasPool", description="Com piscina"),
+    has_garden: Optional[bool] = Query(None, alias="hasGarden", description="Com jardim"),
+    furnished: Optional[bool] = Query(None, description="Mobiliado"),
+    page: int = Query(1, ge=1, description="Página atual (mínimo 1)"),
+    limit: int = Query(20, ge=1, le=100, description="Itens por página (1-100)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca textual ordenada por relevância + contagens de facetas
+
+    Usa a configuração `pt_unaccent` (stemming em português, sem acentos).
+    As facetas (cidade, quartos, faixa de preço, status, piscina/jardim/mobiliado)
+    saem de uma única consulta com GROUPING SETS sobre o conjunto filtrado.
+    """
+    conditions = []
+
+    ts_query = None
+    if q and q.strip():
+        ts_query = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), q.strip())
+        conditions.append(Properties.search_vector.op("@@")(ts_query))
+
+    if city:
+        conditions.append(func.f_unaccent(Properties.city).ilike(func.f_unaccent(f"%{city}%")))
+
+    if min_price is not None:
+        conditions.append(Properties.price >= Decimal(str(min_price)))
+
+    if max_price is not None:
+        conditions.append(Properties.price <= Decimal(str(max_price)))
+
+    if bedrooms is not None:
+        conditions.append(Properties.bedrooms == bedrooms)
+
+    if status_filter:
+        try:
+            conditions.append(Properties.status == PropertyStatus(status_filter.upper()))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Status inválido. Valores aceitos: {[s.value for s in PropertyStatus]}"
+            )
+
+    if has_pool is not None:
+        conditions.append(Properties.has_pool == has_pool)
+
+    if has_garden is not None:
+        conditions.append(Properties.has_garden == has_garden)
+
+    if furnished is not None:
+        conditions.append(Properties.furnished == furnished)
+
+    # Resultados (por relevância quando há texto, senão mais recentes primeiro)
+    query = db.query(Properties).filter(*conditions)
+    if ts_query is not None:
+        rank = func.ts_rank_cd(Properties.search_vector, ts_query)
+        query = query.order_by(rank.desc(), Properties.created_at.desc(), Properties.id.desc())
+    else:
+        query = query.order_by(Properties.created_at.desc(), Properties.id.desc())
+
+    properties = query.offset((page - 1) * limit).limit(limit).all()
+
+    # Facetas: uma varredura do conjunto filtrado, agrupada por cada dimensão
+    filtered = (
+        select(
+            Properties.city.label("city"),
+            Properties.bedrooms.label("bedrooms"),
+            Properties.status.label("status"),
+            _price_bucket_expr().label("price_bucket"),
+            Properties.has_pool.label("has_pool"),
+            Properties.has_garden.label("has_garden"),
+            Properties.furnished.label("furnished"),
+        )
+        .where(*conditions)
+        .subquery()
+    )
+    dims = [filtered.c.city, filtered.c.bedrooms, filtered.c.status, filtered.c.price_bucket]
+    facet_rows = db.execute(
+        select(
+            *dims,
+            *[func.grouping(col).label(f"g_{col.name}") for col in dims],
+            func.count().label("total"),
+            func.count().filter(filtered.c.has_pool).label("has_pool"),
+            func.count().filter(filtered.c.has_garden).label("has_garden"),
+            func.count().filter(filtered.c.furnished).label("furnished"),
+        ).group_by(
+            func.grouping_sets(*[tuple_(col) for col in dims], tuple_())
+        )
+    ).all()
+
+    facets = {"city": [], "bedrooms": [], "price": [], "status": []}
+    total = 0
+    amenities = {"has_pool": 0, "has_garden": 0, "furnished": 0}
+    for row in facet_rows:
+        if row.g_city == 0:
+            facets["city"].append(FacetCount(value=row.city, count=row.total))
+        elif row.g_bedrooms == 0:
+            facets["bedrooms"].append(FacetCount(value=str(row.bedrooms), count=row.total))
+        elif row.g_status == 0:
+            facets["status"].append(FacetCount(value=row.status.value, count=row.total))
+        elif row.g_price_bucket == 0:
+            if row.price_bucket is not None:
+                facets["price"].append(FacetCount(value=row.price_bucket, count=row.total))
+        else:
+            total = row.total
+            amenities = {"has_pool": row.has_pool, "has_garden": row.has_garden, "furnished": row.furnished}
+
+    for key in ("city", "bedrooms", "status"):
+        facets[key].sort(key=lambda f: (-f.count, f.value))
+    bucket_order = {f"{int(low)}-{int(high)}" if high is not None else f"{int(low)}+": i
+                    for i, (low, high) in enumerate(PRICE_BUCKETS)}
+    facets["price"].sort(key=lambda f: bucket_order[f.value])
+
+    return PropertySearchResponse(
+        data=[
+            PropertyResponse(
+                id=str(property.id),
+                title=property.title,
+                description=property.description,
+                price=float(property.price),
+                city=property.city,
+                bedrooms=property.bedrooms,
+                bathrooms=property.bathrooms,
+                area=float(property.area),
+                status=property.status.value
+            )
+            for property in properties
+        ],
+        total=total,
+        page=page,
+        limit=limit,
+        facets=SearchFacets(**facets, **amenities),
+    )
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Converte "oeste,sul,leste,norte" em floats validados"""
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox inválido. Formato: oeste,sul,leste,norte")
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise HTTPException(status_code=400, detail="bbox fora dos limites ou invertido")
+    return west, south, east, north
+
+
+def _radius_bbox(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Retângulo que envolve o círculo (pré-filtro pelo índice GiST)"""
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return (
+        max(lng - dlng, -180.0),
+        max(lat - dlat, -90.0),
+        min(lng + dlng, 180.0),
+        min(lat + dlat, 90.0),
+    )
+
+
+@router.get("/geo", response_model=PropertyGeoResponse)
+def get_properties_geo(
+    bbox: Optional[str] = Query(None, description="Área visível do mapa: oeste,sul,leste,norte"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude do centro (busca por raio)"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude do centro (busca por raio)"),
+    radius_km: Optional[float] = Query(None, alias="radiusKm", gt=0, le=500, description="Raio em km"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Zoom do mapa (abaixo de 15 agrupa em clusters)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Status do imóvel (AVAILABLE, SOLD, RESERVED)"),
+    limit: int = Query(500, ge=1, le=2000, description="Máximo de pontos retornados"),
+    db: Session = Depends(get_db)
+):
+    """
+    Imóveis dentro da área do mapa (bbox) ou de um raio a partir de um ponto
+
+    - **bbox**: oeste,sul,leste,norte
+    - **lat**, **lng**, **radiusKm**: busca por raio
+    - **zoom**: abaixo de CLUSTER_MAX_ZOOM retorna clusters em grade em vez de pontos
+    """
+    if bbox:
+        west, south, east, north = _parse_bbox(bbox)
+    elif lat is not None and lng is not None and radius_km is not None:
+        west, south, east, north = _radius_bbox(lat, lng, radius_km)
+    else:
+        raise HTTPException(status_code=400, detail="Informe bbox ou lat, lng e radiusKm")
+
+    lat_col = cast(Properties.latitude, Float)
+    lng_col = cast(Properties.longitude, Float)
+
+    # Mesmo formato da expressão do índice ix_properties_geo_point
+    conditions = [
+        func.point(lng_col, lat_col).op("<@")(
+            func.box(func.point(west, south), func.point(east, north))
+        )
+    ]
+
+    if not bbox:
+        # Distância exata (haversine) sobre o pré-filtro do retângulo
+        distance_km = 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(
+            func.power(func.sin(func.radians(lat_col - lat) / 2), 2)
+            + func.cos(func.radians(lat)) * func.cos(func.radians(lat_col))
+            * func.power(func.sin(func.radians(lng_col - lng) / 2), 2)
+        ))
+        conditions.append(distance_km <= radius_km)
+
+    if status_filter:
+        try:
+            conditions.append(Properties.status == PropertyStatus(status_filter.upper()))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Status inválido. Valores aceitos: {[s.value for s in PropertyStatus]}"
+            )
+
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        # Clusters em grade: célula em graus para o zoom atual
+        cell = 360.0 / (2 ** zoom * CLUSTER_CELLS_PER_TILE)
+        rows = db.execute(
+            select(
+                func.count().label("count"),
+                func.avg(lat_col).label("latitude"),
+                func.avg(lng_col).label("longitude"),
+                func.min(cast(Properties.id, String)).label("property_id"),
+            )
+            .where(*conditions)
+            .group_by(func.floor(lng_col / cell), func.floor(lat_col / cell))
+        ).all()
+
+        return PropertyGeoResponse(
+            clusters=[
+                GeoCluster(
+                    latitude=float(row.latitude),
+                    longitude=float(row.longitude),
+                    count=row.count,
+                    property_id=row.property_id if row.count == 1 else None,
+                )
+                for row in rows
+            ],
+        )
+
+    rows = db.execute(
+        select(
+            Properties.id,
+            Properties.title,
+            Properties.price,
+            Properties.city,
+            Properties.status,
+            Properties.latitude,
+            Properties.longitude,
+        )
+        .where(*conditions)
+        .order_by(Properties.created_at.desc(), Properties.id.desc())
+        .limit(limit + 1)
+    ).all()
+
+    return PropertyGeoResponse(
+        points=[
+            GeoPoint(
+                id=str(row.id),
+                title=row.title,
+                price=float(row.price),
+                city=row.city,
+                status=row.status.value,
+                latitude=float(row.latitude),
+                longitude=float(row.longitude),
+            )
+            for row in rows[:limit]
+        ],
+        truncated=len(rows) > limit,
+    )
 
 
 @router.get("/{property_id}", response_model=PropertyDetailResponse)
@@ -187,7 +627,15 @@ def get_property_by_id(property_id: str, db: Session = Depends(get_db)):
         )
 
     images = [
-        PropertyImageResponse(id=str(img.id), image_url=img.image_url)
+        PropertyImageResponse(
+            id=str(img.id),
+            image_url=img.image_url,
+            width=img.width,
+            height=img.height,
+            thumbnail_url=variant_url(img.variants, "thumb"),
+            srcset=build_srcset(img.variants, "webp"),
+            srcset_avif=build_srcset(img.variants, "avif"),
+        )
         for img in (property_obj.images or [])
     ]
 
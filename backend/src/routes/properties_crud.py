@@ -1,19 +1,30 @@
 """
 Rotas para CRUD de imóveis (Admin/Gestor)
 """
-import shutil
 import uuid
+from dataclasses import asdict
 from decimal import Decimal
-from pathlib import Path
 from typing import Optional, List, Union
 
 from fastapi import APIRouter, Depends, HTTPException, status, File, Form, UploadFile
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-
-from src.database.db import SessionLocal
-from src.database.models import Properties, PropertyStatus, Favorites, PriceAlerts
+from sqlalchemy import delete, select, text
+
+from src.auth import get_current_user
+from src.database.db import get_async_db, get_db
+from src.database.models import Properties, PropertyImages, PropertyStatus, Favorites, PriceAlerts, Users
+from src.routes.properties import invalidate_property_totals
+from src.services.outbox import enqueue, outbox_workers
+from src.services.blobs import (
+    BLOB_GC_GRACE,
+    confirm_direct_upload,
+    prepare_direct_upload,
+    store_blob,
+    store_blob_sync,
+)
+from src.services.uploads import check_upload_size
 from src.websocket.manager import manager
 
 # Router para endpoints de CRUD de imóveis
@@ -61,6 +72,23 @@ class PropertyUpdate(BaseModel):
     longitude: Optional[float] = None
 
 
+class ImageUploadUrlRequest(BaseModel):
+    """Pedido de URL para upload direto de uma foto (hash calculado no navegador)"""
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+class DirectImage(BaseModel):
+    sha256: str
+
+
+class DirectImagesRequest(BaseModel):
+    """Fotos já enviadas direto ao storage, na ordem de exibição"""
+    images: List[DirectImage]
+
+
 class PropertyResponse(BaseModel):
     """Schema para resposta de dados do imóvel"""
     id: str
@@ -77,15 +105,6 @@ class PropertyResponse(BaseModel):
         from_attributes = True
 
 
-def get_db():
-    """Dependency para obter sessão do banco de dados"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/", response_model=PropertyResponse, status_code=status.HTTP_201_CREATED)
 def create_property(
     title: str = Form(...),
@@ -145,6 +164,7 @@ def create_property(
         for f in images:
             if not (f.content_type or "").startswith("image/"):
                 raise HTTPException(status_code=400, detail="Apenas imagens são permitidas")
+            check_upload_size(f)
 
     # Criar imóvel
     db_property = Properties(
@@ -161,40 +181,43 @@ def create_property(
     db.add(db_property)
     db.commit()
     db.refresh(db_property)
+    invalidate_property_totals()
 
     # Salvar imagens no disco e registrar no banco (tabela property_images)
     if images:
-        # backend/uploads/properties/<property_id>/
-        backend_root = Path(__file__).resolve().parents[2]  # .../backend
-        base_dir = backend_root / "uploads" / "properties"
-        property_dir = base_dir / str(db_property.id)
-        property_dir.mkdir(parents=True, exist_ok=True)
-
-        for idx, file in enumerate(images):
-            original = file.filename or "image"
-            safe_name = original.replace("/", "_").replace("\\", "_")
-            filename = f"{uuid.uuid4()}-{safe_name}"
-            filepath = property_dir / filename
-
-            with open(filepath, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            image_url = f"/uploads/properties/{db_property.id}/{filename}"
+        # Blob store por SHA-256: a mesma foto reenviada reaproveita o arquivo.
+        # Registra todos antes dos INSERTs (o trigger de refcount trava o blob)
+        stored_images = []
+        seen_hashes = set()
+        for file in images:
+            stored = store_blob_sync(file)
+            # Mesma foto enviada duas vezes no lote: mantém só a primeira
+            if stored.sha256 in seen_hashes:
+                continue
+            seen_hashes.add(stored.sha256)
+            stored_images.append(stored)
+
+        for position, stored in enumerate(stored_images):
+            image_url = stored.url
 
             # ✅ CORREÇÃO: usar text() + CAST(:property_id AS uuid)
-            db.execute(
+            image_id = db.execute(
                 text("""
                     INSERT INTO property_images (property_id, image_url, is_primary)
                     VALUES (CAST(:property_id AS uuid), :image_url, :is_primary)
+                    RETURNING id
                 """),
                 {
                     "property_id": str(db_property.id),
                     "image_url": image_url,
-                    "is_primary": (idx == 0),
+                    "is_primary": position == 0,
                 },
-            )
+            ).scalar_one()
+            # Miniatura/card/full em WebP/AVIF gerados pelo worker do outbox
+            enqueue(db, "image_derivatives", {"image_id": str(image_id)})
 
         db.commit()
+        outbox_workers.notify()
 
     return PropertyResponse(
         id=str(db_property.id),
@@ -245,7 +268,7 @@ def get_property(property_id: str, db: Session = Depends(get_db)):
 
 
 @router.put("/{property_id}", response_model=PropertyResponse)
-async def update_property(property_id: str, property_data: PropertyUpdate, db: Session = Depends(get_db)):
+async def update_property(property_id: str, property_data: PropertyUpdate, db: AsyncSession = Depends(get_async_db)):
     """
     Atualizar um imóvel existente (Admin/Gestor)
     """
@@ -254,7 +277,7 @@ async def update_property(property_id: str, property_data: PropertyUpdate, db: S
     except ValueError:
         raise HTTPException(status_code=400, detail="ID de imóvel inválido")
 
-    property_obj = db.query(Properties).filter(Properties.id == property_uuid).first()
+    property_obj = await db.scalar(select(Properties).where(Properties.id == property_uuid))
 
     if not property_obj:
         raise HTTPException(status_code=404, detail="Imóvel não encontrado")
@@ -302,7 +325,9 @@ async def update_property(property_id: str, property_data: PropertyUpdate, db: S
         # Verificar se o preço mudou
         if old_price != new_price:
             # Buscar usuários que favoritaram este imóvel
-            favorited_users = db.query(Favorites).filter(Favorites.property_id == property_uuid).all()
+            favorited_users = (
+                await db.scalars(select(Favorites).where(Favorites.property_id == property_uuid))
+            ).all()
             
             # Criar alertas de preço para cada usuário e enviar notificações
             for favorite in favorited_users:
@@ -341,9 +366,14 @@ async def update_property(property_id: str, property_data: PropertyUpdate, db: S
         property_obj.bathrooms = property_data.bathrooms
     if property_data.area is not None:
         property_obj.area = Decimal(str(property_data.area))
+    if property_data.latitude is not None:
+        property_obj.latitude = Decimal(str(property_data.latitude))
+    if property_data.longitude is not None:
+        property_obj.longitude = Decimal(str(property_data.longitude))
 
-    db.commit()
-    db.refresh(property_obj)
+    await db.commit()
+    await db.refresh(property_obj)
+    invalidate_property_totals()
 
     return PropertyResponse(
         id=str(property_obj.id),
@@ -358,63 +388,132 @@ async def update_property(property_id: str, property_data: PropertyUpdate, db: S
     )
 
 
-@router.post("/{property_id}/images", response_model=dict)
-async def upload_property_images(
-    property_id: str,
-    images: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
-):
-    """
-    Upload de imagens para um imóvel existente
-    """
+async def _get_property_uuid(db: AsyncSession, property_id: str) -> uuid.UUID:
     try:
         property_uuid = uuid.UUID(property_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="ID de imóvel inválido")
 
-    property_obj = db.query(Properties).filter(Properties.id == property_uuid).first()
+    property_obj = await db.scalar(select(Properties).where(Properties.id == property_uuid))
 
     if not property_obj:
         raise HTTPException(status_code=404, detail="Imóvel não encontrado")
+    return property_uuid
 
-    # Verificar se o diretório de uploads existe
-    uploads_dir = Path("uploads")
-    uploads_dir.mkdir(exist_ok=True)
 
+async def _replace_images_start(db: AsyncSession, property_uuid: uuid.UUID) -> None:
     # Limpar imagens existentes deste imóvel (opcional, ou comentar para adicionar)
-    from src.database.models import PropertyImages
-    db.query(PropertyImages).filter(PropertyImages.property_id == property_uuid).delete()
+    # O trigger de refcount trava as linhas de blobs até o commit: registros de
+    # blob em outra sessão (store_blob) têm de acontecer antes daqui
+    await db.execute(delete(PropertyImages).where(PropertyImages.property_id == property_uuid))
+
+
+def _add_property_image(db: AsyncSession, property_uuid: uuid.UUID, url: str) -> PropertyImages:
+    db_image = PropertyImages(
+        id=uuid.uuid4(),
+        property_id=property_uuid,
+        image_url=url,
+    )
+    db.add(db_image)
+    enqueue(db, "image_derivatives", {"image_id": str(db_image.id)})
+    return db_image
+
+
+async def _replace_images_finish(db: AsyncSession, uploaded_images: List[str]) -> dict:
+    # Fotos substituídas que ficaram sem referência
+    enqueue(db, "blob_gc", {}, delay=BLOB_GC_GRACE)
+    await db.commit()
+    outbox_workers.notify()
+
+    return {
+        "message": f"{len(uploaded_images)} imagens uploaded com sucesso",
+        "images": uploaded_images
+    }
 
-    uploaded_images = []
 
+@router.post("/{property_id}/images", response_model=dict)
+async def upload_property_images(
+    property_id: str,
+    images: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload de imagens para um imóvel existente
+    """
+    property_uuid = await _get_property_uuid(db, property_id)
+
+    # Validar se são imagens
     for image in images:
-        # Validar se é uma imagem
         if not image.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail=f"Arquivo {image.filename} não é uma imagem válida")
 
-        # Gerar nome único
-        file_extension = Path(image.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = uploads_dir / unique_filename
+    # Salvar arquivos (streaming, fora do event loop, deduplicado por conteúdo)
+    # antes de remover as fotos atuais (ver _replace_images_start)
+    stored_images = []
+    seen_hashes = set()
+    for image in images:
+        stored = await store_blob(image)
+        if stored.sha256 in seen_hashes:
+            continue
+        seen_hashes.add(stored.sha256)
+        stored_images.append(stored)
 
-        # Salvar arquivo
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+    await _replace_images_start(db, property_uuid)
 
-        # Salvar no banco
-        db_image = PropertyImages(
-            property_id=property_uuid,
-            image_url=f"http://127.0.0.1:8000/uploads/{unique_filename}"
-        )
-        db.add(db_image)
+    # Salvar no banco
+    uploaded_images = []
+    for stored in stored_images:
+        db_image = _add_property_image(db, property_uuid, stored.url)
         uploaded_images.append(db_image.image_url)
 
-    db.commit()
+    return await _replace_images_finish(db, uploaded_images)
 
-    return {
-        "message": f"{len(uploaded_images)} imagens uploaded com sucesso",
-        "images": uploaded_images
-    }
+
+@router.post("/images/upload-url", response_model=dict)
+async def property_image_upload_url(
+    payload: ImageUploadUrlRequest,
+    _: Users = Depends(get_current_user),
+):
+    """
+    URL pré-assinada para enviar uma foto direto ao storage (usuário autenticado)
+
+    Depois do PUT, confirme com POST /properties/{id}/images/direct.
+    upload = null quando a foto já existe (nada a enviar). Fotos enviadas e
+    nunca confirmadas são removidas pelo GC periódico dos blobs.
+    """
+    if not payload.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail=f"Arquivo {payload.filename} não é uma imagem válida")
+
+    direct = await prepare_direct_upload(payload.sha256, payload.size, payload.filename, payload.content_type)
+    return asdict(direct)
+
+
+@router.post("/{property_id}/images/direct", response_model=dict)
+async def confirm_property_images(
+    property_id: str,
+    payload: DirectImagesRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _: Users = Depends(get_current_user),
+):
+    """
+    Substitui as fotos do imóvel pelas enviadas direto ao storage
+    """
+    property_uuid = await _get_property_uuid(db, property_id)
+    await _replace_images_start(db, property_uuid)
+
+    uploaded_images = []
+    seen_hashes = set()
+
+    for image in payload.images:
+        stored = await confirm_direct_upload(db, image.sha256)
+        if stored.sha256 in seen_hashes:
+            continue
+        seen_hashes.add(stored.sha256)
+
+        db_image = _add_property_image(db, property_uuid, stored.url)
+        uploaded_images.append(db_image.image_url)
+
+    return await _replace_images_finish(db, uploaded_images)
 
 
 @router.delete("/{property_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -433,5 +532,8 @@ def delete_property(property_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Imóvel não encontrado")
 
     db.delete(property_obj)
+    # As triggers descontam as fotos apagadas em cascata; o GC remove as órfãs
+    enqueue(db, "blob_gc", {}, delay=BLOB_GC_GRACE)
     db.commit()
+    invalidate_property_totals()
     return None
\ No newline at end of file
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from typing import Optional
 
+from src.database.db import get_async_db
 from src.database.models import UserSettings, Users
-from src.auth import get_current_user, get_db
+from src.auth import get_current_user
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -54,12 +56,12 @@ class SettingsUpdate(BaseModel):
 @router.get("/", response_model=SettingsResponse)
 async def get_settings(
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Buscar configurações do usuário autenticado"""
     
     # Buscar configurações do usuário
-    settings = db.query(UserSettings).filter(UserSettings.user_id == current_user.id).first()
+    settings = await db.scalar(select(UserSettings).where(UserSettings.user_id == current_user.id))
     
     # Se não existir, criar com valores padrão
     if not settings:
@@ -70,8 +72,8 @@ async def get_settings(
             notifications_enabled=True
         )
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
     
     return SettingsResponse.from_orm(settings)
 
@@ -80,12 +82,12 @@ async def get_settings(
 async def update_settings(
     settings_update: SettingsUpdate,
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Atualizar configurações do usuário"""
     
     # Buscar configurações existentes
-    settings = db.query(UserSettings).filter(UserSettings.user_id == current_user.id).first()
+    settings = await db.scalar(select(UserSettings).where(UserSettings.user_id == current_user.id))
     
     if not settings:
         # Criar se não existir
@@ -101,7 +103,7 @@ async def update_settings(
     from datetime import datetime
     settings.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
     
     return SettingsResponse.from_orm(settings)
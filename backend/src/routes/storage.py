@@ -0,0 +1,67 @@
+"""
+Rotas do storage de uploads (ver src/services/storage.py)
+
+- PUT /storage/local/{key}: destino do upload direto com STORAGE_BACKEND=local
+  (URL assinada por LocalStorage.presign_upload). Confere tamanho e SHA-256
+  durante o streaming e só então grava na chave final.
+- GET /uploads/blobs/{key}: com storage remoto, redireciona para uma URL
+  pré-assinada do bucket e os bytes não passam pela API. Com storage local
+  quem serve é o mount /uploads.
+"""
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.services.blobs import BLOBS_TMP
+from src.services.storage import STORAGE_PRESIGN_EXPIRES, LocalStorage, storage
+from src.services.uploads import UPLOAD_CHUNK_SIZE, PendingUpload
+
+router = APIRouter(tags=["Storage"])
+
+
+@router.put("/storage/local/{key:path}", status_code=204)
+async def local_direct_upload(
+    key: str,
+    request: Request,
+    size: int = Query(...),
+    sha256: str = Query(...),
+    expires: int = Query(...),
+    signature: str = Query(...),
+):
+    if not isinstance(storage, LocalStorage) or not LocalStorage.check_signature(
+        key, size, sha256, expires, signature
+    ):
+        raise HTTPException(status_code=403, detail="Assinatura inválida ou expirada")
+
+    # O limite é o tamanho declarado na assinatura (413 se passar)
+    pending = await run_in_threadpool(PendingUpload, BLOBS_TMP, size)
+    try:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(pending.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(pending.write, bytes(buffer))
+        await run_in_threadpool(pending.finish)
+    except BaseException:
+        await run_in_threadpool(pending.discard)
+        raise
+
+    if pending.size != size or pending.sha256 != sha256:
+        await run_in_threadpool(pending.discard)
+        raise HTTPException(status_code=400, detail="Conteúdo não confere com o tamanho/hash declarados")
+
+    await run_in_threadpool(storage.put_file, key, pending.tmp, request.headers.get("content-type"))
+    return Response(status_code=204)
+
+
+if not storage.serves_locally:
+
+    @router.get("/uploads/blobs/{key:path}")
+    async def remote_blob(key: str):
+        url = await run_in_threadpool(storage.presign_download, f"blobs/{key}")
+        # Cache menor que a validade da assinatura
+        max_age = max(STORAGE_PRESIGN_EXPIRES - 60, 0)
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": f"private, max-age={max_age}"})
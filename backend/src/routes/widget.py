@@ -1,40 +1,44 @@
+import math
+import os
+from dataclasses import asdict
 from datetime import datetime
-from pathlib import Path
-from uuid import UUID, uuid4
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, UploadFile, File
 from pydantic import BaseModel
-from sqlalchemy import text
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.database.db import SessionLocal
+from src.controllers.dashboardController import invalidate_dashboard_cache
+from src.controllers.messagesController import MESSAGES_DEFAULT_LIMIT, MESSAGES_MAX_LIMIT, get_message_page
+from src.database.db import get_async_db, get_db
+from src.database.notify import listen
 from src.database.models import Leads, Conversations, Messages, LeadStatus
 from src.websocket.manager import manager
 from src.services.geo_service import get_geo
 from src.services.ai_service import get_auto_response
-from src.services.whatsapp_service import send_whatsapp
+from src.services.whatsapp_service import ZAPI_INSTANCE, ZAPI_TOKEN, send_whatsapp
+from src.services.api_keys import consume, lookup_api_key
+from src.services.outbox import after_commit, enqueue, outbox_task, outbox_workers
+from src.services.cache import TTLCache
+from src.services.blobs import confirm_direct_upload, prepare_direct_upload, store_blob
 
 router = APIRouter(prefix="/api/widget", tags=["Widget"])
 
-UPLOAD_DIR = Path(__file__).resolve().parent.parent.parent / "uploads" / "widget"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def validate_api_key(x_api_key: str = Header(...), db: Session = Depends(get_db)):
-    result = db.execute(
-        text("SELECT id FROM api_keys WHERE key = :key AND is_active = TRUE"),
-        {"key": x_api_key},
-    ).fetchone()
-    if not result:
+async def validate_api_key(x_api_key: str = Header(...)):
+    key_id = await lookup_api_key(x_api_key)
+    if key_id is None:
         raise HTTPException(status_code=401, detail="API key inválida")
+
+    retry_after = consume(key_id)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Limite de requisições excedido",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
     return x_api_key
 
 
@@ -45,15 +49,30 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-def get_bot_settings(db: Session) -> dict:
-    row = db.execute(text("SELECT * FROM bot_settings WHERE id = 1")).fetchone()
+# Configurações do bot em cache; o trigger em bot_settings emite NOTIFY
+# bot_settings_changed e o listener descarta o cache em todos os workers
+BOT_SETTINGS_CACHE_TTL = float(os.getenv("BOT_SETTINGS_CACHE_TTL", "300"))
+_bot_settings_cache = TTLCache(maxsize=1, ttl=BOT_SETTINGS_CACHE_TTL)
+listen("bot_settings_changed", lambda _payload: _bot_settings_cache.clear())
+
+
+async def get_bot_settings(db: AsyncSession) -> dict:
+    cached = _bot_settings_cache.get("settings")
+    if cached is not None:
+        return dict(cached)
+
+    row = (await db.execute(text("SELECT * FROM bot_settings WHERE id = 1"))).fetchone()
     if not row:
-        return {
+        settings = {
             "enabled": True, "welcome_message": "Olá! Como posso te ajudar?",
             "away_message": "Estamos fora do horário. Responderei em breve!",
             "away_enabled": True, "business_start": 8, "business_end": 18,
         }
-    return dict(row._mapping)
+    else:
+        settings = dict(row._mapping)
+
+    _bot_settings_cache.set("settings", settings)
+    return dict(settings)
 
 
 # ---------- Schemas ----------
@@ -90,6 +109,18 @@ class WidgetMessageOut(BaseModel):
     created_at: str
 
 
+class WidgetUploadUrlPayload(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+class WidgetDirectUploadPayload(BaseModel):
+    sha256: str
+    filename: str
+
+
 class PushSubscriptionPayload(BaseModel):
     user_id: str
     subscription: dict
@@ -97,6 +128,13 @@ class PushSubscriptionPayload(BaseModel):
 
 # ---------- Helpers ----------
 
+def _parse_uuid(value: str) -> UUID:
+    try:
+        return UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+
+
 async def _emit_message(msg: Messages):
     await manager.send_conversation_message(
         {
@@ -135,13 +173,13 @@ def _msg_out(msg: Messages) -> WidgetMessageOut:
 async def widget_start(
     payload: WidgetStartPayload,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(validate_api_key),
 ):
     ip = get_client_ip(request)
-    geo = await get_geo(ip)
 
-    lead = db.query(Leads).filter(Leads.email == payload.email).first()
+    lead = await db.scalar(select(Leads).where(Leads.email == payload.email).limit(1))
+    lead_created = lead is None
 
     if not lead:
         lead = Leads(
@@ -153,31 +191,26 @@ async def widget_start(
             property_title=payload.property_title,
             property_url=payload.property_url,
             ip=ip,
-            city=geo["city"],
-            state=geo["state"],
             utm_source=payload.utm_source,
             utm_medium=payload.utm_medium,
             utm_campaign=payload.utm_campaign,
         )
         db.add(lead)
-        db.flush()
+        await db.flush()
     else:
         if payload.property_title:
             lead.property_title = payload.property_title
             lead.property_url = payload.property_url
-        if not lead.city and geo["city"]:
-            lead.city = geo["city"]
-            lead.state = geo["state"]
         if payload.utm_source:
             lead.utm_source = payload.utm_source
             lead.utm_medium = payload.utm_medium
             lead.utm_campaign = payload.utm_campaign
 
-    conversation = (
-        db.query(Conversations)
-        .filter(Conversations.lead_id == lead.id, Conversations.is_archived == False)
+    conversation = await db.scalar(
+        select(Conversations)
+        .where(Conversations.lead_id == lead.id, Conversations.is_archived == False)
         .order_by(Conversations.created_at.desc())
-        .first()
+        .limit(1)
     )
 
     is_new = conversation is None
@@ -190,7 +223,7 @@ async def widget_start(
             unread_count=1,
         )
         db.add(conversation)
-        db.flush()
+        await db.flush()
 
         context = f"Olá! Meu nome é {payload.name}"
         if payload.property_title:
@@ -207,14 +240,18 @@ async def widget_start(
         )
         db.add(first_msg)
 
-    db.commit()
-    db.refresh(lead)
-    db.refresh(conversation)
+        # Mensagem de boas-vindas do bot sai pelo outbox, depois da resposta
+        enqueue(db, "bot_reply", {"conversation_id": str(conversation.id), "welcome": True})
 
-    if is_new:
-        bot = get_bot_settings(db)
-        if bot["enabled"]:
-            await _send_bot_message(db, str(conversation.id), bot["welcome_message"])
+    # Cidade/estado via GeoIP também fora do caminho da requisição
+    if not lead.city:
+        enqueue(db, "geo_enrich", {"lead_id": str(lead.id), "ip": ip})
+
+    await db.commit()
+    outbox_workers.notify()
+    if lead_created:
+        # Novo lead muda as contagens do overview
+        invalidate_dashboard_cache()
 
     return WidgetStartResponse(
         conversation_id=str(conversation.id),
@@ -222,7 +259,7 @@ async def widget_start(
     )
 
 
-async def _send_bot_message(db: Session, conversation_id: str, content: str):
+async def _send_bot_message(db: AsyncSession, conversation_id: UUID, content: str):
     msg = Messages(
         conversation_id=conversation_id,
         sender_type="system",
@@ -231,24 +268,70 @@ async def _send_bot_message(db: Session, conversation_id: str, content: str):
         message_type="text",
     )
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
-    await _emit_message(msg)
+    await db.flush()
+    # Commit pelo worker do outbox, junto com a remoção do evento (sem resposta duplicada)
+    after_commit(db, lambda: _emit_message(msg))
+
+
+# ---------- Tarefas do outbox ----------
+
+@outbox_task("geo_enrich")
+async def _geo_enrich_task(db: AsyncSession, payload: dict):
+    geo = await get_geo(payload["ip"])
+    if not geo["city"]:
+        return
+    lead = await db.get(Leads, UUID(payload["lead_id"]))
+    if lead and not lead.city:
+        lead.city = geo["city"]
+        lead.state = geo["state"]
+
+
+@outbox_task("bot_reply")
+async def _bot_reply_task(db: AsyncSession, payload: dict):
+    bot = await get_bot_settings(db)
+    if payload.get("welcome"):
+        reply = bot["welcome_message"] if bot["enabled"] else None
+    else:
+        reply = get_auto_response(
+            content=payload["content"],
+            bot_enabled=bot["enabled"],
+            away_enabled=bot["away_enabled"],
+            welcome_msg=bot["welcome_message"],
+            away_msg=bot["away_message"],
+            business_start=bot["business_start"],
+            business_end=bot["business_end"],
+        )
+    if reply:
+        await _send_bot_message(db, UUID(payload["conversation_id"]), reply)
+
+
+@outbox_task("whatsapp_notify")
+async def _whatsapp_notify_task(db: AsyncSession, payload: dict):
+    lead = await db.get(Leads, UUID(payload["lead_id"]))
+    if not lead or not lead.phone or not (ZAPI_INSTANCE and ZAPI_TOKEN):
+        return
+    sent = await send_whatsapp(
+        lead.phone,
+        f"Nova mensagem recebida no chat do imóvel: {payload['content']}",
+    )
+    if not sent:
+        # Z-API configurada mas o envio falhou: o worker reagenda
+        raise RuntimeError("Falha ao enviar WhatsApp")
 
 
 @router.post("/{conversation_id}/message", response_model=WidgetMessageOut)
 async def widget_send_message(
     conversation_id: str,
     payload: WidgetMessagePayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str = Depends(validate_api_key),
 ):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
+    conv = await db.get(Conversations, _parse_uuid(conversation_id))
     if not conv:
         raise HTTPException(status_code=404, detail="Conversa não encontrada")
 
     msg = Messages(
-        conversation_id=conversation_id,
+        conversation_id=conv.id,
         sender_type="cliente",
         content=payload.content,
         status="sent",
@@ -258,60 +341,33 @@ async def widget_send_message(
     conv.unread_count += 1
     conv.is_read = False
     conv.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(msg)
 
-    await _emit_message(msg)
+    # Resposta automática e aviso por WhatsApp rodam nos workers do outbox
+    enqueue(db, "bot_reply", {"conversation_id": str(conv.id), "content": payload.content})
+    if conv.lead_id:
+        enqueue(db, "whatsapp_notify", {"lead_id": str(conv.lead_id), "content": payload.content[:100]})
 
-    # IA: resposta automática
-    bot = get_bot_settings(db)
-    auto_reply = get_auto_response(
-        content=payload.content,
-        bot_enabled=bot["enabled"],
-        away_enabled=bot["away_enabled"],
-        welcome_msg=bot["welcome_message"],
-        away_msg=bot["away_message"],
-        business_start=bot["business_start"],
-        business_end=bot["business_end"],
-    )
-    if auto_reply:
-        await _send_bot_message(db, conversation_id, auto_reply)
-
-    # WhatsApp: notificar lead se tiver telefone
-    lead = db.query(Leads).filter(Leads.id == conv.lead_id).first()
-    if lead and lead.phone:
-        await send_whatsapp(
-            lead.phone,
-            f"Nova mensagem recebida no chat do imóvel: {payload.content[:100]}",
-        )
+    await db.commit()
+    await db.refresh(msg)
+    outbox_workers.notify()
+
+    await _emit_message(msg)
 
     return _msg_out(msg)
 
 
-@router.post("/{conversation_id}/upload", response_model=WidgetMessageOut)
-async def widget_upload(
-    conversation_id: str,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    _: str = Depends(validate_api_key),
-):
-    conv = db.query(Conversations).filter(Conversations.id == conversation_id).first()
+async def _get_conversation(db: AsyncSession, conversation_id: str) -> Conversations:
+    conv = await db.get(Conversations, _parse_uuid(conversation_id))
     if not conv:
         raise HTTPException(status_code=404, detail="Conversa não encontrada")
+    return conv
 
-    ext = Path(file.filename).suffix if file.filename else ""
-    filename = f"{uuid4()}{ext}"
-    filepath = UPLOAD_DIR / filename
-
-    content = await file.read()
-    filepath.write_bytes(content)
-
-    file_url = f"/uploads/widget/{filename}"
 
+async def _send_file_message(db: AsyncSession, conv: Conversations, filename: str | None, file_url: str) -> Messages:
     msg = Messages(
-        conversation_id=conversation_id,
+        conversation_id=conv.id,
         sender_type="cliente",
-        content=file.filename or "arquivo",
+        content=filename or "arquivo",
         status="sent",
         message_type="file",
         file_url=file_url,
@@ -320,25 +376,70 @@ async def widget_upload(
     conv.unread_count += 1
     conv.is_read = False
     conv.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(msg)
+    await db.commit()
+    await db.refresh(msg)
 
     await _emit_message(msg)
+    return msg
+
+
+@router.post("/{conversation_id}/upload", response_model=WidgetMessageOut)
+async def widget_upload(
+    conversation_id: str,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    _: str = Depends(validate_api_key),
+):
+    conv = await _get_conversation(db, conversation_id)
+
+    stored = await store_blob(file)
+    msg = await _send_file_message(db, conv, file.filename, stored.url)
+    return _msg_out(msg)
+
+
+@router.post("/{conversation_id}/upload-url")
+async def widget_upload_url(
+    conversation_id: str,
+    payload: WidgetUploadUrlPayload,
+    db: AsyncSession = Depends(get_async_db),
+    _: str = Depends(validate_api_key),
+):
+    """
+    Upload direto: o widget calcula o SHA-256, envia os bytes no PUT
+    devolvido (direto ao storage) e confirma em /upload/direct.
+    upload = null quando o arquivo já existe.
+    """
+    await _get_conversation(db, conversation_id)
+    direct = await prepare_direct_upload(payload.sha256, payload.size, payload.filename, payload.content_type)
+    return asdict(direct)
+
+
+@router.post("/{conversation_id}/upload/direct", response_model=WidgetMessageOut)
+async def widget_upload_direct(
+    conversation_id: str,
+    payload: WidgetDirectUploadPayload,
+    db: AsyncSession = Depends(get_async_db),
+    _: str = Depends(validate_api_key),
+):
+    conv = await _get_conversation(db, conversation_id)
+
+    stored = await confirm_direct_upload(db, payload.sha256)
+    msg = await _send_file_message(db, conv, payload.filename, stored.url)
     return _msg_out(msg)
 
 
 @router.get("/{conversation_id}/messages")
 def widget_get_messages(
     conversation_id: str,
+    response: Response,
+    after: str | None = Query(None, description="id de mensagem ou timestamp ISO"),
+    before: str | None = Query(None, description="id de mensagem ou timestamp ISO"),
+    limit: int = Query(MESSAGES_DEFAULT_LIMIT, ge=1, le=MESSAGES_MAX_LIMIT),
     db: Session = Depends(get_db),
     _: str = Depends(validate_api_key),
 ):
-    msgs = (
-        db.query(Messages)
-        .filter(Messages.conversation_id == conversation_id)
-        .order_by(Messages.created_at.asc())
-        .all()
-    )
+    msgs, has_more = get_message_page(db, _parse_uuid(conversation_id), after, before, limit)
+    response.headers["X-Has-More"] = "true" if has_more else "false"
     return [
         {
             "id": str(m.id),
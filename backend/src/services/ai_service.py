@@ -1,3 +1,4 @@
+import re
 from datetime import datetime
 
 
@@ -9,6 +10,33 @@ KEYWORD_RESPONSES = {
     ("foto", "fotos", "imagem", "imagens"): "Temos um galeria completa de fotos do imóvel disponível no site. Quer que eu envie o link?",
 }
 
+# Todas as palavras-chave num único regex. O lookahead acha ocorrências em
+# qualquer posição (inclusive sobrepostas); na mesma posição a alternância
+# tenta primeiro o grupo de maior prioridade, como no dicionário acima.
+_KEYWORD_PRIORITY = {}
+for _priority, _keywords in enumerate(KEYWORD_RESPONSES):
+    for _keyword in _keywords:
+        _KEYWORD_PRIORITY.setdefault(_keyword, _priority)
+
+_KEYWORD_PATTERN = re.compile(
+    "(?=(" + "|".join(
+        re.escape(k) for k in sorted(_KEYWORD_PRIORITY, key=lambda k: (_KEYWORD_PRIORITY[k], -len(k)))
+    ) + "))"
+)
+_RESPONSES = list(KEYWORD_RESPONSES.values())
+
+
+def match_keyword_response(text: str) -> str | None:
+    """Resposta do primeiro grupo (na ordem de KEYWORD_RESPONSES) com palavra presente no texto"""
+    best = None
+    for match in _KEYWORD_PATTERN.finditer(text):
+        priority = _KEYWORD_PRIORITY[match.group(1)]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+    return _RESPONSES[best] if best is not None else None
+
 
 def is_business_hours(start: int = 8, end: int = 18) -> bool:
     now = datetime.now()
@@ -21,11 +49,9 @@ def get_auto_response(content: str, bot_enabled: bool, away_enabled: bool,
     if not bot_enabled:
         return None
 
-    text = content.lower()
-
-    for keywords, response in KEYWORD_RESPONSES.items():
-        if any(k in text for k in keywords):
-            return response
+    response = match_keyword_response(content.lower())
+    if response:
+        return response
 
     if away_enabled and not is_business_hours(business_start, business_end):
         return away_msg
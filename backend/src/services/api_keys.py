@@ -0,0 +1,109 @@
+"""
+Validação de API keys do widget sem ida ao banco no caminho quente
+
+- Cache em memória: chave -> id (API_KEY_CACHE_TTL); chaves inválidas
+  também ficam em cache por API_KEY_NEGATIVE_TTL para absorver abuso.
+- Invalidação: trigger em api_keys emite NOTIFY api_keys_changed com a
+  chave alterada/removida (ver notify.py); invalidate_api_key() faz o
+  mesmo no processo atual.
+- Rate limit por chave (token bucket, API_KEY_RATE_LIMIT req/min por
+  worker) e contadores de uso em memória.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from src.database.db import AsyncSessionLocal
+from src.database.notify import listen
+from src.services.cache import TTLCache
+
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_NEGATIVE_TTL = float(os.getenv("API_KEY_NEGATIVE_TTL", "10"))
+API_KEY_RATE_LIMIT = int(os.getenv("API_KEY_RATE_LIMIT", "600"))
+API_KEY_RATE_BURST = int(os.getenv("API_KEY_RATE_BURST", "100"))
+
+API_KEYS_CHANNEL = "api_keys_changed"
+
+# Valor do cache: id da chave, ou False para chave inválida/revogada
+_keys = TTLCache(maxsize=1024, ttl=API_KEY_CACHE_TTL)
+
+
+def invalidate_api_key(key: Optional[str] = None) -> None:
+    """Descarta uma chave do cache (ou todas, com key=None)"""
+    if key is None:
+        _keys.clear()
+    else:
+        _keys.pop(key)
+
+
+listen(API_KEYS_CHANNEL, invalidate_api_key)
+
+
+async def lookup_api_key(key: str) -> Optional[int]:
+    """Id da chave ativa, ou None; só consulta o banco em cache miss"""
+    cached = _keys.get(key)
+    if cached is not None:
+        return cached or None
+
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            text("SELECT id FROM api_keys WHERE key = :key AND is_active = TRUE"),
+            {"key": key},
+        )).fetchone()
+
+    if row is None:
+        _keys.set(key, False, ttl=API_KEY_NEGATIVE_TTL)
+        return None
+    _keys.set(key, row[0])
+    return row[0]
+
+
+@dataclass
+class KeyUsage:
+    tokens: float
+    updated_at: float
+    requests: int = 0
+    rate_limited: int = 0
+    last_used_at: float = 0.0
+
+
+_usage: Dict[int, KeyUsage] = {}
+_usage_lock = threading.Lock()
+
+
+def consume(key_id: int) -> float:
+    """Conta o uso da chave; retorna 0 se liberado ou os segundos até o próximo token"""
+    rate = API_KEY_RATE_LIMIT / 60.0
+    now = time.monotonic()
+    with _usage_lock:
+        usage = _usage.get(key_id)
+        if usage is None:
+            usage = _usage[key_id] = KeyUsage(tokens=API_KEY_RATE_BURST, updated_at=now)
+
+        usage.tokens = min(API_KEY_RATE_BURST, usage.tokens + (now - usage.updated_at) * rate)
+        usage.updated_at = now
+
+        if usage.tokens < 1:
+            usage.rate_limited += 1
+            return (1 - usage.tokens) / rate
+
+        usage.tokens -= 1
+        usage.requests += 1
+        usage.last_used_at = time.time()
+        return 0.0
+
+
+def get_usage() -> Dict[str, dict]:
+    with _usage_lock:
+        return {
+            str(key_id): {
+                "requests": u.requests,
+                "rate_limited": u.rate_limited,
+                "last_used_at": u.last_used_at or None,
+            }
+            for key_id, u in _usage.items()
+        }
@@ -0,0 +1,290 @@
+"""
+Armazenamento de uploads endereçado por conteúdo
+
+Cada arquivo vira a chave blobs/<ab>/<cd>/<sha256><ext> no storage (local ou
+S3, ver storage.py) e é referenciado pela URL /uploads/<chave>: o mesmo
+conteúdo enviado de novo (por qualquer rota) reaproveita o objeto
+existente. A tabela blobs guarda tamanho, tipo e refcount; as triggers em
+property_images.image_url e messages.file_url incrementam/decrementam o
+contador, inclusive nos deletes em cascata.
+
+Ordem no upload: grava o temporário, registra o blob (commit próprio, que
+renova touched_at) e só então envia para a chave final. O GC apaga os
+objetos antes de confirmar o DELETE, então um upload concorrente do mesmo
+conteúdo espera o lock da linha e regrava o objeto depois.
+
+Upload direto (bytes fora da API): prepare_direct_upload() registra o blob
+e devolve o PUT pré-assinado; confirm_direct_upload() confere o objeto
+antes de a rota criar a referência. Até a conferência o blob fica com
+verified = false e size/ext são só os declarados: um novo registro do mesmo
+hash (sem referências) pode corrigi-los, então uma declaração errada não
+trava o conteúdo para sempre.
+
+Além das execuções disparadas por troca/remoção de fotos, o GC roda a cada
+BLOB_GC_INTERVAL (evento "blob_gc" periódico que se reagenda, semeado no
+startup por schedule_blob_gc()), o que também limpa uploads abandonados.
+"""
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import and_, case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from src.database.db import AsyncSessionLocal, SessionLocal
+from src.database.models import Blobs, OutboxEvents
+from src.services.outbox import enqueue, outbox_task
+from src.services.storage import PresignedUpload, storage
+from src.services.uploads import UPLOAD_MAX_BYTES, UPLOADS_ROOT, PendingUpload, stream_upload, stream_upload_sync
+
+logger = logging.getLogger(__name__)
+
+# Temporários dos uploads que passam pela API (disco local do nó): fora do
+# mount /uploads, mas no mesmo disco para o os.replace do LocalStorage
+BLOBS_TMP = UPLOADS_ROOT.parent / "uploads-tmp"
+
+# Tempo mínimo sem referências antes de o GC apagar (cobre o intervalo
+# entre o upload e o commit da linha que referencia o blob)
+BLOB_GC_GRACE = float(os.getenv("BLOB_GC_GRACE", "3600"))
+BLOB_GC_BATCH = int(os.getenv("BLOB_GC_BATCH", "500"))
+BLOB_GC_INTERVAL = float(os.getenv("BLOB_GC_INTERVAL", "21600"))
+# pg_advisory_xact_lock: um único processo semeia o GC periódico
+_BLOB_GC_SCHEDULE_LOCK = 7305281
+
+_EXT_RE = re.compile(r"^\.[a-z0-9]{1,15}$")
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    ext: str
+    size: int
+    key: str
+    url: str
+    created: bool  # False quando o conteúdo já existia
+
+
+def _clean_ext(filename: Optional[str]) -> str:
+    ext = Path(filename or "").suffix.lower()
+    return ext if _EXT_RE.match(ext) else ""
+
+
+def blob_key(sha256: str, ext: str = "") -> str:
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def blob_url(sha256: str, ext: str = "") -> str:
+    return f"/uploads/{blob_key(sha256, ext)}"
+
+
+def _register_stmt(sha256: str, size: int, ext: str, content_type: Optional[str], verified: bool):
+    """
+    Upsert renova touched_at e trava a linha contra um GC em andamento
+
+    verified: size calculado pela API (store_blob). Blob ainda não conferido
+    e sem referências aceita os valores do novo registro.
+    """
+    stmt = insert(Blobs).values(
+        sha256=sha256,
+        ext=ext,
+        size=size,
+        content_type=content_type,
+        verified=verified,
+        touched_at=datetime.utcnow(),
+    )
+    replaceable = and_(Blobs.verified.is_(False), Blobs.refcount <= 0)
+    return stmt.on_conflict_do_update(
+        index_elements=[Blobs.sha256],
+        set_={
+            "touched_at": stmt.excluded.touched_at,
+            "size": case((replaceable, stmt.excluded.size), else_=Blobs.size),
+            "ext": case((replaceable, stmt.excluded.ext), else_=Blobs.ext),
+            "content_type": case((replaceable, stmt.excluded.content_type), else_=Blobs.content_type),
+            "verified": Blobs.verified | stmt.excluded.verified,
+        },
+    ).returning(Blobs.ext)
+
+
+def _place(pending: PendingUpload, ext: str, content_type: Optional[str]) -> StoredBlob:
+    key = blob_key(pending.sha256, ext)
+    if storage.exists(key):
+        pending.discard()
+        created = False
+    else:
+        storage.put_file(key, pending.tmp, content_type)
+        created = True
+    return StoredBlob(
+        sha256=pending.sha256,
+        ext=ext,
+        size=pending.size,
+        key=key,
+        url=blob_url(pending.sha256, ext),
+        created=created,
+    )
+
+
+async def store_blob(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> StoredBlob:
+    """Grava o upload no blob store (rotas async)"""
+    pending = await stream_upload(file, BLOBS_TMP, max_bytes)
+    try:
+        async with AsyncSessionLocal() as db:
+            # Conteúdo já conhecido mantém a extensão do primeiro upload
+            ext = (await db.execute(
+                _register_stmt(pending.sha256, pending.size, _clean_ext(file.filename), file.content_type, True)
+            )).scalar_one()
+            await db.commit()
+    except BaseException:
+        await run_in_threadpool(pending.discard)
+        raise
+    return await run_in_threadpool(_place, pending, ext, file.content_type)
+
+
+def store_blob_sync(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> StoredBlob:
+    """Mesma gravação para rotas sync"""
+    pending = stream_upload_sync(file, BLOBS_TMP, max_bytes)
+    try:
+        with SessionLocal() as db:
+            ext = db.execute(
+                _register_stmt(pending.sha256, pending.size, _clean_ext(file.filename), file.content_type, True)
+            ).scalar_one()
+            db.commit()
+    except BaseException:
+        pending.discard()
+        raise
+    return _place(pending, ext, file.content_type)
+
+
+@dataclass
+class DirectUpload:
+    sha256: str
+    url: str
+    # None quando o conteúdo já está no storage (nada a enviar)
+    upload: Optional[PresignedUpload]
+
+
+async def prepare_direct_upload(
+    sha256: str,
+    size: int,
+    filename: Optional[str],
+    content_type: str,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> DirectUpload:
+    """Registra o blob e devolve o PUT pré-assinado para a chave do hash"""
+    sha256 = sha256.lower()
+    if not _SHA256_RE.match(sha256):
+        raise HTTPException(status_code=400, detail="sha256 inválido")
+    if size <= 0 or size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Arquivo excede o limite de {max_bytes / (1024 * 1024):.0f} MB",
+        )
+
+    async with AsyncSessionLocal() as db:
+        ext = (await db.execute(
+            _register_stmt(sha256, size, _clean_ext(filename), content_type, False)
+        )).scalar_one()
+        await db.commit()
+
+    key = blob_key(sha256, ext)
+    if await run_in_threadpool(storage.exists, key):
+        return DirectUpload(sha256=sha256, url=blob_url(sha256, ext), upload=None)
+
+    upload = await run_in_threadpool(storage.presign_upload, key, content_type, size, sha256)
+    return DirectUpload(sha256=sha256, url=blob_url(sha256, ext), upload=upload)
+
+
+async def confirm_direct_upload(db: AsyncSession, sha256: str) -> StoredBlob:
+    """Confere o objeto enviado direto ao storage; 400 se não existe ou não confere"""
+    blob = await db.get(Blobs, sha256.lower())
+    if blob is None:
+        raise HTTPException(status_code=400, detail="Upload não encontrado")
+
+    key = blob_key(blob.sha256, blob.ext)
+    if not await run_in_threadpool(storage.verify, key, blob.size, blob.sha256):
+        raise HTTPException(status_code=400, detail="Upload não encontrado")
+    # Gravado junto com a referência criada pela rota
+    blob.verified = True
+
+    return StoredBlob(
+        sha256=blob.sha256,
+        ext=blob.ext,
+        size=blob.size,
+        key=key,
+        url=blob_url(blob.sha256, blob.ext),
+        created=False,
+    )
+
+
+async def collect_garbage(db: AsyncSession) -> int:
+    """Remove blobs sem referência há mais de BLOB_GC_GRACE; retorna quantos"""
+    cutoff = datetime.utcnow() - timedelta(seconds=BLOB_GC_GRACE)
+    removed = 0
+    while True:
+        batch = (
+            select(Blobs.sha256)
+            .where(Blobs.refcount <= 0, Blobs.touched_at < cutoff)
+            .limit(BLOB_GC_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        rows = (await db.execute(
+            delete(Blobs)
+            .where(Blobs.sha256.in_(batch.scalar_subquery()))
+            .returning(Blobs.sha256)
+        )).scalars().all()
+        for sha256 in rows:
+            # Original e derivados (<sha256>-thumb.webp etc., ver images.py)
+            await run_in_threadpool(storage.delete_prefix, blob_key(sha256))
+        await db.commit()
+
+        removed += len(rows)
+        if len(rows) < BLOB_GC_BATCH:
+            break
+
+    if removed:
+        logger.info("Blobs: %d arquivos sem referência removidos", removed)
+    return removed
+
+
+async def schedule_blob_gc() -> None:
+    """Semeia o GC periódico se ainda não houver um agendado (startup)"""
+    async with AsyncSessionLocal() as db:
+        # Serializa a verificação entre os processos que sobem juntos
+        await db.execute(select(func.pg_advisory_xact_lock(_BLOB_GC_SCHEDULE_LOCK)))
+        scheduled = await db.scalar(
+            select(OutboxEvents.id)
+            .where(
+                OutboxEvents.task == "blob_gc",
+                OutboxEvents.payload.contains({"periodic": True}),
+                OutboxEvents.status != "failed",
+            )
+            .limit(1)
+        )
+        if scheduled is None:
+            enqueue(db, "blob_gc", {"periodic": True})
+        await db.commit()
+
+
+@outbox_task("blob_gc")
+async def _blob_gc_task(db: AsyncSession, payload: dict):
+    # Exceção à regra do outbox: confirma em lotes, e reexecutar é inofensivo
+    periodic = payload.get("periodic", False)
+    try:
+        await collect_garbage(db)
+    except Exception:
+        if not periodic:
+            raise
+        # Na execução periódica a falha não interrompe a cadeia: a próxima tenta de novo
+        logger.exception("Blobs: falha no GC periódico")
+        await db.rollback()
+
+    if periodic:
+        # Gravado junto com a remoção deste evento: sempre há exatamente um agendado
+        enqueue(db, "blob_gc", {"periodic": True}, delay=BLOB_GC_INTERVAL)
@@ -1,18 +1,163 @@
-import httpx
+"""
+GeoIP (cidade/estado por IP) com cache em camadas
+
+Ordem de consulta:
+1. Base offline .mmdb (GEOIP_MMDB_PATH, formato MaxMind, aberta via mmap)
+   quando configurada: resolve localmente e nunca usa a rede.
+2. Cache em memória (TTL + LRU) por IP e por prefixo.
+3. Tabela geoip_cache (por IP ou prefixo /24 IPv4 e /48 IPv6), válida por
+   GEOIP_DB_CACHE_DAYS.
+4. ipapi.co; o resultado volta para a memória e para a tabela.
+"""
+import ipaddress
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.database.db import AsyncSessionLocal
+from src.database.models import GeoIPCache
+from src.services.cache import TTLCache
+from src.services.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "10000"))
+GEOIP_CACHE_TTL = float(os.getenv("GEOIP_CACHE_TTL", "3600"))
+GEOIP_DB_CACHE_DAYS = int(os.getenv("GEOIP_DB_CACHE_DAYS", "30"))
+GEOIP_MMDB_PATH = os.getenv("GEOIP_MMDB_PATH", "")
+
+EMPTY_GEO = {"city": None, "state": None}
+
+http_clients.register("geo", base_url="https://ipapi.co", timeout=3)
+
+_memory = TTLCache(maxsize=GEOIP_CACHE_SIZE, ttl=GEOIP_CACHE_TTL)
+_mmdb = None
+
+
+def _open_mmdb():
+    """Abre a base .mmdb uma vez (requer o pacote maxminddb)"""
+    global _mmdb
+    if _mmdb is not None or not GEOIP_MMDB_PATH:
+        return _mmdb
+    try:
+        import maxminddb
+    except ImportError:
+        logger.warning("GEOIP_MMDB_PATH definido, mas o pacote maxminddb não está instalado")
+        return None
+    try:
+        _mmdb = maxminddb.open_database(GEOIP_MMDB_PATH, maxminddb.MODE_MMAP)
+    except (OSError, ValueError):
+        logger.exception("GeoIP: não foi possível abrir %s", GEOIP_MMDB_PATH)
+    return _mmdb
+
+
+def _mmdb_lookup(reader, ip: str) -> dict:
+    record = reader.get(ip) or {}
+
+    def _name(node: Optional[dict]) -> Optional[str]:
+        names = (node or {}).get("names") or {}
+        return names.get("pt-BR") or names.get("en")
+
+    subdivisions = record.get("subdivisions") or [{}]
+    return {
+        "city": _name(record.get("city")),
+        "state": subdivisions[0].get("iso_code") or _name(subdivisions[0]),
+    }
+
+
+def _prefix_key(ip: str) -> Optional[str]:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+async def _db_lookup(keys: list) -> Optional[dict]:
+    since = datetime.utcnow() - timedelta(days=GEOIP_DB_CACHE_DAYS)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(
+            select(GeoIPCache).where(GeoIPCache.key.in_(keys), GeoIPCache.fetched_at >= since)
+        )).all()
+    by_key = {row.key: row for row in rows}
+    # IP exato tem prioridade sobre o prefixo
+    for key in keys:
+        row = by_key.get(key)
+        if row is not None:
+            return {"city": row.city, "state": row.state}
+    return None
+
+
+async def _db_store(keys: list, geo: dict) -> None:
+    now = datetime.utcnow()
+    stmt = insert(GeoIPCache).values(
+        [{"key": key, "city": geo["city"], "state": geo["state"], "fetched_at": now} for key in keys]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeoIPCache.key],
+        set_={"city": stmt.excluded.city, "state": stmt.excluded.state, "fetched_at": stmt.excluded.fetched_at},
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(stmt)
+        await db.commit()
+
+
+async def _fetch_remote(ip: str) -> Optional[dict]:
+    try:
+        r = await http_clients.request("geo", "GET", f"/{ip}/json/")
+        if r.status_code == 200:
+            data = r.json()
+            return {
+                "city": data.get("city"),
+                "state": data.get("region"),
+            }
+    except Exception:
+        pass
+    return None
 
 
 async def get_geo(ip: str) -> dict:
     if not ip or ip in ("127.0.0.1", "::1", "testclient"):
-        return {"city": None, "state": None}
+        return dict(EMPTY_GEO)
+
+    reader = _open_mmdb()
+    if reader is not None:
+        try:
+            return _mmdb_lookup(reader, ip)
+        except ValueError:
+            return dict(EMPTY_GEO)
+
+    prefix = _prefix_key(ip)
+    keys = [ip] + ([prefix] if prefix else [])
+
+    for key in keys:
+        cached = _memory.get(key)
+        if cached is not None:
+            return dict(cached)
+
     try:
-        async with httpx.AsyncClient(timeout=3) as client:
-            r = await client.get(f"https://ipapi.co/{ip}/json/")
-            if r.status_code == 200:
-                data = r.json()
-                return {
-                    "city": data.get("city"),
-                    "state": data.get("region"),
-                }
+        geo = await _db_lookup(keys)
     except Exception:
-        pass
-    return {"city": None, "state": None}
+        logger.exception("GeoIP: falha ao consultar geoip_cache")
+        geo = None
+
+    if geo is None:
+        geo = await _fetch_remote(ip)
+        if geo is None:
+            # Falha de rede: não guarda, tenta de novo na próxima sessão
+            return dict(EMPTY_GEO)
+        if geo["city"]:
+            try:
+                await _db_store(keys, geo)
+            except Exception:
+                logger.exception("GeoIP: falha ao gravar geoip_cache")
+
+    # Resultado vazio vale só para este IP: no prefixo mascararia os vizinhos
+    for key in keys if geo["city"] else [ip]:
+        _memory.set(key, geo)
+    return dict(geo)
@@ -0,0 +1,144 @@
+"""
+Clientes HTTP compartilhados para integrações externas (GeoIP, Z-API, ...)
+
+Um httpx.AsyncClient por integração, aberto no lifespan e reaproveitado
+em todas as chamadas: keep-alive, HTTP/2 quando o pacote h2 está instalado
+e limite de conexões por host. Cada cliente tem um circuit breaker: após
+HTTP_BREAKER_FAILURES falhas seguidas as chamadas falham na hora
+(CircuitOpenError) por HTTP_BREAKER_RESET segundos; depois uma chamada de
+teste decide se o circuito fecha de novo.
+"""
+import importlib.util
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+HTTP_BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", "30"))
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class CircuitOpenError(Exception):
+    """Integração marcada como indisponível pelo circuit breaker"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = HTTP_BREAKER_FAILURES, reset_timeout: float = HTTP_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError()
+        if state == "half_open":
+            # Só uma chamada de teste por vez enquanto meio-aberto
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+@dataclass
+class ClientConfig:
+    base_url: str = ""
+    timeout: float = 5.0
+    max_connections: int = HTTP_MAX_CONNECTIONS_PER_HOST
+
+
+class HTTPClientRegistry:
+    def __init__(self):
+        self.configs: Dict[str, ClientConfig] = {}
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def register(self, name: str, base_url: str = "", timeout: float = 5.0,
+                 max_connections: int = HTTP_MAX_CONNECTIONS_PER_HOST) -> None:
+        self.configs[name] = ClientConfig(base_url, timeout, max_connections)
+        self.breakers.setdefault(name, CircuitBreaker())
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            config = self.configs[name]
+            client = httpx.AsyncClient(
+                base_url=config.base_url,
+                timeout=config.timeout,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=min(HTTP_KEEPALIVE_CONNECTIONS, config.max_connections),
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self.clients[name] = client
+        return client
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Requisição pelo cliente compartilhado, passando pelo circuit breaker"""
+        breaker = self.breakers[name]
+        breaker.before_call()
+        try:
+            response = await self.get(name).request(method, url, **kwargs)
+        except BaseException:
+            # Qualquer saída sem resposta (HTTPError, SSLError, cancelamento por
+            # wait_for...) conta como falha e libera a chamada de teste do meio-aberto
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def start(self) -> None:
+        for name in self.configs:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "client_open": name in self.clients and not self.clients[name].is_closed,
+                "circuit": self.breakers[name].state,
+                "consecutive_failures": self.breakers[name].failures,
+                "http2": HTTP2_AVAILABLE,
+            }
+            for name in self.configs
+        }
+
+
+http_clients = HTTPClientRegistry()
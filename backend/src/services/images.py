@@ -0,0 +1,203 @@
+"""
+Derivados das fotos de imóveis (miniatura, card e tamanho cheio)
+
+Depois do upload a rota enfileira a task "image_derivatives" no outbox. O
+handler gera os derivados num ProcessPoolExecutor (decodificar/redimensionar
+fotos de 5-10 MB é CPU pura e travaria o event loop), grava ao lado do
+original (com storage S3, numa cópia temporária, enviando os derivados de
+volta ao bucket) e salva dimensões + URLs em PropertyImages.variants. A
+resposta da API monta o srcset a partir disso.
+
+Requer o Pillow; sem ele as imagens continuam servindo só o original.
+AVIF só é gerado quando o Pillow instalado tem suporte.
+"""
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from src.database.models import PropertyImages
+from src.services.outbox import outbox_task
+from src.services.storage import storage
+from src.services.uploads import UPLOADS_ROOT
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+
+# nome -> maior lado em pixels (nunca amplia o original)
+IMAGE_SIZES = {"thumb": 320, "card": 800, "full": 1920}
+
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _formats() -> List[str]:
+    from PIL import features
+
+    formats = ["webp"]
+    if features.check("avif"):
+        formats.append("avif")
+    return formats
+
+
+def _generate(source: str, formats: List[str], quality: int) -> dict:
+    """Executa no processo do pool: gera os derivados e devolve as dimensões"""
+    from PIL import Image, ImageOps
+
+    source_path = Path(source)
+    variants = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        width, height = image.size
+
+        for name, max_side in IMAGE_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            for fmt in formats:
+                target = source_path.with_name(f"{source_path.stem}-{name}.{fmt}")
+                tmp = target.with_name(f".{target.name}.tmp")
+                resized.save(tmp, format=fmt.upper(), quality=quality)
+                os.replace(tmp, target)
+                variants.append({
+                    "name": name,
+                    "format": fmt,
+                    "width": resized.width,
+                    "height": resized.height,
+                    "file": target.name,
+                })
+
+    return {"width": width, "height": height, "variants": variants}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: fork copiaria o processo da API (threads, conexões do pool, sockets)
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _storage_key(image_url: str) -> Optional[str]:
+    """/uploads/<chave> (ou http://host/uploads/<chave>) -> chave"""
+    _, sep, key = image_url.partition("/uploads/")
+    return key if sep else None
+
+
+def _legacy_path(key: str) -> Optional[Path]:
+    # Uploads anteriores ao blob store ficam sempre no disco local
+    path = (UPLOADS_ROOT / key).resolve()
+    if UPLOADS_ROOT.resolve() not in path.parents:
+        return None
+    return path
+
+
+async def _run_generate(source: Path) -> dict:
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), _generate, str(source), _formats(), IMAGE_QUALITY)
+    except BrokenProcessPool:
+        # Processo do pool morreu (ex.: OOM): o executor não se recupera sozinho
+        logger.warning("Imagens: pool de processos quebrado, recriando")
+        shutdown_image_pool()
+        return await loop.run_in_executor(_get_pool(), _generate, str(source), _formats(), IMAGE_QUALITY)
+
+
+@outbox_task("image_derivatives")
+async def _image_derivatives_task(db: AsyncSession, payload: dict):
+    if not PILLOW_AVAILABLE:
+        logger.warning("Imagens: Pillow não instalado, derivados não gerados")
+        return
+
+    image = await db.get(PropertyImages, UUID(payload["image_id"]))
+    if image is None:
+        return
+    key = _storage_key(image.image_url)
+    if key is None:
+        return
+
+    legacy = not key.startswith("blobs/")
+    source = _legacy_path(key) if legacy else storage.local_path(key)
+    workdir = None
+    if source is None and not legacy:
+        # Storage remoto: processa uma cópia local e envia os derivados de volta
+        workdir = Path(await run_in_threadpool(tempfile.mkdtemp, prefix="derivatives-"))
+        source = workdir / Path(key).name
+        await run_in_threadpool(storage.download_to, key, source)
+
+    try:
+        if source is None or not source.exists():
+            return
+        result = await _run_generate(source)
+        if not legacy:
+            base_key = key.rsplit("/", 1)[0]
+            for v in result["variants"]:
+                await run_in_threadpool(
+                    storage.put_file,
+                    f"{base_key}/{v['file']}",
+                    source.with_name(v["file"]),
+                    f"image/{v['format']}",
+                )
+    finally:
+        if workdir is not None:
+            await run_in_threadpool(shutil.rmtree, workdir, True)
+
+    base_url = image.image_url.rsplit("/", 1)[0]
+    image.width = result["width"]
+    image.height = result["height"]
+    image.variants = [
+        {
+            "name": v["name"],
+            "format": v["format"],
+            "width": v["width"],
+            "height": v["height"],
+            "url": f"{base_url}/{v['file']}",
+        }
+        for v in result["variants"]
+    ]
+
+
+def build_srcset(variants: Optional[list], fmt: str = "webp") -> Optional[str]:
+    """"url 320w, url 800w, ..." dos derivados num formato"""
+    entries = sorted(
+        (v for v in variants or [] if v["format"] == fmt),
+        key=lambda v: v["width"],
+    )
+    if not entries:
+        return None
+    # Originais pequenos geram derivados repetidos; mantém uma largura de cada
+    seen = {}
+    for v in entries:
+        seen.setdefault(v["width"], v["url"])
+    return ", ".join(f"{url} {width}w" for width, url in seen.items())
+
+
+def variant_url(variants: Optional[list], name: str, fmt: str = "webp") -> Optional[str]:
+    for v in variants or []:
+        if v["name"] == name and v["format"] == fmt:
+            return v["url"]
+    return None
@@ -0,0 +1,248 @@
+"""
+Outbox transacional + pool de workers para efeitos colaterais assíncronos
+
+A rota grava o evento na mesma transação dos dados (enqueue) e responde;
+os workers pegam os eventos prontos com FOR UPDATE SKIP LOCKED, executam o
+handler registrado para a task e apagam o evento. Falhas são reagendadas
+com backoff exponencial até OUTBOX_MAX_ATTEMPTS, depois ficam como "failed".
+
+Os handlers são registrados com @outbox_task("nome") e recebem
+(db: AsyncSession, payload: dict). O handler não faz commit: _execute
+confirma as alterações dele junto com a remoção do evento, então uma
+queda ou reclamação por OUTBOX_LOCK_TIMEOUT no meio não reaplica efeitos
+já gravados. Efeitos externos que dependem do commit (ex.: evento de
+WebSocket) vão em after_commit().
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import AsyncSessionLocal
+from src.database.models import OutboxEvents
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# Evento "processing" há mais que isso (worker caiu) volta a ficar disponível
+OUTBOX_LOCK_TIMEOUT = int(os.getenv("OUTBOX_LOCK_TIMEOUT", "120"))
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+
+_handlers: Dict[str, Handler] = {}
+
+
+def outbox_task(name: str):
+    """Registra o handler de uma task do outbox"""
+
+    def decorator(func: Handler) -> Handler:
+        _handlers[name] = func
+        return func
+
+    return decorator
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Agenda um efeito para depois do commit do handler (não roda se ele falhar)"""
+    db.info.setdefault("outbox_after_commit", []).append(callback)
+
+
+def enqueue(db: AsyncSession, task: str, payload: dict, delay: float = 0) -> OutboxEvents:
+    """Adiciona o evento à sessão; só vale depois do commit de quem chamou"""
+    event = OutboxEvents(
+        task=task,
+        payload=payload,
+        available_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(event)
+    return event
+
+
+@dataclass
+class TaskMetrics:
+    succeeded: int = 0
+    failed: int = 0
+    retried: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+
+_metrics: Dict[str, TaskMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def _record(task: str, elapsed: float, outcome: str) -> None:
+    with _metrics_lock:
+        m = _metrics.setdefault(task, TaskMetrics())
+        setattr(m, outcome, getattr(m, outcome) + 1)
+        m.total_time += elapsed
+        m.max_time = max(m.max_time, elapsed)
+
+
+def get_outbox_metrics() -> Dict[str, dict]:
+    with _metrics_lock:
+        result = {}
+        for task, m in _metrics.items():
+            runs = m.succeeded + m.failed + m.retried
+            result[task] = {
+                "succeeded": m.succeeded,
+                "failed": m.failed,
+                "retried": m.retried,
+                "avg_ms": round(m.total_time * 1000 / runs, 2) if runs else 0,
+                "max_ms": round(m.max_time * 1000, 2),
+            }
+        return result
+
+
+async def outbox_backlog() -> Dict[str, int]:
+    """Eventos por status no banco (pending/processing/failed)"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(OutboxEvents.status, func.count()).group_by(OutboxEvents.status)
+        )).all()
+    return {status: count for status, count in rows}
+
+
+class OutboxWorkerPool:
+    def __init__(self, size: int = OUTBOX_WORKERS):
+        self.size = size
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def notify(self) -> None:
+        """
+        Acorda os workers após um commit com eventos novos (mesmo processo)
+
+        Pode ser chamado de rotas síncronas (threadpool): o Event só é
+        tocado no loop dos workers.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._workers = [
+            asyncio.create_task(self._run(i), name=f"outbox-worker-{i}")
+            for i in range(self.size)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _run(self, index: int) -> None:
+        while True:
+            try:
+                processed = await self._process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox: falha no worker %d", index)
+                processed = 0
+
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> List[OutboxEvents]:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            events = (await db.scalars(
+                select(OutboxEvents)
+                .where(
+                    or_(OutboxEvents.status == "pending", OutboxEvents.status == "processing"),
+                    OutboxEvents.available_at <= now,
+                )
+                .order_by(OutboxEvents.available_at)
+                .limit(OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )).all()
+
+            for event in events:
+                event.status = "processing"
+                event.attempts += 1
+                event.available_at = now + timedelta(seconds=OUTBOX_LOCK_TIMEOUT)
+            await db.commit()
+            return list(events)
+
+    async def _process_batch(self) -> int:
+        events = await self._claim()
+        for event in events:
+            await self._execute(event)
+        return len(events)
+
+    async def _execute(self, event: OutboxEvents) -> None:
+        handler = _handlers.get(event.task)
+        started = time.perf_counter()
+
+        async with AsyncSessionLocal() as db:
+            try:
+                if handler is None:
+                    raise LookupError(f"Task de outbox sem handler: {event.task}")
+                await handler(db, event.payload)
+                await db.execute(delete(OutboxEvents).where(OutboxEvents.id == event.id))
+                await db.commit()
+                _record(event.task, time.perf_counter() - started, "succeeded")
+                await self._run_after_commit(db, event.task)
+                return
+            except Exception as exc:
+                db.info.pop("outbox_after_commit", None)
+                await db.rollback()
+                error = f"{type(exc).__name__}: {exc}"
+                logger.warning("Outbox: %s falhou (tentativa %d): %s", event.task, event.attempts, error)
+
+            if event.attempts >= OUTBOX_MAX_ATTEMPTS or handler is None:
+                values = {"status": "failed", "last_error": error}
+                outcome = "failed"
+            else:
+                backoff = 2 ** event.attempts
+                values = {
+                    "status": "pending",
+                    "last_error": error,
+                    "available_at": datetime.utcnow() + timedelta(seconds=backoff),
+                }
+                outcome = "retried"
+
+            await db.execute(update(OutboxEvents).where(OutboxEvents.id == event.id).values(**values))
+            await db.commit()
+            _record(event.task, time.perf_counter() - started, outcome)
+
+    @staticmethod
+    async def _run_after_commit(db: AsyncSession, task: str) -> None:
+        # O evento já foi removido: falha aqui só é registrada, nunca reexecuta o handler
+        for callback in db.info.pop("outbox_after_commit", []):
+            try:
+                await callback()
+            except Exception:
+                logger.exception("Outbox: falha no efeito pós-commit de %s", task)
+
+
+outbox_workers = OutboxWorkerPool()
@@ -0,0 +1,143 @@
+"""
+Confirmações de leitura em lote
+
+Recibos ("li até a mensagem X") chegam pelo HTTP ou pelo WebSocket da
+conversa e ficam pendentes por READ_RECEIPT_WINDOW segundos. Cada lote
+vira uma transação com um UPDATE por conversa (até a maior mensagem
+confirmada) e um único evento messages_read por conversa.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import func, select, tuple_, update
+
+from src.database.db import AsyncSessionLocal
+from src.database.models import Conversations, Messages
+from src.websocket.manager import manager
+
+logger = logging.getLogger(__name__)
+
+READ_RECEIPT_WINDOW = float(os.getenv("READ_RECEIPT_WINDOW", "0.25"))
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Recibos do WebSocket não aguardam o resultado; evita warning de exceção não lida
+    if not future.cancelled():
+        future.exception()
+
+
+class ReadReceiptBatcher:
+    def __init__(self, window: float = READ_RECEIPT_WINDOW):
+        self.window = window
+        # conversa -> mensagens confirmadas (None = tudo o que existe)
+        self._pending: Dict[UUID, Set[Optional[UUID]]] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def ack(self, conversation_id: UUID, up_to: Optional[UUID] = None) -> asyncio.Future:
+        """Registra o recibo; o future conclui quando o lote for gravado"""
+        self._pending.setdefault(conversation_id, set()).add(up_to)
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        self._waiters.append(future)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return future
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        # Recibos que chegarem a partir daqui entram no próximo lote
+        self._flush_task = None
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+
+        try:
+            events = await self._flush(pending)
+        except Exception as exc:
+            logger.exception("Recibos de leitura: falha ao gravar lote")
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+        # Lote já gravado: falha ao avisar uma conversa não derruba as demais
+        for event in events:
+            try:
+                await manager.send_conversation_message(event, event["conversation_id"])
+            except Exception:
+                logger.exception(
+                    "Recibos de leitura: falha ao enviar messages_read (conversa %s)",
+                    event["conversation_id"],
+                )
+
+    async def _flush(self, pending: Dict[UUID, Set[Optional[UUID]]]) -> List[dict]:
+        now = datetime.utcnow()
+        events = []
+
+        async with AsyncSessionLocal() as db:
+            message_ids = {m for up_tos in pending.values() for m in up_tos if m is not None}
+            positions = {}
+            if message_ids:
+                rows = await db.execute(
+                    select(Messages.id, Messages.conversation_id, Messages.created_at)
+                    .where(Messages.id.in_(message_ids))
+                )
+                positions = {row.id: (row.conversation_id, row.created_at) for row in rows}
+
+            for conversation_id, up_tos in pending.items():
+                unread = (
+                    Messages.conversation_id == conversation_id,
+                    Messages.sender_type == "cliente",
+                    Messages.status != "read",
+                )
+                stmt = update(Messages).where(*unread)
+
+                if None in up_tos:
+                    up_to = None
+                else:
+                    candidates = [
+                        (positions[m][1], m)
+                        for m in up_tos
+                        if m in positions and positions[m][0] == conversation_id
+                    ]
+                    if not candidates:
+                        continue
+                    created_at, up_to = max(candidates)
+                    stmt = stmt.where(
+                        tuple_(Messages.created_at, Messages.id) <= tuple_(created_at, up_to)
+                    )
+
+                result = await db.execute(stmt.values(status="read", read_at=now))
+
+                remaining = await db.scalar(select(func.count()).select_from(Messages).where(*unread))
+                await db.execute(
+                    update(Conversations)
+                    .where(Conversations.id == conversation_id)
+                    .values(unread_count=remaining, is_read=remaining == 0)
+                )
+
+                if result.rowcount:
+                    events.append({
+                        "type": "messages_read",
+                        "conversation_id": str(conversation_id),
+                        "up_to": str(up_to) if up_to else None,
+                        "count": result.rowcount,
+                    })
+
+            await db.commit()
+
+        return events
+
+
+read_receipts = ReadReceiptBatcher()
@@ -0,0 +1,204 @@
+"""
+Arquivos estáticos com política de cache (/uploads e /widget)
+
+- URLs imutáveis recebem Cache-Control de 1 ano com immutable. Isso vale
+  para os blobs, cujo nome já é o SHA-256 (ver blobs.py), e para as URLs
+  com fingerprint (widget.<hash12>.js, geradas por asset_url). O
+  navegador não revalida essas URLs.
+- As demais URLs (widget.js estável, uploads antigos) recebem
+  STATIC_MAX_AGE com stale-while-revalidate. O ETag forte permite
+  responder 304 sem corpo.
+- Quando há widget.js.br/.gz atualizados ao lado do original, a versão
+  pré-comprimida é servida conforme o Accept-Encoding. Ver
+  precompress_assets.
+- Range é tratado pelo FileResponse do Starlette.
+- Caminhos com segmento iniciado por "." (temporários de escrita, ex.:
+  .nome.tmp) respondem 404.
+"""
+import gzip
+import hashlib
+import importlib.util
+import logging
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from src.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "300"))
+STATIC_STALE_WHILE_REVALIDATE = int(os.getenv("STATIC_STALE_WHILE_REVALIDATE", "86400"))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+FINGERPRINT_LENGTH = 12
+_FINGERPRINT_RE = re.compile(r"^(?P<base>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % FINGERPRINT_LENGTH)
+
+# Preferência do servidor quando o cliente aceita as duas
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+# caminho -> (mtime_ns, size, sha256)
+_digests = TTLCache(maxsize=4096, ttl=24 * 3600)
+
+
+def file_digest(path: str, stat_result: Optional[os.stat_result] = None) -> str:
+    """SHA-256 do conteúdo, recalculado só quando mtime/tamanho mudam"""
+    stat_result = stat_result or os.stat(path)
+    cached = _digests.get(path)
+    if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(1024 * 1024):
+            digest.update(chunk)
+    _digests.set(path, (stat_result.st_mtime_ns, stat_result.st_size, digest.hexdigest()))
+    return digest.hexdigest()
+
+
+def asset_url(mount_path: str, directory: Path, relative: str) -> str:
+    """URL com fingerprint do conteúdo: /widget/widget.js -> /widget/widget.<hash12>.js"""
+    digest = file_digest(str(directory / relative))[:FINGERPRINT_LENGTH]
+    stem, dot, ext = relative.rpartition(".")
+    fingerprinted = f"{stem}.{digest}.{ext}" if dot else f"{relative}.{digest}"
+    return f"{mount_path.rstrip('/')}/{fingerprinted}"
+
+
+def precompress_assets(directory: Path, patterns: Iterable[str] = ("*.js", "*.css", "*.html")) -> None:
+    """Gera .gz (e .br, se o pacote brotli existir) dos arquivos desatualizados"""
+    for pattern in patterns:
+        for source in directory.glob(pattern):
+            data = None
+            for encoding, suffix in _ENCODINGS:
+                if encoding == "br" and not BROTLI_AVAILABLE:
+                    continue
+                target = source.with_name(source.name + suffix)
+                if target.exists() and target.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+                    continue
+                if data is None:
+                    data = source.read_bytes()
+                if encoding == "br":
+                    import brotli
+
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                tmp = target.with_name(f".{target.name}.tmp")
+                tmp.write_bytes(compressed)
+                os.replace(tmp, target)
+                logger.info("Estáticos: %s gerado (%d -> %d bytes)", target.name, len(data), len(compressed))
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles com Cache-Control, ETag forte, fingerprint e pré-compressão
+
+    - immutable_prefixes: subpastas endereçadas por conteúdo (ETag = nome)
+    - fingerprint: aceita nome.<hash12>.ext (imutável quando o hash confere)
+    - demais arquivos: ETag = SHA-256 do conteúdo (ver file_digest)
+    - precompressed: procura .br/.gz ao lado do arquivo
+    - arquivos/pastas ocultos (".") nunca são servidos
+    """
+
+    def __init__(
+        self,
+        *,
+        immutable_prefixes: Tuple[str, ...] = (),
+        fingerprint: bool = False,
+        precompressed: bool = False,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.immutable_prefixes = immutable_prefixes
+        self.fingerprint = fingerprint
+        self.precompressed = precompressed
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        # Temporários ainda sendo escritos não podem ser servidos (nem cacheados)
+        if any(part.startswith(".") for part in path.split("/")):
+            raise HTTPException(status_code=404)
+
+        requested_hash = None
+        if self.fingerprint:
+            match = _FINGERPRINT_RE.match(path)
+            if match:
+                path = match["base"] + match["ext"]
+                requested_hash = match["hash"]
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            return await super().get_response(path, scope)
+
+        if any(path.startswith(prefix) for prefix in self.immutable_prefixes):
+            etag = Path(full_path).name.split(".", 1)[0]
+            immutable = True
+        else:
+            # SHA-256 do conteúdo (cacheado por mtime/tamanho), também para uploads antigos
+            etag = await anyio.to_thread.run_sync(file_digest, full_path, stat_result)
+            # Hash antigo (deploy novo) serve o atual, mas sem cache longo
+            immutable = requested_hash is not None and etag.startswith(requested_hash)
+
+        request_headers = Headers(scope=scope)
+        encoding = None
+        serve_path, serve_stat = full_path, stat_result
+        if self.precompressed:
+            encoding, serve_path, serve_stat = await anyio.to_thread.run_sync(
+                self._pick_encoding, full_path, stat_result, request_headers.get("accept-encoding", "")
+            )
+
+        response = FileResponse(
+            serve_path,
+            stat_result=serve_stat,
+            media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+        )
+        if etag:
+            response.headers["etag"] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+        if encoding:
+            response.headers["content-encoding"] = encoding
+        if self.precompressed:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL
+            if immutable
+            else f"public, max-age={STATIC_MAX_AGE}, stale-while-revalidate={STATIC_STALE_WHILE_REVALIDATE}"
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _pick_encoding(
+        full_path: str, stat_result: os.stat_result, accept_encoding: str
+    ) -> Tuple[Optional[str], str, os.stat_result]:
+        accepted = set()
+        for token in accept_encoding.lower().split(","):
+            name, _, params = token.partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0"):
+                accepted.add(name.strip())
+        for encoding, suffix in _ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # Variante mais velha que o original está desatualizada
+            if variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+                return encoding, full_path + suffix, variant_stat
+        return None, full_path, stat_result
@@ -0,0 +1,300 @@
+"""
+Backends de armazenamento dos uploads
+
+STORAGE_BACKEND:
+- local (padrão) grava em backend/uploads, servido pelo /uploads da API
+- s3     bucket S3 compatível (AWS, MinIO) em S3_BUCKET (requer "boto3")
+
+As chaves são caminhos relativos ("blobs/ab/cd/<sha256>.jpg"). No banco as
+URLs continuam "/uploads/<chave>" em qualquer backend: com S3, a API só
+responde GET /uploads/blobs/... com redirect para uma URL pré-assinada do
+bucket (ver src/routes/storage.py).
+
+Upload direto: presign_upload() devolve um PUT pré-assinado para a chave
+final, com tamanho e SHA-256 declarados; com S3 os bytes vão do navegador
+direto para o bucket. O backend local emite um PUT assinado (HMAC) para a
+própria API, que confere tamanho e hash durante o streaming.
+
+Os métodos são síncronos (boto3 é síncrono); chame via threadpool em
+rotas async.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+from src.services.uploads import UPLOADS_ROOT
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+STORAGE_PRESIGN_EXPIRES = int(os.getenv("STORAGE_PRESIGN_EXPIRES", "900"))
+STORAGE_SIGNING_KEY = os.getenv("STORAGE_SIGNING_KEY", os.getenv("JWT_SECRET_KEY", "CHANGE_ME"))
+
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # ex.: http://localhost:9000 (MinIO)
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+
+# Conteúdo endereçado por hash nunca muda
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class PresignedUpload:
+    method: str
+    url: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    expires_in: int = STORAGE_PRESIGN_EXPIRES
+
+
+class StorageBackend:
+    """Interface comum; `path` em put_file é um arquivo local completo, consumido pela chamada"""
+
+    # True quando os arquivos ficam no disco servido pelo /uploads
+    serves_locally = False
+
+    def put_file(self, key: str, path: Path, content_type: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def verify(self, key: str, size: int, sha256: str) -> bool:
+        """Objeto existe com o tamanho e o hash esperados (após upload direto)"""
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> int:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Caminho no disco, quando o backend é local (evita cópia)"""
+        return None
+
+    def download_to(self, key: str, path: Path) -> None:
+        raise NotImplementedError
+
+    def presign_download(self, key: str, expires: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        raise NotImplementedError
+
+    def presign_upload(
+        self, key: str, content_type: str, size: int, sha256: str, expires: int = STORAGE_PRESIGN_EXPIRES
+    ) -> PresignedUpload:
+        raise NotImplementedError
+
+
+def _sign(*parts) -> str:
+    message = "|".join(str(p) for p in parts).encode()
+    return hmac.new(STORAGE_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+class LocalStorage(StorageBackend):
+    serves_locally = True
+
+    def __init__(self, root: Path = UPLOADS_ROOT):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Chave fora do storage: {key}")
+        return path
+
+    def put_file(self, key: str, path: Path, content_type: Optional[str] = None) -> None:
+        target = self.path(key)
+        if path.resolve() == target:
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target)
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def verify(self, key: str, size: int, sha256: str) -> bool:
+        # O PUT local já conferiu o hash antes de gravar na chave final
+        path = self.path(key)
+        return path.is_file() and path.stat().st_size == size
+
+    def delete_prefix(self, prefix: str) -> int:
+        base = self.path(prefix)
+        removed = 0
+        for path in base.parent.glob(f"{base.name}*"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self.path(key)
+
+    def download_to(self, key: str, path: Path) -> None:
+        shutil.copyfile(self.path(key), path)
+
+    def presign_download(self, key: str, expires: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        # Servido pelo /uploads (cache imutável para blobs)
+        return f"/uploads/{key}"
+
+    def presign_upload(
+        self, key: str, content_type: str, size: int, sha256: str, expires: int = STORAGE_PRESIGN_EXPIRES
+    ) -> PresignedUpload:
+        expires_at = int(time.time()) + expires
+        query = urlencode({
+            "size": size,
+            "sha256": sha256,
+            "expires": expires_at,
+            "signature": _sign(key, size, sha256, expires_at),
+        })
+        return PresignedUpload(
+            method="PUT",
+            url=f"/storage/local/{key}?{query}",
+            headers={"Content-Type": content_type},
+            expires_in=expires,
+        )
+
+    @staticmethod
+    def check_signature(key: str, size: int, sha256: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(_sign(key, size, sha256, expires), signature)
+
+
+class S3Storage(StorageBackend):
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        region: str = S3_REGION,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requer o pacote 'boto3' (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requer S3_BUCKET")
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=S3_ACCESS_KEY_ID,
+            aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+            # MinIO e afins usam path-style (http://host:9000/bucket/chave)
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "path" if endpoint_url else "auto"},
+            ),
+        )
+
+    def _head(self, key: str, **kwargs) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key, **kwargs)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def put_file(self, key: str, path: Path, content_type: Optional[str] = None) -> None:
+        extra = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra["ContentType"] = content_type
+        # upload_file faz multipart em paralelo para arquivos grandes
+        self.client.upload_file(str(path), self.bucket, key, ExtraArgs=extra)
+        path.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def verify(self, key: str, size: int, sha256: str) -> bool:
+        head = self._head(key, ChecksumMode="ENABLED")
+        if head is None:
+            return False
+        expected = base64.b64encode(bytes.fromhex(sha256)).decode()
+        checksum = head.get("ChecksumSHA256")
+        if head["ContentLength"] != size:
+            matches = False
+        elif checksum and "-" not in checksum:
+            matches = checksum == expected
+        else:
+            # Sem checksum (gravado por put_file) ou composto (multipart): confere lendo o objeto
+            matches = self._sha256(key) == sha256
+        if not matches:
+            # Conteúdo diferente do declarado não pode ficar na chave do hash
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+            return False
+        return True
+
+    def _sha256(self, key: str) -> str:
+        digest = hashlib.sha256()
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        for chunk in body.iter_chunks(1024 * 1024):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def delete_prefix(self, prefix: str) -> int:
+        removed = 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+                removed += len(objects)
+        return removed
+
+    def download_to(self, key: str, path: Path) -> None:
+        self.client.download_file(self.bucket, key, str(path))
+
+    def presign_download(self, key: str, expires: int = STORAGE_PRESIGN_EXPIRES) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires,
+        )
+
+    def presign_upload(
+        self, key: str, content_type: str, size: int, sha256: str, expires: int = STORAGE_PRESIGN_EXPIRES
+    ) -> PresignedUpload:
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+                "CacheControl": IMMUTABLE_CACHE_CONTROL,
+            },
+            ExpiresIn=expires,
+        )
+        return PresignedUpload(
+            method="PUT",
+            url=url,
+            headers={
+                "Content-Type": content_type,
+                "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+                "x-amz-checksum-sha256": checksum,
+            },
+            expires_in=expires,
+        )
+
+
+def create_storage(name: str = STORAGE_BACKEND) -> StorageBackend:
+    if name == "s3":
+        return S3Storage()
+    if name != "local":
+        logger.warning("STORAGE_BACKEND desconhecido (%s), usando local", name)
+    return LocalStorage()
+
+
+storage = create_storage()
@@ -0,0 +1,99 @@
+"""
+Gravação de uploads em streaming
+
+O arquivo é lido em blocos de UPLOAD_CHUNK_SIZE e cada bloco é gravado
+(e somado ao SHA-256) no threadpool, sem I/O bloqueante no event loop e
+sem carregar o arquivo inteiro em memória. O limite UPLOAD_MAX_BYTES é
+verificado durante a leitura. A gravação vai para um arquivo temporário
+(PendingUpload) e só segue para o storage quando completa; o destino é
+escolhido depois, a partir do hash (ver blobs.py).
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+UPLOADS_ROOT = Path(__file__).resolve().parents[2] / "uploads"  # backend/uploads
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo excede o limite de {max_bytes / (1024 * 1024):.0f} MB",
+    )
+
+
+class PendingUpload:
+    """Arquivo temporário + hash incremental; o destino decide quem consome `tmp`"""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        self.tmp = Path(tmp)
+        self.fh = os.fdopen(fd, "wb")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self.hash.hexdigest()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise _too_large(self.max_bytes)
+        self.hash.update(chunk)
+        self.fh.write(chunk)
+
+    def finish(self) -> None:
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        self.fh.close()
+
+    def discard(self) -> None:
+        self.fh.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def check_upload_size(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> None:
+    """Recusa de antemão quando o parser multipart já sabe o tamanho"""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+async def stream_upload(file: UploadFile, directory: Path, max_bytes: int = UPLOAD_MAX_BYTES) -> PendingUpload:
+    """Grava o upload num temporário em `directory` (para rotas async)"""
+    check_upload_size(file, max_bytes)
+    pending = await run_in_threadpool(PendingUpload, directory, max_bytes)
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(pending.write, chunk)
+        await run_in_threadpool(pending.finish)
+        return pending
+    except BaseException:
+        await run_in_threadpool(pending.discard)
+        raise
+
+
+def stream_upload_sync(file: UploadFile, directory: Path, max_bytes: int = UPLOAD_MAX_BYTES) -> PendingUpload:
+    """Mesma gravação para rotas sync (já executadas no threadpool)"""
+    check_upload_size(file, max_bytes)
+    source: BinaryIO = file.file
+    pending = PendingUpload(directory, max_bytes)
+    try:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            pending.write(chunk)
+        pending.finish()
+        return pending
+    except BaseException:
+        pending.discard()
+        raise
+
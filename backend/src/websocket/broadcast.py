@@ -0,0 +1,297 @@
+"""
+Backends de broadcast para o ConnectionManager
+
+Cada worker só conhece os WebSockets conectados nele. Para que um evento
+publicado no worker A chegue a um navegador conectado no worker B, o
+manager publica um envelope {"scope", "target", "data"} no backend e cada
+worker entrega localmente o que recebe.
+
+WS_BROADCAST_BACKEND:
+- memory   (padrão) entrega direto no próprio processo (um único worker)
+- postgres LISTEN/NOTIFY no canal WS_BROADCAST_CHANNEL (usa o mesmo banco).
+           Envelopes acima do limite do NOTIFY vão para a tabela
+           ws_broadcast_spill e o NOTIFY leva só {"spill": id}
+- redis    Pub/Sub em REDIS_URL (requer o pacote "redis")
+
+Se a conexão de escuta cai, o backend reconecta com backoff exponencial
+(avisos publicados durante a queda se perdem, como em qualquer pub/sub).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WS_BROADCAST_BACKEND = os.getenv("WS_BROADCAST_BACKEND", "memory").lower()
+WS_BROADCAST_CHANNEL = os.getenv("WS_BROADCAST_CHANNEL", "ws_broadcast")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# NOTIFY aceita payloads de até 8000 bytes
+PG_NOTIFY_MAX_BYTES = 7900
+
+# Envelopes grandes ficam na tabela só o bastante para os workers lerem
+WS_BROADCAST_SPILL_TTL = float(os.getenv("WS_BROADCAST_SPILL_TTL", "300"))
+
+# Backoff de reconexão e verificação periódica da conexão de LISTEN
+WS_BROADCAST_RECONNECT_MIN = float(os.getenv("WS_BROADCAST_RECONNECT_MIN", "0.5"))
+WS_BROADCAST_RECONNECT_MAX = float(os.getenv("WS_BROADCAST_RECONNECT_MAX", "30"))
+WS_BROADCAST_HEALTHCHECK = float(os.getenv("WS_BROADCAST_HEALTHCHECK", "30"))
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class BroadcastBackend:
+    """Interface: publish() envia para todos os workers; o handler recebe em cada um"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    def set_handler(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, envelope: dict) -> None:
+        raise NotImplementedError
+
+    async def _dispatch(self, raw) -> None:
+        if self._handler is None:
+            return
+        try:
+            await self._handler(json.loads(raw))
+        except Exception:
+            logger.exception("Broadcast: falha ao entregar envelope")
+
+
+class InMemoryBackend(BroadcastBackend):
+    async def publish(self, envelope: dict) -> None:
+        if self._handler is not None:
+            await self._handler(envelope)
+
+
+class PostgresBackend(BroadcastBackend):
+    """LISTEN/NOTIFY com conexões asyncpg dedicadas (fora do pool do SQLAlchemy)"""
+
+    def __init__(self, dsn: str, channel: str = WS_BROADCAST_CHANNEL):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self._listen_conn = None
+        self._listen_lost: Optional[asyncio.Event] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._tasks: set = set()
+        self._last_spill_cleanup = 0.0
+
+    async def start(self) -> None:
+        # A primeira conexão falha no startup, como antes; depois o watcher reconecta
+        await self._open_listener()
+        self._watcher = asyncio.create_task(self._watch_listener())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        await self._close_listener()
+        async with self._publish_lock:
+            if self._publish_conn is not None:
+                await self._publish_conn.close()
+                self._publish_conn = None
+
+    async def _open_listener(self) -> None:
+        import asyncpg
+
+        lost = asyncio.Event()
+        conn = await asyncpg.connect(self.dsn)
+        conn.add_termination_listener(lambda _conn: lost.set())
+        await conn.add_listener(self.channel, self._on_notify)
+        self._listen_conn, self._listen_lost = conn, lost
+
+    async def _close_listener(self) -> None:
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None or conn.is_closed():
+            return
+        try:
+            await conn.remove_listener(self.channel, self._on_notify)
+            await conn.close(timeout=5)
+        except Exception:
+            conn.terminate()
+
+    async def _watch_listener(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._listen_lost.wait(), timeout=WS_BROADCAST_HEALTHCHECK)
+            except asyncio.TimeoutError:
+                # Conexão meio-aberta (rede caiu sem FIN) não dispara o listener de término
+                try:
+                    await self._listen_conn.execute("SELECT 1", timeout=5)
+                    continue
+                except Exception:
+                    pass
+
+            logger.warning("Broadcast: conexão de LISTEN caiu, reconectando")
+            await self._close_listener()
+            delay = WS_BROADCAST_RECONNECT_MIN
+            while True:
+                try:
+                    await self._open_listener()
+                    break
+                except Exception as exc:
+                    logger.warning("Broadcast: falha ao reconectar (%s), nova tentativa em %.1fs", exc, delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, WS_BROADCAST_RECONNECT_MAX)
+            logger.info("Broadcast: LISTEN restabelecido")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        task = asyncio.ensure_future(self._receive(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _receive(self, payload: str) -> None:
+        if payload.startswith('{"spill"'):
+            try:
+                spill_id = json.loads(payload)["spill"]
+                payload = await self._query(
+                    "fetchval", "SELECT payload FROM ws_broadcast_spill WHERE id = $1", spill_id
+                )
+            except Exception:
+                logger.exception("Broadcast: falha ao ler envelope da ws_broadcast_spill")
+                return
+            if payload is None:
+                logger.warning("Broadcast: envelope %s expirou antes da leitura", spill_id)
+                return
+        await self._dispatch(payload)
+
+    async def _query(self, method: str, query: str, *args):
+        """Executa na conexão de publicação, reconectando uma vez se ela caiu"""
+        import asyncpg
+
+        async with self._publish_lock:
+            for attempt in (1, 2):
+                if self._publish_conn is None or self._publish_conn.is_closed():
+                    self._publish_conn = await asyncpg.connect(self.dsn)
+                try:
+                    return await getattr(self._publish_conn, method)(query, *args)
+                except (OSError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError):
+                    self._publish_conn.terminate()
+                    self._publish_conn = None
+                    if attempt == 2:
+                        raise
+                    logger.warning("Broadcast: conexão de publicação caiu, reconectando")
+
+    async def publish(self, envelope: dict) -> None:
+        payload = json.dumps(envelope, default=str)
+        if len(payload.encode("utf-8")) <= PG_NOTIFY_MAX_BYTES:
+            await self._query("execute", "SELECT pg_notify($1, $2)", self.channel, payload)
+            return
+
+        # Acima do limite: grava o envelope e notifica só a referência
+        await self._query(
+            "execute",
+            """
+            WITH spilled AS (
+                INSERT INTO ws_broadcast_spill (payload) VALUES ($2) RETURNING id
+            )
+            SELECT pg_notify($1, json_build_object('spill', id)::text) FROM spilled
+            """,
+            self.channel,
+            payload,
+        )
+        now = time.monotonic()
+        if now - self._last_spill_cleanup > WS_BROADCAST_SPILL_TTL / 2:
+            self._last_spill_cleanup = now
+            await self._query(
+                "execute",
+                "DELETE FROM ws_broadcast_spill WHERE created_at < timezone('utc', now()) - make_interval(secs => $1)",
+                WS_BROADCAST_SPILL_TTL,
+            )
+
+
+class RedisBackend(BroadcastBackend):
+    def __init__(self, url: str = REDIS_URL, channel: str = WS_BROADCAST_CHANNEL):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("WS_BROADCAST_BACKEND=redis requer o pacote 'redis' (pip install redis)")
+
+        self._client = redis.from_url(self.url)
+        await self._subscribe()
+        self._reader = asyncio.create_task(self._read())
+
+    async def _subscribe(self) -> None:
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+
+    async def _close_pubsub(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is None:
+            return
+        try:
+            await pubsub.close()
+        except Exception:
+            pass
+
+    async def _read(self) -> None:
+        delay = WS_BROADCAST_RECONNECT_MIN
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    logger.info("Broadcast: assinatura no Redis restabelecida")
+                async for message in self._pubsub.listen():
+                    delay = WS_BROADCAST_RECONNECT_MIN
+                    if message.get("type") == "message":
+                        await self._dispatch(message["data"])
+                raise ConnectionError("assinatura encerrada pelo servidor")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Broadcast: conexão com o Redis caiu (%s), reconectando em %.1fs", exc, delay)
+                await self._close_pubsub()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WS_BROADCAST_RECONNECT_MAX)
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+            except Exception:
+                pass
+            await self._close_pubsub()
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def publish(self, envelope: dict) -> None:
+        await self._client.publish(self.channel, json.dumps(envelope, default=str))
+
+
+def create_backend(name: str = WS_BROADCAST_BACKEND) -> BroadcastBackend:
+    if name == "postgres":
+        from src.database.db import ASYNC_DATABASE_URL
+
+        return PostgresBackend(ASYNC_DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1))
+    if name == "redis":
+        return RedisBackend()
+    if name != "memory":
+        logger.warning("WS_BROADCAST_BACKEND desconhecido (%s), usando memory", name)
+    return InMemoryBackend()
@@ -0,0 +1,104 @@
+"""
+Fila de envio por conexão WebSocket
+
+Cada conexão tem uma fila limitada e uma task escritora própria: quem
+publica só enfileira o texto (já serializado) e segue, então um cliente
+lento não atrasa os demais. Com a fila cheia a mensagem mais antiga é
+descartada; mensagens com a mesma chave de coalescência (ex.: user_status
+do mesmo usuário) substituem a pendente em vez de ocupar outra posição.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+_seq = itertools.count()
+
+
+class ClientConnection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_close: Optional[Callable[["ClientConnection"], None]] = None,
+        max_queue: int = WS_SEND_QUEUE_SIZE,
+    ):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.coalesced = 0
+        self._on_close = on_close
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.last_seen = time.monotonic()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, text: str, coalesce_key: Optional[Hashable] = None) -> None:
+        """Enfileira sem bloquear (aplica coalescência/descarte)"""
+        if self._closed:
+            return
+
+        if coalesce_key is not None and coalesce_key in self._pending:
+            # Mantém a posição na fila, troca pelo estado mais recente
+            self._pending[coalesce_key] = text
+            self.coalesced += 1
+            return
+
+        if len(self._pending) >= self.max_queue:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+
+        key = coalesce_key if coalesce_key is not None else ("seq", next(_seq))
+        self._pending[key] = text
+        self._ready.set()
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, text = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_text(text), WS_SEND_TIMEOUT)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Cliente morto ou lento demais (timeout): sai do manager
+            logger.debug("WebSocket: falha no envio, removendo conexão", exc_info=True)
+            self.abort()
+
+    def touch(self) -> None:
+        """Registra atividade do cliente (qualquer frame recebido)"""
+        self.last_seen = time.monotonic()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_seen
+
+    def abort(self) -> None:
+        """Marca a conexão como morta e avisa o manager para removê-la"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.clear()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def close(self) -> None:
+        self._closed = True
+        self._pending.clear()
+        if not self._writer.done():
+            self._writer.cancel()
@@ -1,22 +1,178 @@
 """
 Gerenciador de conexões WebSocket para notificações e chat em tempo real
+
+As conexões ficam na memória do worker; os envios passam pelo backend de
+broadcast (ver broadcast.py) para alcançar clientes conectados em outros
+workers. A entrega local serializa o payload uma vez e só enfileira o
+texto na fila de cada conexão (ver connection.py).
+
+Heartbeat: a cada WS_PING_INTERVAL o servidor envia {"type": "ping"} e o
+reaper fecha conexões sem nenhum frame recebido há mais de WS_PING_TIMEOUT.
 """
-from typing import Dict, List, Set
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set
 from fastapi import WebSocket
 
+from .broadcast import BroadcastBackend, create_backend
+from .connection import ClientConnection
+
+logger = logging.getLogger(__name__)
+
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "25"))
+WS_PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", "75"))
+
+# Código de fechamento para conexões sem resposta ao heartbeat
+WS_CLOSE_HEARTBEAT_TIMEOUT = 4408
+
+
+def _coalesce_key(data) -> Optional[Hashable]:
+    """Eventos de estado em que só o valor mais recente importa"""
+    if not isinstance(data, dict):
+        return None
+    event_type = data.get("type")
+    if event_type == "user_status":
+        return ("user_status", data.get("user_id"))
+    if event_type == "user_typing":
+        return ("user_typing", data.get("sender_type"))
+    return None
+
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, backend: Optional[BroadcastBackend] = None):
         self.user_connections: Dict[str, List[WebSocket]] = {}
         self.conversation_connections: Dict[str, List[WebSocket]] = {}
         self.online_users: Set[str] = set()
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.dropped_messages = 0
+        self.coalesced_messages = 0
+        self.reaped_connections = 0
+        self._reaper: Optional[asyncio.Task] = None
+        self.scope_handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
+        self.backend = backend or create_backend()
+        self.backend.set_handler(self._deliver)
+        self._started = False
+
+    async def start(self):
+        await self.backend.start()
+        self._started = True
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        self._started = False
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await self.backend.stop()
+        for client in list(self.clients.values()):
+            client.close()
+        self.clients.clear()
+
+    async def _publish(self, scope: str, target: Optional[str], data):
+        envelope = {"scope": scope, "target": target, "data": data}
+        if not self._started:
+            # Sem backend iniciado (ex.: scripts), entrega só neste processo
+            await self._deliver(envelope)
+            return
+        await self.backend.publish(envelope)
+
+    async def _deliver(self, envelope: dict):
+        """Entrega local de um envelope recebido do backend"""
+        scope, target, data = envelope["scope"], envelope.get("target"), envelope["data"]
+        if scope == "user":
+            sockets = self.user_connections.get(target, [])
+        elif scope == "conversation":
+            sockets = self.conversation_connections.get(target, [])
+        elif scope == "all":
+            sockets = [ws for conns in self.user_connections.values() for ws in conns]
+        elif scope in self.scope_handlers:
+            await self.scope_handlers[scope](data)
+            return
+        else:
+            return
+
+        self._enqueue(sockets, data)
+
+    def _enqueue(self, sockets: List[WebSocket], data):
+        if not sockets:
+            return
+
+        # Serializa uma vez; cada conexão só recebe o texto na sua fila
+        text = json.dumps(data, default=str)
+        key = _coalesce_key(data)
+        for websocket in list(sockets):
+            client = self.clients.get(websocket)
+            if client is not None:
+                client.enqueue(text, key)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            try:
+                self.reap_and_ping()
+            except Exception:
+                logger.exception("WebSocket: falha no heartbeat")
+
+    def reap_and_ping(self):
+        """Fecha conexões sem atividade e envia ping às demais"""
+        ping = json.dumps({"type": "ping", "timestamp": int(time.time() * 1000)})
+        for websocket, client in list(self.clients.items()):
+            if client.idle_for() > WS_PING_TIMEOUT:
+                self.reaped_connections += 1
+                client.abort()
+                asyncio.create_task(self._close_quietly(websocket))
+            else:
+                client.enqueue(ping, ("server_ping",))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=WS_CLOSE_HEARTBEAT_TIMEOUT)
+        except Exception:
+            pass
+
+    def touch(self, websocket: WebSocket):
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.touch()
+
+    def register_scope(self, scope: str, handler: Callable[[dict], Awaitable[None]]):
+        """Envelopes com esse scope vão para o handler em cada worker (ex.: presença)"""
+        self.scope_handlers[scope] = handler
+
+    async def publish_scope(self, scope: str, data: dict):
+        await self._publish(scope, None, data)
+
+    def send_to(self, websocket: WebSocket, data: dict):
+        """Resposta a uma conexão, pela fila dela (nunca escrita concorrente no socket)"""
+        self._enqueue([websocket], data)
+
+    def send_local_user(self, data: dict, user_id: str):
+        """Entrega só às conexões deste worker (sem passar pelo backend)"""
+        self._enqueue(self.user_connections.get(user_id, []), data)
+
+    def _register(self, websocket: WebSocket, on_close) -> None:
+        self.clients[websocket] = ClientConnection(websocket, on_close=lambda _: on_close())
+
+    def _unregister(self, websocket: WebSocket) -> None:
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            self.dropped_messages += client.dropped
+            self.coalesced_messages += client.coalesced
+            client.close()
 
     async def connect_user(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
+        self._register(websocket, lambda: self.disconnect_user(websocket, user_id))
         self.user_connections.setdefault(user_id, []).append(websocket)
         self.online_users.add(user_id)
 
     def disconnect_user(self, websocket: WebSocket, user_id: str):
+        self._unregister(websocket)
         if user_id in self.user_connections:
             try:
                 self.user_connections[user_id].remove(websocket)
@@ -34,9 +190,11 @@ class ConnectionManager:
 
     async def connect_conversation(self, websocket: WebSocket, conversation_id: str):
         await websocket.accept()
+        self._register(websocket, lambda: self.disconnect_conversation(websocket, conversation_id))
         self.conversation_connections.setdefault(conversation_id, []).append(websocket)
 
     def disconnect_conversation(self, websocket: WebSocket, conversation_id: str):
+        self._unregister(websocket)
         if conversation_id in self.conversation_connections:
             try:
                 self.conversation_connections[conversation_id].remove(websocket)
@@ -46,30 +204,13 @@ class ConnectionManager:
                 pass
 
     async def send_personal_message(self, data: dict, user_id: str):
-        if user_id in self.user_connections:
-            disconnected = []
-            for connection in self.user_connections[user_id]:
-                try:
-                    await connection.send_json(data)
-                except Exception:
-                    disconnected.append(connection)
-            for connection in disconnected:
-                self.disconnect_user(connection, user_id)
+        await self._publish("user", user_id, data)
 
     async def send_conversation_message(self, data: dict, conversation_id: str):
-        if conversation_id in self.conversation_connections:
-            disconnected = []
-            for connection in self.conversation_connections[conversation_id]:
-                try:
-                    await connection.send_json(data)
-                except Exception:
-                    disconnected.append(connection)
-            for connection in disconnected:
-                self.disconnect_conversation(connection, conversation_id)
+        await self._publish("conversation", conversation_id, data)
 
     async def broadcast(self, data: dict):
-        for user_id in list(self.user_connections.keys()):
-            await self.send_personal_message(data, user_id)
+        await self._publish("all", None, data)
 
     async def broadcast_user_status(self, user_id: str, online: bool):
         await self.broadcast({"type": "user_status", "user_id": user_id, "online": online})
@@ -86,5 +227,16 @@ class ConnectionManager:
     def is_online(self, user_id: str) -> bool:
         return user_id in self.online_users
 
+    def send_queue_stats(self) -> dict:
+        """Conexões abertas/ceifadas e backpressure (fila, descartes, coalescência)"""
+        clients = list(self.clients.values())
+        return {
+            "connections": len(clients),
+            "reaped": self.reaped_connections,
+            "queued": sum(c.queued for c in clients),
+            "dropped": self.dropped_messages + sum(c.dropped for c in clients),
+            "coalesced": self.coalesced_messages + sum(c.coalesced for c in clients),
+        }
+
 
 manager = ConnectionManager()
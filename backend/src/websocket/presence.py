@@ -0,0 +1,227 @@
+"""
+Presença (online/offline) com debounce, diffs em lote e entrega por interesse
+
+- Ao desconectar, o usuário só vira "offline" neste worker depois de
+  PRESENCE_GRACE_SECONDS sem nenhuma conexão local; reconectar nesse
+  intervalo não gera evento.
+- Cada worker publica o que mudou nas suas conexões, acumulado a cada
+  PRESENCE_FLUSH_INTERVAL, como um diff {"worker", "online", "offline"}
+  (scope "presence" no backend de broadcast).
+- Cada worker mantém, a partir dos diffs, quais workers têm conexões de
+  cada usuário: o usuário está online enquanto algum worker o tiver, então
+  fechar uma aba num worker não derruba a presença aberta em outro.
+- A cada PRESENCE_HEARTBEAT_INTERVAL cada worker publica a lista completa
+  das suas conexões (snapshot). Workers sem notícias há mais de
+  PRESENCE_WORKER_TIMEOUT (ex.: processo morto) saem da visão. Um worker
+  recém-iniciado anuncia "hello" e os demais respondem com o snapshot.
+- A entrega a cada assinante traz só os usuários que ele assinou
+  ({"type": "presence_subscribe", "user_ids": [...]}).
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+from .manager import ConnectionManager, manager as default_manager
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_GRACE_SECONDS = float(os.getenv("PRESENCE_GRACE_SECONDS", "10"))
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "1"))
+PRESENCE_MAX_SUBSCRIPTIONS = int(os.getenv("PRESENCE_MAX_SUBSCRIPTIONS", "500"))
+PRESENCE_HEARTBEAT_INTERVAL = float(os.getenv("PRESENCE_HEARTBEAT_INTERVAL", "15"))
+PRESENCE_WORKER_TIMEOUT = float(os.getenv("PRESENCE_WORKER_TIMEOUT", str(3 * PRESENCE_HEARTBEAT_INTERVAL)))
+
+
+class PresenceService:
+    def __init__(self, connections: ConnectionManager):
+        self.connections = connections
+        self.worker_id = uuid.uuid4().hex
+        # Visão global: usuário -> workers com conexões dele
+        self.online: Set[str] = set()
+        self.holders: Dict[str, Set[str]] = {}
+        self.worker_users: Dict[str, Set[str]] = {}
+        self._worker_seen: Dict[str, float] = {}
+        # Usuários que este worker anunciou como conectados
+        self.local_online: Set[str] = set()
+        # assinante -> usuários observados / usuário -> assinantes (locais)
+        self.subscriptions: Dict[str, Set[str]] = {}
+        self.watchers: Dict[str, Set[str]] = {}
+        self._changes: Dict[str, bool] = {}
+        self._offline_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._next_heartbeat = 0.0
+        connections.register_scope("presence", self._deliver)
+
+    async def start(self):
+        if self._flusher is None:
+            await self._publish_snapshot(hello=True)
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        for timer in self._offline_timers.values():
+            timer.cancel()
+        self._offline_timers.clear()
+
+    def user_connected(self, user_id: str):
+        timer = self._offline_timers.pop(user_id, None)
+        if timer is not None:
+            # Reconectou dentro do período de graça: nada mudou para os outros
+            timer.cancel()
+            return
+        if user_id not in self.local_online:
+            self.local_online.add(user_id)
+            self._changes[user_id] = True
+
+    def user_disconnected(self, user_id: str):
+        # Conexões deste worker; as dos outros contam pela visão global
+        if self.connections.get_connection_count(user_id) > 0:
+            return
+        self.unsubscribe_all(user_id)
+        if user_id in self._offline_timers:
+            return
+        loop = asyncio.get_running_loop()
+        self._offline_timers[user_id] = loop.call_later(
+            PRESENCE_GRACE_SECONDS, self._expire, user_id
+        )
+
+    def _expire(self, user_id: str):
+        self._offline_timers.pop(user_id, None)
+        if self.connections.get_connection_count(user_id) == 0 and user_id in self.local_online:
+            self.local_online.discard(user_id)
+            self._changes[user_id] = False
+
+    def subscribe(self, subscriber_id: str, user_ids: Iterable[str]) -> List[str]:
+        """Assina a presença de user_ids; retorna quais estão online agora"""
+        watched = self.subscriptions.setdefault(subscriber_id, set())
+        for user_id in user_ids:
+            if len(watched) >= PRESENCE_MAX_SUBSCRIPTIONS:
+                break
+            user_id = str(user_id)
+            watched.add(user_id)
+            self.watchers.setdefault(user_id, set()).add(subscriber_id)
+        return sorted(u for u in watched if u in self.online)
+
+    def unsubscribe(self, subscriber_id: str, user_ids: Iterable[str]):
+        watched = self.subscriptions.get(subscriber_id)
+        if not watched:
+            return
+        for user_id in user_ids:
+            user_id = str(user_id)
+            watched.discard(user_id)
+            subscribers = self.watchers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber_id)
+                if not subscribers:
+                    del self.watchers[user_id]
+        if not watched:
+            del self.subscriptions[subscriber_id]
+
+    def unsubscribe_all(self, subscriber_id: str):
+        self.unsubscribe(subscriber_id, list(self.subscriptions.get(subscriber_id, ())))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(PRESENCE_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+                if time.monotonic() >= self._next_heartbeat:
+                    await self._publish_snapshot()
+                await self._expire_workers()
+            except Exception:
+                logger.exception("Presença: falha ao publicar diff")
+
+    async def flush(self):
+        if not self._changes:
+            return
+        changes, self._changes = self._changes, {}
+        await self.connections.publish_scope("presence", {
+            "worker": self.worker_id,
+            "online": [u for u, is_online in changes.items() if is_online],
+            "offline": [u for u, is_online in changes.items() if not is_online],
+        })
+
+    async def _publish_snapshot(self, hello: bool = False):
+        # O snapshot já reflete as mudanças pendentes
+        self._changes.clear()
+        self._next_heartbeat = time.monotonic() + PRESENCE_HEARTBEAT_INTERVAL
+        await self.connections.publish_scope("presence", {
+            "worker": self.worker_id,
+            "snapshot": sorted(self.local_online),
+            "hello": hello,
+        })
+
+    async def _expire_workers(self):
+        deadline = time.monotonic() - PRESENCE_WORKER_TIMEOUT
+        dead = [w for w, seen in self._worker_seen.items() if seen < deadline and w != self.worker_id]
+        for worker in dead:
+            logger.warning("Presença: worker %s sem heartbeat, removendo suas conexões", worker)
+            del self._worker_seen[worker]
+            users = self.worker_users.pop(worker, set())
+            self._notify(self._update_holders(worker, added=(), removed=users))
+
+    def _update_holders(self, worker: str, added: Iterable[str], removed: Iterable[str]) -> Dict[str, bool]:
+        """Atualiza a visão global; retorna usuários cujo estado online mudou"""
+        users = self.worker_users.setdefault(worker, set())
+        touched = set()
+        for user_id in added:
+            users.add(user_id)
+            self.holders.setdefault(user_id, set()).add(worker)
+            touched.add(user_id)
+        for user_id in removed:
+            users.discard(user_id)
+            workers = self.holders.get(user_id)
+            if workers is not None:
+                workers.discard(worker)
+                if not workers:
+                    del self.holders[user_id]
+            touched.add(user_id)
+        if not users:
+            del self.worker_users[worker]
+        return {
+            user_id: user_id in self.holders
+            for user_id in touched
+            if (user_id in self.holders) != (user_id in self.online)
+        }
+
+    async def _deliver(self, diff: dict):
+        """Aplica o diff/snapshot (de qualquer worker) e entrega aos assinantes locais"""
+        worker = diff.get("worker")
+        if worker is None:
+            return
+        self._worker_seen[worker] = time.monotonic()
+
+        if "snapshot" in diff:
+            current = set(diff["snapshot"])
+            previous = self.worker_users.get(worker, set())
+            transitions = self._update_holders(worker, current - previous, previous - current)
+        else:
+            transitions = self._update_holders(worker, diff.get("online", []), diff.get("offline", []))
+        self._notify(transitions)
+
+        if diff.get("hello") and worker != self.worker_id:
+            # Worker novo começa sem visão: responde com as conexões daqui
+            await self._publish_snapshot()
+
+    def _notify(self, transitions: Dict[str, bool]):
+        online = [u for u, is_online in transitions.items() if is_online]
+        offline = [u for u, is_online in transitions.items() if not is_online]
+        self.online.update(online)
+        self.online.difference_update(offline)
+
+        per_subscriber: Dict[str, Dict[str, List[str]]] = {}
+        for key, user_ids in (("online", online), ("offline", offline)):
+            for user_id in user_ids:
+                for subscriber_id in self.watchers.get(user_id, ()):
+                    per_subscriber.setdefault(subscriber_id, {"online": [], "offline": []})[key].append(user_id)
+
+        for subscriber_id, payload in per_subscriber.items():
+            self.connections.send_local_user({"type": "presence_diff", **payload}, subscriber_id)
+
+
+presence = PresenceService(default_manager)
@@ -2,28 +2,40 @@
 Rotas WebSocket para notificações e chat em tempo real
 """
 import json
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
+from uuid import UUID
 
-from src.database.db import get_db
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from src.database.db import AsyncSessionLocal
 from src.database.models import Users, Conversations
+from src.services.read_receipts import read_receipts
 from .manager import manager
+from .presence import presence
 
 router = APIRouter()
 
 
+async def _exists(model, object_id: str) -> bool:
+    """Consulta curta, sem prender uma conexão do pool durante todo o WebSocket"""
+    try:
+        object_uuid = UUID(object_id)
+    except ValueError:
+        return False
+    async with AsyncSessionLocal() as db:
+        return await db.get(model, object_uuid) is not None
+
+
 @router.websocket("/ws/{user_id}")
-async def websocket_user_endpoint(websocket: WebSocket, user_id: str, db: Session = Depends(get_db)):
-    user = db.query(Users).filter(Users.id == user_id).first()
-    if not user:
+async def websocket_user_endpoint(websocket: WebSocket, user_id: str):
+    if not await _exists(Users, user_id):
         await websocket.close(code=4004)
         return
 
     await manager.connect_user(websocket, user_id)
-    await manager.broadcast_user_status(user_id, online=True)
+    presence.user_connected(user_id)
 
     try:
-        await websocket.send_json({
+        manager.send_to(websocket, {
             "type": "connection",
             "message": "Conectado para notificações",
             "user_id": user_id,
@@ -31,10 +43,16 @@ async def websocket_user_endpoint(websocket: WebSocket, user_id: str, db: Sessio
 
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             try:
                 msg = json.loads(data)
                 if msg.get("type") == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": msg.get("timestamp")})
+                    manager.send_to(websocket, {"type": "pong", "timestamp": msg.get("timestamp")})
+                elif msg.get("type") == "presence_subscribe":
+                    online = presence.subscribe(user_id, msg.get("user_ids") or [])
+                    manager.send_to(websocket, {"type": "presence_snapshot", "online": online})
+                elif msg.get("type") == "presence_unsubscribe":
+                    presence.unsubscribe(user_id, msg.get("user_ids") or [])
             except json.JSONDecodeError:
                 pass
 
@@ -42,20 +60,19 @@ async def websocket_user_endpoint(websocket: WebSocket, user_id: str, db: Sessio
         pass
     finally:
         manager.disconnect_user(websocket, user_id)
-        await manager.broadcast_user_status(user_id, online=False)
+        presence.user_disconnected(user_id)
 
 
 @router.websocket("/ws/conversations/{conversation_id}")
-async def websocket_conversation_endpoint(websocket: WebSocket, conversation_id: str, db: Session = Depends(get_db)):
-    conversation = db.query(Conversations).filter(Conversations.id == conversation_id).first()
-    if not conversation:
+async def websocket_conversation_endpoint(websocket: WebSocket, conversation_id: str):
+    if not await _exists(Conversations, conversation_id):
         await websocket.close(code=4004)
         return
 
     await manager.connect_conversation(websocket, conversation_id)
 
     try:
-        await websocket.send_json({
+        manager.send_to(websocket, {
             "type": "connection",
             "message": "Conectado na conversa",
             "conversation_id": conversation_id,
@@ -63,6 +80,7 @@ async def websocket_conversation_endpoint(websocket: WebSocket, conversation_id:
 
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             try:
                 msg = json.loads(data)
                 if msg.get("type") == "typing":
@@ -73,7 +91,11 @@ async def websocket_conversation_endpoint(websocket: WebSocket, conversation_id:
                         },
                         conversation_id,
                     )
-            except json.JSONDecodeError:
+                elif msg.get("type") == "read":
+                    # {"type": "read", "up_to": "<message_id>"}; sem up_to = tudo
+                    up_to = msg.get("up_to")
+                    read_receipts.ack(UUID(conversation_id), UUID(str(up_to)) if up_to else None)
+            except (json.JSONDecodeError, ValueError):
                 pass
 
     except WebSocketDisconnect:
@@ -88,4 +110,6 @@ async def websocket_status():
         "connected_users": manager.get_connected_users(),
         "connected_conversations": manager.get_connected_conversations(),
         "online_users": list(manager.online_users),
+        "presence_subscribers": len(presence.subscriptions),
+        "send_queues": manager.send_queue_stats(),
     }
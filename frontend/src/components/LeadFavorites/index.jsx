@@ -95,6 +95,9 @@ export default function LeadFavorites({ leadId }) {
               <div className={styles.imageContainer}>
                 <img
                   src={favorite.property.images[0].image_url}
+                  srcSet={favorite.property.images[0].srcset || undefined}
+                  sizes="(max-width: 768px) 100vw, 400px"
+                  loading="lazy"
                   alt={favorite.property.title}
                   className={styles.image}
                 />
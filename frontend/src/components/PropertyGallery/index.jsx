@@ -79,11 +79,20 @@ const PropertyGallery = ({ images = [] }) => {
       <div ref={carouselRef} className={styles.carousel}>
         {/* Imagem principal */}
         <div className={styles.mainImageContainer}>
-          <img
-            src={images[currentIndex].image_url || images[currentIndex].url || images[currentIndex]}
-            alt={`Imagem ${currentIndex + 1}`}
-            className={styles.mainImage}
-          />
+          <picture>
+            {images[currentIndex].srcset_avif && (
+              <source type="image/avif" srcSet={images[currentIndex].srcset_avif} sizes="100vw" />
+            )}
+            <img
+              src={images[currentIndex].image_url || images[currentIndex].url || images[currentIndex]}
+              srcSet={images[currentIndex].srcset || undefined}
+              sizes="100vw"
+              width={images[currentIndex].width || undefined}
+              height={images[currentIndex].height || undefined}
+              alt={`Imagem ${currentIndex + 1}`}
+              className={styles.mainImage}
+            />
+          </picture>
 
           {/* Botões de navegação */}
           {images.length > 1 && (
@@ -130,8 +139,9 @@ const PropertyGallery = ({ images = [] }) => {
                 className={`${styles.thumbnail} ${index === currentIndex ? styles.active : ''}`}
               >
                 <img
-                  src={image.image_url || image.url || image}
+                  src={image.thumbnail_url || image.image_url || image.url || image}
                   alt={`Thumbnail ${index + 1}`}
+                  loading="lazy"
                   className={styles.thumbnailImage}
                 />
               </button>
@@ -12,6 +12,8 @@ const AdminProperties = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Filtros
   const [filters, setFilters] = useState({
@@ -19,30 +21,47 @@ const AdminProperties = () => {
     status: ''
   });
 
+  const buildFilters = () => ({
+    city: filters.city.trim() || undefined,
+    status: filters.status || undefined
+  });
+
   // Buscar imóveis
   const fetchProperties = async () => {
     try {
       setLoading(true);
       setError(null);
       
-      const validFilters = {
-        city: filters.city.trim() || undefined,
-        status: filters.status || undefined
-      };
-      
-      const response = await getProperties(validFilters);
+      const response = await getProperties(buildFilters());
       setProperties(response.data);
       setTotal(response.total);
+      setNextCursor(response.next_cursor ?? null);
       
     } catch (err) {
       setError(err.message);
       setProperties([]);
       setTotal(0);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  // Próxima página pelo cursor
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const response = await getProperties({ ...buildFilters(), cursor: nextCursor, includeTotal: false });
+      setProperties(prev => [...prev, ...response.data]);
+      setNextCursor(response.next_cursor ?? null);
+    } catch (err) {
+      alert('Erro ao carregar imóveis: ' + err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchProperties();
   }, [filters]);
@@ -273,6 +292,14 @@ const AdminProperties = () => {
                 ))}
               </div>
             </div>
+
+            {nextCursor && (
+              <div className={styles.loadMore}>
+                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? 'Carregando...' : `Carregar mais (${properties.length} de ${total})`}
+                </Button>
+              </div>
+            )}
           </>
         )}
       </Card>
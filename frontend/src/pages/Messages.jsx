@@ -5,7 +5,6 @@ import {
   fetchConversations,
   fetchMessages,
   sendMessage,
-  markAsRead,
   markMessagesRead,
   archiveConversation,
   unarchiveConversation,
@@ -56,29 +55,64 @@ export default function Messages() {
   const [loading, setLoading] = useState(true)
   const [isTyping, setIsTyping] = useState(false)
   const [onlineUsers, setOnlineUsers] = useState(new Set())
+  const [hasOlder, setHasOlder] = useState(false)
+  const [loadingOlder, setLoadingOlder] = useState(false)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   const socketRef = useRef(null)
   const userSocketRef = useRef(null)
   const typingTimerRef = useRef(null)
   const chatBodyRef = useRef(null)
+  // Distância até o fim do chat antes de inserir mensagens antigas no topo
+  const prependHeightRef = useRef(null)
+  const activeIdRef = useRef(null)
 
   const active = useMemo(
     () => conversations.find((c) => c.id === activeId) || null,
     [conversations, activeId],
   )
 
-  // Carregar conversas
+  // Carregar conversas (primeira página; as demais ao rolar a lista)
   useEffect(() => {
     fetchConversations()
-      .then(setConversations)
+      .then(({ conversations: page, nextCursor: cursor }) => {
+        setConversations(page)
+        setNextCursor(cursor)
+      })
       .finally(() => setLoading(false))
   }, [])
 
-  // Scroll automático
+  const loadMoreConversations = useCallback(async () => {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const { conversations: page, nextCursor: cursor } = await fetchConversations({ cursor: nextCursor })
+      setConversations((prev) => {
+        const known = new Set(prev.map((c) => c.id))
+        return [...prev, ...page.filter((c) => !known.has(c.id))]
+      })
+      setNextCursor(cursor)
+    } finally {
+      setLoadingMore(false)
+    }
+  }, [nextCursor, loadingMore])
+
+  const handleListScroll = (e) => {
+    const el = e.currentTarget
+    if (el.scrollHeight - el.scrollTop - el.clientHeight < 120) loadMoreConversations()
+  }
+
+  // Scroll automático (ao carregar histórico antigo mantém a posição de leitura)
   useEffect(() => {
-    if (chatBodyRef.current) {
-      chatBodyRef.current.scrollTop = chatBodyRef.current.scrollHeight
+    const body = chatBodyRef.current
+    if (!body) return
+    if (prependHeightRef.current !== null) {
+      body.scrollTop = body.scrollHeight - prependHeightRef.current
+      prependHeightRef.current = null
+      return
     }
+    body.scrollTop = body.scrollHeight
   }, [messages, isTyping])
 
   // WebSocket de usuário (online/offline)
@@ -92,11 +126,18 @@ export default function Messages() {
     socket.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data)
-        if (data.type === 'user_status') {
+        if (data.type === 'ping') {
+          socket.send(JSON.stringify({ type: 'pong', timestamp: data.timestamp }))
+          return
+        }
+        if (data.type === 'presence_snapshot') {
+          setOnlineUsers((prev) => new Set([...prev, ...data.online]))
+        }
+        if (data.type === 'presence_diff') {
           setOnlineUsers((prev) => {
             const next = new Set(prev)
-            if (data.online) next.add(data.user_id)
-            else next.delete(data.user_id)
+            data.online.forEach((id) => next.add(id))
+            data.offline.forEach((id) => next.delete(id))
             return next
           })
         }
@@ -106,6 +147,23 @@ export default function Messages() {
     return () => socket.close()
   }, [])
 
+  // Presença só dos corretores atribuídos às conversas listadas
+  const presenceIds = useMemo(
+    () => [...new Set(conversations.map((c) => c.assigned_to).filter(Boolean))].sort().join(','),
+    [conversations],
+  )
+
+  useEffect(() => {
+    const socket = userSocketRef.current
+    if (!socket || !presenceIds) return
+
+    const subscribe = () =>
+      socket.send(JSON.stringify({ type: 'presence_subscribe', user_ids: presenceIds.split(',') }))
+
+    if (socket.readyState === WebSocket.OPEN) subscribe()
+    else socket.addEventListener('open', subscribe, { once: true })
+  }, [presenceIds])
+
   // WebSocket por conversa
   useEffect(() => {
     if (!activeId) return
@@ -119,6 +177,11 @@ export default function Messages() {
       try {
         const data = JSON.parse(event.data)
 
+        if (data.type === 'ping') {
+          socket.send(JSON.stringify({ type: 'pong', timestamp: data.timestamp }))
+          return
+        }
+
         if (data.type === 'new_message') {
           const msg = data.message
           setMessages((prev) => {
@@ -161,17 +224,40 @@ export default function Messages() {
   }, [activeId])
 
   const handleOpenConversation = async (id) => {
+    activeIdRef.current = id
     setActiveId(id)
     setMobileShowList(false)
-    const msgs = await fetchMessages(id)
+    setHasOlder(false)
+    const { messages: msgs, hasMore } = await fetchMessages(id)
+    if (id !== activeIdRef.current) return
     setMessages(msgs)
-    markAsRead(id)
-    markMessagesRead(id)
+    setHasOlder(hasMore)
+    markMessagesRead(id, msgs[msgs.length - 1]?.id)
     setConversations((prev) =>
       prev.map((c) => (c.id === id ? { ...c, is_read: true, unread_count: 0 } : c)),
     )
   }
 
+  const handleLoadOlder = async () => {
+    if (!activeId || !messages.length || loadingOlder) return
+    const id = activeId
+    setLoadingOlder(true)
+    try {
+      const { messages: older, hasMore } = await fetchMessages(id, { before: messages[0].id })
+      // Usuário trocou de conversa durante a requisição
+      if (id !== activeIdRef.current) return
+      const body = chatBodyRef.current
+      if (body) prependHeightRef.current = body.scrollHeight - body.scrollTop
+      setMessages((prev) => {
+        const known = new Set(prev.map((m) => m.id))
+        return [...older.filter((m) => !known.has(m.id)), ...prev]
+      })
+      setHasOlder(hasMore)
+    } finally {
+      setLoadingOlder(false)
+    }
+  }
+
   const handleSend = async () => {
     const msg = text.trim()
     if (!msg || !activeId) return
@@ -195,6 +281,7 @@ export default function Messages() {
       prev.map((c) => (c.id === active.id ? { ...c, is_archived: true } : c)),
     )
     if (!showArchived) {
+      activeIdRef.current = null
       setActiveId(null)
       setMobileShowList(true)
     }
@@ -254,7 +341,7 @@ export default function Messages() {
           </Button>
         </div>
 
-        <div className="messages-list-body">
+        <div className="messages-list-body" onScroll={handleListScroll}>
           {loading && <p style={{ padding: 12 }}>Carregando...</p>}
           {!loading && sortedConversations.length === 0 && (
             <p style={{ padding: 12, color: 'var(--muted)' }}>Nenhuma conversa.</p>
@@ -289,6 +376,13 @@ export default function Messages() {
               </button>
             )
           })}
+          {nextCursor && (
+            <div style={{ display: 'flex', justifyContent: 'center', padding: 12 }}>
+              <Button variant="outline" type="button" onClick={loadMoreConversations} disabled={loadingMore}>
+                {loadingMore ? 'Carregando...' : 'Carregar mais'}
+              </Button>
+            </div>
+          )}
         </div>
       </aside>
 
@@ -317,6 +411,13 @@ export default function Messages() {
             </div>
 
             <div className="chat-body" ref={chatBodyRef}>
+              {hasOlder && (
+                <div style={{ display: 'flex', justifyContent: 'center', marginBottom: 10 }}>
+                  <Button variant="outline" type="button" onClick={handleLoadOlder} disabled={loadingOlder}>
+                    {loadingOlder ? 'Carregando...' : 'Carregar mensagens anteriores'}
+                  </Button>
+                </div>
+              )}
               {messages.map((m) => (
                 <div
                   key={m.id}
@@ -12,6 +12,9 @@ export default function Properties() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [total, setTotal] = useState(0)
+  const [statusCounts, setStatusCounts] = useState(null)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   const [filters, setFilters] = useState({
     city: '',
@@ -40,26 +43,46 @@ export default function Properties() {
 
       setProperties(response?.data ?? [])
       setTotal(response?.total ?? 0)
+      setStatusCounts(response?.status_counts ?? null)
+      setNextCursor(response?.next_cursor ?? null)
     } catch (err) {
       setError(err?.message || 'Erro ao carregar imóveis')
       setProperties([])
       setTotal(0)
+      setStatusCounts(null)
+      setNextCursor(null)
     } finally {
       setLoading(false)
     }
   }
 
+  // Próxima página pelo cursor (sem recalcular o total)
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return
+    try {
+      setLoadingMore(true)
+      const validFilters = validateFilters(filters)
+      const response = await getProperties({ ...validFilters, cursor: nextCursor, includeTotal: false })
+      setProperties((prev) => [...prev, ...(response?.data ?? [])])
+      setNextCursor(response?.next_cursor ?? null)
+    } catch (err) {
+      setError(err?.message || 'Erro ao carregar imóveis')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     fetchProperties()
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [filters.city, filters.minPrice, filters.maxPrice, filters.bedrooms, filters.status])
 
   const stats = useMemo(() => {
-    const available = properties.filter((p) => p.status === 'AVAILABLE').length
-    const reserved = properties.filter((p) => p.status === 'RESERVED').length
-    const sold = properties.filter((p) => p.status === 'SOLD').length
-    return { total, available, reserved, sold }
-  }, [properties, total])
+    // Contagens do backend cobrem todas as páginas; sem elas (total estimado), conta o carregado
+    const count = (value) =>
+      statusCounts ? statusCounts[value] ?? 0 : properties.filter((p) => p.status === value).length
+    return { total, available: count('AVAILABLE'), reserved: count('RESERVED'), sold: count('SOLD') }
+  }, [properties, total, statusCounts])
 
   const statusOptions = useMemo(
     () => [
@@ -199,11 +222,22 @@ export default function Properties() {
             </div>
           </Card>
         ) : (
-          <div className={styles.propertiesGrid}>
-            {properties.map((property) => (
-              <PropertyCard key={property.id} property={property} />
-            ))}
-          </div>
+          <>
+            <div className={styles.propertiesGrid}>
+              {properties.map((property) => (
+                <PropertyCard key={property.id} property={property} />
+              ))}
+            </div>
+            {nextCursor && (
+              <div className={styles.loadMore}>
+                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore
+                    ? t('properties.loadingMore', { defaultValue: 'Carregando...' })
+                    : t('properties.loadMore', { defaultValue: 'Carregar mais' })}
+                </Button>
+              </div>
+            )}
+          </>
         )}
       </div>
     </div>
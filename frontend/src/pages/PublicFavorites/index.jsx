@@ -101,6 +101,9 @@ export default function PublicFavorites() {
                 <div className={styles.imageContainer}>
                   <img
                     src={property.images[0].image_url}
+                    srcSet={property.images[0].srcset || undefined}
+                    sizes="(max-width: 768px) 100vw, 400px"
+                    loading="lazy"
                     alt={property.title}
                     className={styles.image}
                   />
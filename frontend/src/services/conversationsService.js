@@ -9,21 +9,34 @@ function getHeaders() {
   }
 }
 
-export async function fetchConversations(assignedTo = null) {
-  const url = assignedTo
-    ? `${API_BASE_URL}/conversations?assigned_to=${assignedTo}`
-    : `${API_BASE_URL}/conversations`
-  const res = await fetch(url, { headers: getHeaders() })
+// Página do inbox; nextCursor (X-Next-Cursor) é null na última página
+export async function fetchConversations({ assignedTo = null, cursor = null } = {}) {
+  const params = new URLSearchParams()
+  if (assignedTo) params.set('assigned_to', assignedTo)
+  if (cursor) params.set('cursor', cursor)
+  const query = params.toString() ? `?${params}` : ''
+  const res = await fetch(`${API_BASE_URL}/conversations${query}`, { headers: getHeaders() })
   if (!res.ok) throw new Error('Erro ao buscar conversas')
-  return res.json()
+  return {
+    conversations: await res.json(),
+    nextCursor: res.headers.get('X-Next-Cursor'),
+  }
 }
 
-export async function fetchMessages(conversationId) {
-  const res = await fetch(`${API_BASE_URL}/conversations/${conversationId}/messages`, {
+// Página de mensagens (as mais recentes, ou as anteriores a `before`)
+export async function fetchMessages(conversationId, { before = null, limit = null } = {}) {
+  const params = new URLSearchParams()
+  if (before) params.set('before', before)
+  if (limit) params.set('limit', limit)
+  const query = params.toString() ? `?${params}` : ''
+  const res = await fetch(`${API_BASE_URL}/conversations/${conversationId}/messages${query}`, {
     headers: getHeaders(),
   })
   if (!res.ok) throw new Error('Erro ao buscar mensagens')
-  return res.json()
+  return {
+    messages: await res.json(),
+    hasMore: res.headers.get('X-Has-More') === 'true',
+  }
 }
 
 export async function sendMessage(conversationId, content, senderType = 'corretor') {
@@ -36,15 +49,9 @@ export async function sendMessage(conversationId, content, senderType = 'correto
   return res.json()
 }
 
-export async function markAsRead(conversationId) {
-  await fetch(`${API_BASE_URL}/conversations/${conversationId}/read`, {
-    method: 'PATCH',
-    headers: getHeaders(),
-  })
-}
-
-export async function markMessagesRead(conversationId) {
-  await fetch(`${API_BASE_URL}/conversations/${conversationId}/read-messages`, {
+export async function markMessagesRead(conversationId, upTo) {
+  const query = upTo ? `?up_to=${upTo}` : ''
+  await fetch(`${API_BASE_URL}/conversations/${conversationId}/read-messages${query}`, {
     method: 'PATCH',
     headers: getHeaders(),
   })
@@ -50,13 +50,22 @@ async function readErrorMessage(response) {
   return data?.detail || `Erro ${response.status}: ${response.statusText}`;
 }
 
+// Maior página aceita pelo backend nas listagens de favoritos
+const FAVORITES_PAGE_LIMIT = 200;
+
 /**
- * Busca lista de favoritos do usuário autenticado
- * @returns {Promise<Array>} Promise com array de favoritos
+ * Percorre as páginas (page/limit) até cobrir o X-Total-Count
+ * @param {string} baseUrl - URL da listagem, sem page/limit
+ * @returns {Promise<Array>} Todos os itens, na ordem do backend
  */
-export async function getFavorites() {
-  try {
-    const response = await fetch(`${API_BASE_URL}/favorites/`, {
+async function fetchAllPages(baseUrl) {
+  const items = [];
+  for (let page = 1; ; page++) {
+    const url = new URL(baseUrl);
+    url.searchParams.set('page', page);
+    url.searchParams.set('limit', FAVORITES_PAGE_LIMIT);
+
+    const response = await fetch(url.toString(), {
       headers: getAuthHeaders()
     });
 
@@ -65,7 +74,24 @@ export async function getFavorites() {
       throw createHttpError(message, response.status);
     }
 
-    return await response.json();
+    const data = await response.json();
+    items.push(...data);
+
+    const total = response.headers.get('X-Total-Count');
+    const done = total !== null
+      ? items.length >= Number(total)
+      : data.length < FAVORITES_PAGE_LIMIT;
+    if (done || data.length === 0) return items;
+  }
+}
+
+/**
+ * Busca lista de favoritos do usuário autenticado (todas as páginas)
+ * @returns {Promise<Array>} Promise com array de favoritos
+ */
+export async function getFavorites() {
+  try {
+    return await fetchAllPages(`${API_BASE_URL}/favorites/`);
 
   } catch (error) {
     if (error?.status) throw error;
@@ -176,22 +202,13 @@ export async function checkFavorite(propertyId) {
 }
 
 /**
- * Busca favoritos de um lead específico
+ * Busca favoritos de um lead específico (todas as páginas)
  * @param {string} leadId - UUID do lead
  * @returns {Promise<Array>} Promise com array de favoritos do lead
  */
 export async function getLeadFavorites(leadId) {
   try {
-    const response = await fetch(`${API_BASE_URL}/favorites/leads/${leadId}`, {
-      headers: getAuthHeaders()
-    });
-
-    if (!response.ok) {
-      const message = await readErrorMessage(response);
-      throw createHttpError(message, response.status);
-    }
-
-    return await response.json();
+    return await fetchAllPages(`${API_BASE_URL}/favorites/leads/${leadId}`);
 
   } catch (error) {
     if (error?.status) throw error;
@@ -180,6 +180,10 @@ class WebSocketService {
         console.log('Atualização de preço recebida:', rest);
         this.emit('price_update', rest);
         break;
+      case 'ping':
+        // Heartbeat do servidor: sem resposta a conexão é encerrada
+        this.send({ type: 'pong', timestamp: rest.timestamp });
+        return;
       case 'pong':
         // Resposta ao heartbeat
         break;
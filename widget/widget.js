@@ -17,6 +17,8 @@
   let socket = null
   let isOpen = false
   const shownIds = new Set()
+  let lastMessageId = null
+  let firstMessageId = null
 
   // ─── CSS ───────────────────────────────────────────────────────────────────
   const style = document.createElement('style')
@@ -55,6 +57,7 @@
     .wgt-footer input:focus { border-color: #2563eb; }
     .wgt-footer button { background: #2563eb; color: #fff; border: none; border-radius: 8px; padding: 9px 12px; cursor: pointer; font-size: 13px; }
     .wgt-footer label { cursor: pointer; font-size: 18px; opacity: .6; }
+    .wgt-older { align-self: center; background: none; border: none; color: #2563eb; font-size: 12px; cursor: pointer; padding: 4px; display: none; }
     .wgt-typing { font-size: 12px; color: #94a3b8; padding: 0 12px 6px; display: none; }
   `
   document.head.appendChild(style)
@@ -160,29 +163,117 @@
   document.getElementById('wgt-file-input').addEventListener('change', async (e) => {
     const file = e.target.files[0]
     if (!file || !conversationId) return
-    const form = new FormData()
-    form.append('file', file)
-    await fetch(`${API}/widget/${conversationId}/upload`, {
-      method: 'POST',
-      headers: { 'x-api-key': API_KEY },
-      body: form,
-    })
+    // Upload direto ao storage quando o navegador calcula SHA-256 (contexto seguro)
+    const sent = window.crypto && crypto.subtle ? await uploadDirect(file).catch(() => false) : false
+    if (!sent) {
+      const form = new FormData()
+      form.append('file', file)
+      await fetch(`${API}/widget/${conversationId}/upload`, {
+        method: 'POST',
+        headers: { 'x-api-key': API_KEY },
+        body: form,
+      })
+    }
     e.target.value = ''
   })
 
+  async function uploadDirect(file) {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+    const sha256 = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('')
+    const headers = { 'Content-Type': 'application/json', 'x-api-key': API_KEY }
+
+    const res = await fetch(`${API}/widget/${conversationId}/upload-url`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({
+        filename: file.name,
+        content_type: file.type || 'application/octet-stream',
+        size: file.size,
+        sha256,
+      }),
+    })
+    if (!res.ok) return false
+    const { upload } = await res.json()
+    // upload = null: o arquivo já está no storage
+    if (upload) {
+      const put = await fetch(new URL(upload.url, API), { method: upload.method, headers: upload.headers, body: file })
+      if (!put.ok) return false
+    }
+
+    const done = await fetch(`${API}/widget/${conversationId}/upload/direct`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ sha256, filename: file.name }),
+    })
+    return done.ok
+  }
+
   // ─── Histórico ─────────────────────────────────────────────────────────────
+  // A API devolve só as mensagens mais recentes; as anteriores vêm sob demanda (?before=)
   async function loadMessages() {
     const res = await fetch(`${API}/widget/${conversationId}/messages`, { headers: { 'x-api-key': API_KEY } })
     const msgs = await res.json()
-    document.getElementById('wgt-messages').innerHTML = ''
+    const container = document.getElementById('wgt-messages')
+    container.innerHTML = '<button class="wgt-older" id="wgt-older">Carregar mensagens anteriores</button>'
+    document.getElementById('wgt-older').addEventListener('click', loadOlderMessages)
+    firstMessageId = msgs.length ? msgs[0].id : null
     msgs.forEach(appendMessage)
+    setHasOlder(res.headers.get('X-Has-More') === 'true')
     scrollToBottom()
   }
 
+  async function loadOlderMessages() {
+    const olderBtn = document.getElementById('wgt-older')
+    if (!firstMessageId || olderBtn.disabled) return
+    olderBtn.disabled = true
+    try {
+      const res = await fetch(`${API}/widget/${conversationId}/messages?before=${firstMessageId}`, { headers: { 'x-api-key': API_KEY } })
+      if (!res.ok) return
+      const msgs = await res.json()
+      const container = document.getElementById('wgt-messages')
+      const fromBottom = container.scrollHeight - container.scrollTop
+      // Insere logo abaixo do botão, mantendo a ordem cronológica
+      let anchor = olderBtn.nextSibling
+      for (let i = msgs.length - 1; i >= 0; i--) {
+        const msg = msgs[i]
+        if (msg.id && shownIds.has(msg.id)) continue
+        if (msg.id) shownIds.add(msg.id)
+        const div = renderMessage(msg)
+        container.insertBefore(div, anchor)
+        anchor = div
+      }
+      if (msgs.length) firstMessageId = msgs[0].id
+      setHasOlder(res.headers.get('X-Has-More') === 'true')
+      container.scrollTop = container.scrollHeight - fromBottom
+    } finally {
+      olderBtn.disabled = false
+    }
+  }
+
+  function setHasOlder(hasOlder) {
+    document.getElementById('wgt-older').style.display = hasOlder ? 'block' : 'none'
+  }
+
+  // Após reconectar o socket, baixa só o que chegou depois da última mensagem exibida
+  async function syncMessages() {
+    if (!lastMessageId) return
+    const res = await fetch(`${API}/widget/${conversationId}/messages?after=${lastMessageId}`, { headers: { 'x-api-key': API_KEY } })
+    if (!res.ok) return
+    const msgs = await res.json()
+    msgs.forEach(appendMessage)
+  }
+
   function appendMessage(msg) {
     if (msg.id && shownIds.has(msg.id)) return
-    if (msg.id) shownIds.add(msg.id)
-    const container = document.getElementById('wgt-messages')
+    if (msg.id) {
+      shownIds.add(msg.id)
+      lastMessageId = msg.id
+    }
+    document.getElementById('wgt-messages').appendChild(renderMessage(msg))
+    scrollToBottom()
+  }
+
+  function renderMessage(msg) {
     const div = document.createElement('div')
     div.className = `wgt-bubble ${msg.sender_type}`
     const time = msg.created_at ? new Date(msg.created_at).toLocaleTimeString('pt-BR', { hour: '2-digit', minute: '2-digit' }) : ''
@@ -191,8 +282,7 @@
     } else {
       div.innerHTML = `${msg.content}<div class="wgt-time">${time}</div>`
     }
-    container.appendChild(div)
-    scrollToBottom()
+    return div
   }
 
   function scrollToBottom() {
@@ -205,10 +295,15 @@
 
   function connectSocket() {
     socket = new WebSocket(`${WS}/ws/conversations/${conversationId}`)
+    socket.onopen = () => syncMessages()
 
     socket.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data)
+        if (data.type === 'ping') {
+          socket.send(JSON.stringify({ type: 'pong', timestamp: data.timestamp }))
+          return
+        }
         if (data.type === 'new_message') {
           appendMessage(data.message)
         }